@@ -2,7 +2,16 @@ import re
 import struct
 import json
 import os 
-import glob
+import bisect
+import concurrent.futures
+from save_access import SaveFileView, MARKUP_STRUCT, computeSaveFingerprint
+from extraction_cache import EXTRACTION_CACHE_DIR, ExtractionCache, makeExtractionCacheKey
+from save_discovery import LOCAL_SAVE_FOLDER, SAVE_INDEX_FILE, SaveIndex, getSaveSearchRoots, listSaves
+
+ITEM_NAME_REGEX = re.compile(rb"(\d+-[^.\x00]+\.(?:base|mod))") # XXXX-name.base / YYYY-name.mod item IDs
+TOWN_STATE_PREFIX = b"Town state "
+TOWN_STATE_REGEX = re.compile(rb"Town state ([^\x00-\x1f]+)") # any town, vanilla or modded
+CITY_CACHE_FILE = "discovered_cities.json"
 
 # attempt to shut Pylance up
 plt = None
@@ -88,26 +97,311 @@ def plot_city_segments(city_occurrences, total_file_length, output_filename="cit
     plt.close(fig)
 
 
-def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markupUpperBound):
+def buildSuffixTable(uniqueItemNamesBytes):
+    """
+    For every item name, lists the other item names that are a proper suffix of it as (offset, suffixName).
+    e.g. '312-foo.base' contains an occurrence of '12-foo.base' one byte in.
+    """
+    suffixTable = {}
+    for itemNameBytes in uniqueItemNamesBytes:
+        suffixes = []
+        for offset in range(1, len(itemNameBytes)):
+            if itemNameBytes[offset:] in uniqueItemNamesBytes:
+                suffixes.append((offset, itemNameBytes[offset:]))
+        if suffixes:
+            suffixTable[itemNameBytes] = suffixes
+    return suffixTable
+
+def iterItemOccurrences(fileContent, uniqueItemNamesBytes, itemRegex, startPos=0, endPos=None, suffixTable=None):
+    """
+    Yields (position, itemNameBytes) for every occurrence of a known item name, in file order, using a single regex scan.
+    An item name can't contain '.' or a null byte, so any literal occurrence of a name ends on the same '.base'/'.mod'
+    as the generic match covering it, i.e. it is that match or one of its suffixes. Only occurrences starting before
+    endPos are yielded.
+    """
+    if suffixTable is None:
+        suffixTable = buildSuffixTable(uniqueItemNamesBytes)
+    for match in itemRegex.finditer(fileContent, startPos):
+        matchStart = match.start()
+        if endPos is not None and matchStart >= endPos:
+            break
+        matchBytes = bytes(match.group(1))
+        if matchBytes in uniqueItemNamesBytes:
+            yield matchStart, matchBytes
+            suffixes = suffixTable.get(matchBytes, ())
+        else: # undecodable match, its suffixes can still be valid names
+            suffixes = [(offset, matchBytes[offset:]) for offset in range(1, len(matchBytes)) if matchBytes[offset:] in uniqueItemNamesBytes]
+        for offset, suffixBytes in suffixes:
+            if endPos is not None and matchStart + offset >= endPos:
+                break
+            yield matchStart + offset, suffixBytes
+
+def buildItemOccurrenceIndex(fileContent, uniqueItemNamesBytes, itemRegex):
+    """
+    Maps each item name (bytes) to the sorted list of positions where it occurs in fileContent.
+    Positions come out of the scan in increasing order so the lists never need sorting.
+    """
+    occurrenceIndex = {itemNameBytes: [] for itemNameBytes in uniqueItemNamesBytes}
+    for position, itemNameBytes in iterItemOccurrences(fileContent, uniqueItemNamesBytes, itemRegex):
+        occurrenceIndex[itemNameBytes].append(position)
+    return occurrenceIndex
+
+def findFirstOccurrence(occurrenceIndex, itemNameBytes, startPos, endPos):
+    """Returns the first position of itemNameBytes in [startPos, endPos), or -1."""
+    positions = occurrenceIndex.get(itemNameBytes)
+    if not positions:
+        return -1
+    idx = bisect.bisect_left(positions, startPos)
+    if idx < len(positions) and positions[idx] < endPos:
+        return positions[idx]
+    return -1
+
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024 # bytes read per step in streaming mode
+
+def iterSaveWindows(filePath, chunkSize=STREAM_CHUNK_SIZE):
+    """
+    Reads a save in fixed-size chunks and yields (windowBase, window, scanEnd).
+    Item IDs and "Town state <City>" headers never contain a null byte, so every window is cut on its last null byte:
+    all matches starting before scanEnd are complete, and the 2 markup bytes after them are still inside the window.
+    The bytes after the cut are carried over into the next window, so nothing is ever split across a boundary.
+    Memory stays around two chunks regardless of file size (unless the save has a null-free run longer than that).
+    """
+    with open(filePath, "rb") as f:
+        carry = b""
+        windowBase = 0
+        while True:
+            chunk = f.read(chunkSize)
+            window = carry + chunk
+            if not chunk: # EOF, whatever is left can be scanned to the end
+                if window:
+                    yield windowBase, window, len(window)
+                return
+            cutPos = window.rfind(b"\x00", 0, len(window) - 1) # keep at least 2 bytes after the cut for a markup
+            if cutPos <= 0:
+                carry = window # no safe cut yet, keep reading
+                continue
+            yield windowBase, window, cutPos
+            carry = window[cutPos:]
+            windowBase += cutPos
+
+def iterMarkupRecords(filePath, cityNamesList, markupLowerBound, markupUpperBound, chunkSize=STREAM_CHUNK_SIZE, boundaryCityNames=None, onItemIdsFound=None):
+    """
+    Streaming counterpart of extractMarkupsFromGameFile, yields (city, item, markup, absoluteOffset) records
+    as each city segment is finished, in the same order the in-memory path fills its dict.
+    Two bounded-memory passes: the first collects the unique item names (needed to tell which suffixes of a match
+    are item names on their own), the second walks cities and items together.
+    The city appearance frequency filter is not applied here, it needs every record.
+    """
+    if not cityNamesList:
+        print("Warning: City names list is empty. No cities to search for.")
+        return
+    skippedCityNames = set(boundaryCityNames or ()) - set(cityNamesList)
+    cityRegex = buildCityRegex(list(cityNamesList) + sorted(skippedCityNames))
+    if cityRegex is None:
+        return
+
+    uniqueItemNamesBytes = {}
+    for windowBase, window, scanEnd in iterSaveWindows(filePath, chunkSize):
+        for match in ITEM_NAME_REGEX.finditer(window, 0, scanEnd):
+            itemNameBytes = match.group(1)
+            if itemNameBytes in uniqueItemNamesBytes:
+                continue
+            try:
+                uniqueItemNamesBytes[itemNameBytes] = itemNameBytes.decode('utf-8')
+            except UnicodeDecodeError:
+                print(f"Warning: Could not decode an item name at raw offset {windowBase + match.start()}. Skipping this potential item.")
+    if not uniqueItemNamesBytes:
+        print(f"Warning: No item patterns matching the .base or .mod suffix found in the file. Cannot extract data.")
+        return
+    print(f"Found {len(uniqueItemNamesBytes)} unique item types.")
+    if onItemIdsFound is not None:
+        onItemIdsFound(sorted(uniqueItemNamesBytes.values()))
+    suffixTable = buildSuffixTable(uniqueItemNamesBytes)
+
+    currentCityName = None
+    segmentItems = {} # itemNameBytes -> (markupStartOffset, raw markup or None if past EOF) for the first occurrence in the segment
+
+    def finishSegment():
+        if currentCityName in skippedCityNames: # filtered out town, its header only ends the previous segment
+            return
+        for itemNameBytes in sorted(segmentItems, key=uniqueItemNamesBytes.get):
+            itemNameStr = uniqueItemNamesBytes[itemNameBytes]
+            markupStartOffset, markupRawValue = segmentItems[itemNameBytes]
+            if markupRawValue is None:
+                print(f"DEBUG: Markup for item '{itemNameStr}' in city '{currentCityName}' would read past EOF. Offset: {markupStartOffset}")
+                continue
+            markupPercentage = markupRawValue / 100.0
+            if markupLowerBound <= markupPercentage <= markupUpperBound:
+                yield currentCityName, itemNameStr, markupPercentage, markupStartOffset
+            else:
+                print(f"DEBUG: Item '{itemNameStr}' in '{currentCityName}' markup {markupPercentage:.2f}% is outside bounds ({markupLowerBound}-{markupUpperBound}). Skipping.")
+
+    for windowBase, window, scanEnd in iterSaveWindows(filePath, chunkSize):
+        cityMatches = []
+        for match in cityRegex.finditer(window, 0, scanEnd):
+            try:
+                cityMatches.append((match.start(), match.group(1).decode('utf-8')))
+            except UnicodeDecodeError:
+                print(f"Warning: Could not decode a potential city name (captured part) at raw offset {windowBase + match.start()} using UTF-8.")
+        cityIdx = 0
+        for position, itemNameBytes in iterItemOccurrences(window, uniqueItemNamesBytes, ITEM_NAME_REGEX, 0, scanEnd, suffixTable):
+            while cityIdx < len(cityMatches) and cityMatches[cityIdx][0] <= position:
+                yield from finishSegment()
+                currentCityName = cityMatches[cityIdx][1]
+                segmentItems = {}
+                print(f"Processing city: {currentCityName} (found at raw offset {windowBase + cityMatches[cityIdx][0]})")
+                cityIdx += 1
+            if currentCityName is None or itemNameBytes in segmentItems:
+                continue
+            markupStartOffset = position + len(itemNameBytes)
+            markupRawValue = None
+            if markupStartOffset + 2 <= len(window):
+                markupRawValue = MARKUP_STRUCT.unpack_from(window, markupStartOffset)[0]
+            segmentItems[itemNameBytes] = (windowBase + markupStartOffset, markupRawValue)
+        while cityIdx < len(cityMatches):
+            yield from finishSegment()
+            currentCityName = cityMatches[cityIdx][1]
+            segmentItems = {}
+            print(f"Processing city: {currentCityName} (found at raw offset {windowBase + cityMatches[cityIdx][0]})")
+            cityIdx += 1
+    if currentCityName is not None:
+        yield from finishSegment()
+
+def extractMarkupsStreaming(filePath, cityNamesList, markupLowerBound, markupUpperBound, chunkSize=STREAM_CHUNK_SIZE, boundaryCityNames=None, onItemIdsFound=None):
+    """Builds the same {city: {item: [markup, offset]}} dict as the in-memory path from iterMarkupRecords."""
+    extractedData = {}
+    for cityName, itemNameStr, markupPercentage, markupStartOffset in iterMarkupRecords(filePath, cityNamesList, markupLowerBound, markupUpperBound, chunkSize, boundaryCityNames, onItemIdsFound):
+        extractedData.setdefault(cityName, {})[itemNameStr] = [markupPercentage, markupStartOffset]
+    return finalizeExtractedData(extractedData)
+
+def extractCitySegment(saveView, cityName, startPos, endPos, uniqueItemNamesBytes, suffixTable, markupLowerBound, markupUpperBound):
+    """
+    Extracts {item: [markup, offset]} for one city segment [startPos, endPos) by scanning only that segment,
+    i.e. the first occurrence of every item name inside it. Items come out in name order like the serial path.
+    """
+    firstPositions = {}
+    for position, itemNameBytes in iterItemOccurrences(saveView.buffer, uniqueItemNamesBytes, ITEM_NAME_REGEX, startPos, endPos, suffixTable):
+        if itemNameBytes not in firstPositions:
+            firstPositions[itemNameBytes] = position
+
+    cityItems = {}
+    fileLength = len(saveView)
+    for itemNameBytes in sorted(firstPositions, key=uniqueItemNamesBytes.get):
+        itemNameStr = uniqueItemNamesBytes[itemNameBytes]
+        markupStartOffset = firstPositions[itemNameBytes] + len(itemNameBytes)
+        if markupStartOffset + 2 > fileLength:
+            print(f"DEBUG: Markup for item '{itemNameStr}' in city '{cityName}' would read past EOF. Offset: {markupStartOffset}")
+            continue
+        markupPercentage = saveView.readMarkupRaw(markupStartOffset) / 100.0
+        if markupLowerBound <= markupPercentage <= markupUpperBound:
+            cityItems[itemNameStr] = [markupPercentage, markupStartOffset]
+        else:
+            print(f"DEBUG: Item '{itemNameStr}' in '{cityName}' markup {markupPercentage:.2f}% is outside bounds ({markupLowerBound}-{markupUpperBound}). Skipping.")
+    return cityItems
+
+segmentWorkerState = {} # per worker process: its own map of the save plus the item tables, set up once by initSegmentWorker
+
+def initSegmentWorker(filePath, uniqueItemNamesBytes, markupLowerBound, markupUpperBound):
+    segmentWorkerState["saveView"] = SaveFileView(filePath) # every worker maps the same file, pages are shared by the OS
+    segmentWorkerState["uniqueItemNamesBytes"] = uniqueItemNamesBytes
+    segmentWorkerState["suffixTable"] = buildSuffixTable(uniqueItemNamesBytes)
+    segmentWorkerState["bounds"] = (markupLowerBound, markupUpperBound)
+
+def extractSegmentBatch(segments):
+    state = segmentWorkerState
+    markupLowerBound, markupUpperBound = state["bounds"]
+    return [
+        extractCitySegment(state["saveView"], cityName, startPos, endPos, state["uniqueItemNamesBytes"], state["suffixTable"], markupLowerBound, markupUpperBound)
+        for cityName, startPos, endPos in segments
+    ]
+
+def iterSegmentsParallel(filePath, segments, uniqueItemNamesBytes, markupLowerBound, markupUpperBound, workers):
+    """
+    Extracts (cityName, startPos, endPos) segments on a process pool and yields their {item: [markup, offset]} dicts
+    in segment order. Workers map the save themselves instead of receiving it pickled. Closing the generator early
+    (e.g. a cancelled run) drops the batches that haven't started.
+    """
+    # contiguous batches of roughly equal byte size, a few per worker so a slow segment doesn't stall the pool
+    targetBatchBytes = max(1, sum(endPos - startPos for _, startPos, endPos in segments) // (workers * 4))
+    batches = [[]]
+    batchBytes = 0
+    for segment in segments:
+        if batches[-1] and batchBytes >= targetBatchBytes:
+            batches.append([])
+            batchBytes = 0
+        batches[-1].append(segment)
+        batchBytes += segment[2] - segment[1]
+
+    print(f"Extracting {len(segments)} city segments in {len(batches)} batches across {workers} worker processes...")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=initSegmentWorker,
+                                                initargs=(filePath, uniqueItemNamesBytes, markupLowerBound, markupUpperBound)) as executor:
+        try:
+            for batchResults in executor.map(extractSegmentBatch, batches): # map keeps batch order, so this is file order
+                yield from batchResults
+        except BaseException: # e.g. a cancelled run: don't wait for the batches nobody will read
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+def extractCitySegmentsParallel(filePath, cityOccurrences, fileLength, uniqueItemNamesBytes, markupLowerBound, markupUpperBound, workers, skippedCityNames=(), onCityExtracted=None):
+    """
+    Spreads the sorted city segments [cityPos, nextCityPos) over a process pool (iterSegmentsParallel) and merges
+    the per-city dicts back in file order.
+    """
+    segments = []
+    for i, cityInfo in enumerate(cityOccurrences):
+        nextCityStartPos = cityOccurrences[i+1]['position'] if i + 1 < len(cityOccurrences) else fileLength
+        if cityInfo['name'] not in skippedCityNames:
+            segments.append((cityInfo['name'], cityInfo['position'], nextCityStartPos))
+
+    extractedData = {}
+    segmentResults = iterSegmentsParallel(filePath, segments, uniqueItemNamesBytes, markupLowerBound, markupUpperBound, workers)
+    try:
+        for segmentIdx, cityItems in enumerate(segmentResults, 1):
+            cityName = segments[segmentIdx - 1][0]
+            if cityItems: # same as the serial path creating the city and dropping it again when empty
+                extractedData.setdefault(cityName, {}).update(cityItems)
+            if onCityExtracted is not None:
+                onCityExtracted(cityName, extractedData.get(cityName, {}), segmentIdx, len(segments))
+    finally:
+        segmentResults.close()
+    return extractedData
+
+def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markupUpperBound, streaming=False, chunkSize=STREAM_CHUNK_SIZE, workers=None, boundaryCityNames=None, onItemIdsFound=None,
+                               onCityExtracted=None):
     """
     Extracts item price markups from a game file based on new logic:
     1. Find all unique item names (e.g., XXXX-name.base, YYYY-name.mod) in the file.
     2. Find all occurrences of specified city names and their positions.
-    3. For each city, iterate through all unique item names:
-       Search for the first occurrence of the item after the city's position.
+    3. Index every occurrence of every item name in one scan of the file (sorted positions per item).
+    4. For each city, iterate through all unique item names:
+       Binary search the first occurrence of the item after the city's position.
        If this occurrence is before the next city's position, extract its markup and offset.
-    4. Filter out false positives.
+    5. Filter out false positives.
+    With streaming=True the save is read in bounded chunks instead (see iterMarkupRecords), with identical results.
+    With workers > 1 the city segments are extracted by a process pool (see extractCitySegmentsParallel), also identical.
+    boundaryCityNames are towns that are not extracted (e.g. removed by a city filter) but whose "Town state" headers
+    still end the previous city's segment, so their items aren't attributed to a neighbour.
+    onItemIdsFound, if given, is called with every item ID in the save (sorted strings) as soon as step 1 is done,
+    so a consumer like the translation stage can start while the cities are still being extracted. The final results
+    only contain a subset of these (bounds and frequency filter).
+    onCityExtracted(cityName, cityItems, segmentsDone, segmentsTotal), if given, is called after every city segment with
+    that city's markups so far (before the frequency filter), for progress and preliminary results. Not in streaming mode.
+    Exceptions it raises abort the extraction (that's how a run is cancelled).
     """
-    extractedData = {}
+    if streaming:
+        try:
+            return extractMarkupsStreaming(filePath, cityNamesList, markupLowerBound, markupUpperBound, chunkSize, boundaryCityNames, onItemIdsFound)
+        except FileNotFoundError:
+            print(f"Error: File not found at {filePath}")
+            return None
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            return None
 
-    genericItemNameRegexStr = rb"(\d+-[^.\x00]+\.(?:base|mod))"
-    genericItemNameRegex = re.compile(genericItemNameRegexStr)
-    
-    print(f"DEBUG: Compiled item regex: {genericItemNameRegex.pattern}")
+    print(f"DEBUG: Compiled item regex: {ITEM_NAME_REGEX.pattern}")
 
     try:
-        with open(filePath, "rb") as f:
-            fileContent = f.read()
+        saveView = SaveFileView(filePath)
     except FileNotFoundError:
         print(f"Error: File not found at {filePath}")
         return None
@@ -115,6 +409,21 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
         print(f"Error reading file: {e}")
         return None
 
+    try:
+        return extractMarkupsFromSaveView(saveView, cityNamesList, markupLowerBound, markupUpperBound, workers, boundaryCityNames, onItemIdsFound, onCityExtracted)
+    finally:
+        saveView.close()
+
+def scanSaveLayout(fileContent, cityNamesList, boundaryCityNames=None, onItemIdsFound=None):
+    """
+    First pass shared by the extraction modes: the unique item names ({bytes: str} in name order) and the sorted
+    "Town state" occurrences, plus the set of boundary-only towns. Returns None on a hard error; the item names or
+    city occurrences come back empty when there is nothing to extract.
+    onItemIdsFound(sortedItemNames) is called as soon as the item names are known, before the towns are searched.
+    """
+    layout = {"uniqueItemNamesBytes": {}, "cityOccurrences": [], "skippedCityNames": set()}
+    genericItemNameRegex = ITEM_NAME_REGEX
+
     uniqueItemNamesSet = set()
     for match in genericItemNameRegex.finditer(fileContent):
         try:
@@ -124,30 +433,22 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
     
     if not uniqueItemNamesSet:
         print(f"Warning: No item patterns matching the .base or .mod suffix found in the file. Cannot extract data.")
-        return {} 
+        return layout
 
     sortedUniqueItemNames = sorted(list(uniqueItemNamesSet))
     print(f"Found {len(sortedUniqueItemNames)} unique item types.")
+    if onItemIdsFound is not None:
+        onItemIdsFound(sortedUniqueItemNames)
 
     cityOccurrences = []
     if not cityNamesList:
         print("Warning: City names list is empty. No cities to search for.")
-        return {}
+        return layout
         
-    try:
-        byteCityNames = [city.encode('utf-8') for city in cityNamesList]
-    except UnicodeEncodeError:
-        print("Error: Could not encode city names to UTF-8.")
-        return None 
-    
-    # Modified regex to search for "Town state <CityName>" and capture only <CityName>
-    # This new structure ensures group(1) always captures the matched city name.
-    cityRegexPattern = b"Town state (" + b"|".join(re.escape(cn) for cn in byteCityNames) + b")"
-    if not cityRegexPattern: 
-        print("Warning: City names list resulted in an empty regex pattern. No cities to search for.")
-        return {}
-
-    cityRegex = re.compile(cityRegexPattern)
+    skippedCityNames = set(boundaryCityNames or ()) - set(cityNamesList)
+    cityRegex = buildCityRegex(list(cityNamesList) + sorted(skippedCityNames))
+    if cityRegex is None:
+        return None
     for match in cityRegex.finditer(fileContent):
         try:
             # Extract the captured group 1, which is the city name itself
@@ -164,7 +465,7 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
 
     if not cityOccurrences:
         print("Warning: No specified city names found in the file.")
-        return {}
+        return layout
 
     cityOccurrences.sort(key=lambda x: x['position'])
     print(f"Found {len(cityOccurrences)} occurrences of specified cities.")
@@ -172,10 +473,53 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
     if cityOccurrences and matplotlibAvailable:
         plot_city_segments(cityOccurrences, len(fileContent))
 
+    uniqueItemNamesBytes = {}
+    for itemNameStr in sortedUniqueItemNames:
+        try:
+            uniqueItemNamesBytes[itemNameStr.encode('utf-8')] = itemNameStr
+        except UnicodeEncodeError:
+            print(f"Warning: Could not encode item name '{itemNameStr}'. Skipping this item.")
+
+    layout["uniqueItemNamesBytes"] = uniqueItemNamesBytes
+    layout["cityOccurrences"] = cityOccurrences
+    layout["skippedCityNames"] = skippedCityNames
+    return layout
+
+def extractMarkupsFromSaveView(saveView, cityNamesList, markupLowerBound, markupUpperBound, workers=None, boundaryCityNames=None, onItemIdsFound=None, onCityExtracted=None):
+    """
+    Extraction body of extractMarkupsFromGameFile, run against an open (memory-mapped) SaveFileView.
+    The map is scanned in place, nothing is copied out except item names and the markups themselves.
+    """
+    extractedData = {}
+    fileContent = saveView.buffer
+    genericItemNameRegex = ITEM_NAME_REGEX
+
+    layout = scanSaveLayout(fileContent, cityNamesList, boundaryCityNames, onItemIdsFound)
+    if layout is None:
+        return None
+    uniqueItemNamesBytes = layout["uniqueItemNamesBytes"]
+    cityOccurrences = layout["cityOccurrences"]
+    skippedCityNames = layout["skippedCityNames"]
+    if not uniqueItemNamesBytes or not cityOccurrences:
+        return {}
+
+    if workers and workers > 1:
+        extractedData = extractCitySegmentsParallel(saveView.filePath, cityOccurrences, len(fileContent), uniqueItemNamesBytes, markupLowerBound, markupUpperBound, workers, skippedCityNames,
+                                                    onCityExtracted)
+        return finalizeExtractedData(extractedData)
+
+    # one scan over the buffer gives the sorted positions of every item name, cities then only need a bisect per item
+    occurrenceIndex = buildItemOccurrenceIndex(fileContent, uniqueItemNamesBytes, genericItemNameRegex)
+    print(f"Indexed {sum(len(positions) for positions in occurrenceIndex.values())} item name occurrences.")
+
     numCities = len(cityOccurrences)
+    segmentsTotal = sum(1 for cityInfo in cityOccurrences if cityInfo['name'] not in skippedCityNames)
+    segmentsDone = 0
     for i, cityInfo in enumerate(cityOccurrences):
         currentCityName = cityInfo['name']
         currentCityPos = cityInfo['position']
+        if currentCityName in skippedCityNames: # filtered out town, its header only ends the previous segment
+            continue
 
         if currentCityName not in extractedData:
             extractedData[currentCityName] = {}
@@ -186,45 +530,130 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
         if i + 1 < numCities:
             nextCityStartPos = cityOccurrences[i+1]['position']
 
-        for itemNameStr in sortedUniqueItemNames:
-            try:
-                itemNameBytes = itemNameStr.encode('utf-8')
-                specificItemRegex = re.compile(re.escape(itemNameBytes))
-            except UnicodeEncodeError:
-                print(f"Warning: Could not encode item name '{itemNameStr}' for regex. Skipping this item for city '{currentCityName}'.")
-                continue 
-
-            itemMatch = specificItemRegex.search(fileContent, pos=currentCityPos)
-
-            if itemMatch:
-                itemFoundStartPos = itemMatch.start()
-                if itemFoundStartPos < nextCityStartPos:
-                    markupStartOffset = itemMatch.end() + 0 # markup 2 bytes after the item name
-                    markupEndOffset = markupStartOffset + 2
-                    
-                    if markupEndOffset <= len(fileContent): # prevent going past EOF
-                        markupBytes = fileContent[markupStartOffset:markupEndOffset]
-                        try:
-                            markupRawValue = struct.unpack('<h', markupBytes)[0] # <h means little-endian short
-                            markupPercentage = markupRawValue / 100.0
-                            if markupLowerBound <= markupPercentage <= markupUpperBound:
-                                # store as [value, offset]
-                                extractedData[currentCityName][itemNameStr] = [markupPercentage, markupStartOffset]
-                            else:
-                                print(f"DEBUG: Item '{itemNameStr}' in '{currentCityName}' markup {markupPercentage:.2f}% is outside bounds ({markupLowerBound}-{markupUpperBound}). Skipping.")
-                        except struct.error:
-                            print(f"DEBUG: Could not unpack markup for item '{itemNameStr}' in city '{currentCityName}' at offset {markupStartOffset}. Bytes: {markupBytes.hex()}")
-                        except Exception as e:
-                            print(f"DEBUG: Unexpected error processing item '{itemNameStr}' in city '{currentCityName}': {e}")
+        for itemNameBytes, itemNameStr in uniqueItemNamesBytes.items():
+            itemFoundStartPos = findFirstOccurrence(occurrenceIndex, itemNameBytes, currentCityPos, nextCityStartPos)
+            if itemFoundStartPos == -1:
+                continue
+
+            markupStartOffset = itemFoundStartPos + len(itemNameBytes) # markup 2 bytes after the item name
+            markupEndOffset = markupStartOffset + 2
+            
+            if markupEndOffset <= len(fileContent): # prevent going past EOF
+                try:
+                    markupRawValue = saveView.readMarkupRaw(markupStartOffset) # little-endian short, unpacked straight from the map
+                    markupPercentage = markupRawValue / 100.0
+                    if markupLowerBound <= markupPercentage <= markupUpperBound:
+                        # store as [value, offset]
+                        extractedData[currentCityName][itemNameStr] = [markupPercentage, markupStartOffset]
                     else:
-                        print(f"DEBUG: Markup for item '{itemNameStr}' in city '{currentCityName}' would read past EOF. Offset: {markupStartOffset}")
+                        print(f"DEBUG: Item '{itemNameStr}' in '{currentCityName}' markup {markupPercentage:.2f}% is outside bounds ({markupLowerBound}-{markupUpperBound}). Skipping.")
+                except struct.error:
+                    print(f"DEBUG: Could not unpack markup for item '{itemNameStr}' in city '{currentCityName}' at offset {markupStartOffset}. Bytes: {bytes(saveView.view[markupStartOffset:markupEndOffset]).hex()}")
+                except Exception as e:
+                    print(f"DEBUG: Unexpected error processing item '{itemNameStr}' in city '{currentCityName}': {e}")
+            else:
+                print(f"DEBUG: Markup for item '{itemNameStr}' in city '{currentCityName}' would read past EOF. Offset: {markupStartOffset}")
         if not extractedData[currentCityName]: # if no items were added for this city
             del extractedData[currentCityName] # remove the city key
+        segmentsDone += 1
+        if onCityExtracted is not None:
+            onCityExtracted(currentCityName, extractedData.get(currentCityName, {}), segmentsDone, segmentsTotal)
                 
+    return finalizeExtractedData(extractedData)
+
+def discoverCityNames(fileContent):
+    """
+    Finds every "Town state <name>" record in the save in one pass, vanilla or modded, in first-seen order.
+    The name runs until the first control byte; save strings are length-prefixed (int32 right before the text),
+    so when that length is shorter than the printable run it is used to cut the name instead.
+    """
+    discoveredCityNames = {}
+    for match in TOWN_STATE_REGEX.finditer(fileContent):
+        nameBytes = match.group(1)
+        if match.start() >= 4:
+            declaredNameLength = struct.unpack_from('<i', fileContent, match.start() - 4)[0] - len(TOWN_STATE_PREFIX)
+            if 0 < declaredNameLength < len(nameBytes):
+                nameBytes = nameBytes[:declaredNameLength]
+        try:
+            cityName = nameBytes.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            print(f"Warning: Could not decode a town name at raw offset {match.start()} using UTF-8. Skipping it.")
+            continue
+        if cityName and cityName not in discoveredCityNames:
+            discoveredCityNames[cityName] = match.start()
+    return list(discoveredCityNames)
+
+def loadDiscoveredCityNames(filePath, cacheFilePath=CITY_CACHE_FILE):
+    """
+    discoverCityNames for a save file, cached per save (keyed by absolute path, size and mtime) in cacheFilePath
+    so later runs on the same save skip discovery. Returns None if the save can't be read.
+    """
+    try:
+        saveStat = os.stat(filePath)
+    except OSError as e:
+        print(f"Error: Could not stat save file {filePath}: {e}")
+        return None
+    saveKey = os.path.abspath(filePath)
+
+    cityCache = {}
+    try:
+        with open(cacheFilePath, 'r', encoding='utf-8') as f:
+            cityCache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cityCache = {}
+
+    cachedEntry = cityCache.get(saveKey)
+    if cachedEntry and cachedEntry.get("size") == saveStat.st_size and cachedEntry.get("mtime") == saveStat.st_mtime:
+        print(f"Using {len(cachedEntry['cities'])} cached town names for {filePath}.")
+        return cachedEntry["cities"]
+
+    print(f"Discovering towns in {filePath}...")
+    try:
+        with SaveFileView(filePath) as saveView:
+            discoveredCityNames = discoverCityNames(saveView.buffer)
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        return None
+    print(f"Discovered {len(discoveredCityNames)} towns: {discoveredCityNames}")
+
+    cityCache[saveKey] = {"size": saveStat.st_size, "mtime": saveStat.st_mtime, "cities": discoveredCityNames}
+    try:
+        with open(cacheFilePath, 'w', encoding='utf-8') as f:
+            json.dump(cityCache, f, indent=2, ensure_ascii=False)
+    except IOError:
+        print(f"Warning: Could not write town cache to {cacheFilePath}")
+    return discoveredCityNames
+
+def filterCityNames(cityNamesList, allowList=None, denyList=None):
+    """Applies the optional allow/deny lists to a (discovered) list of towns, keeping its order."""
+    allowed = set(allowList) if allowList is not None else None
+    denied = set(denyList or ())
+    return [city for city in cityNamesList if (allowed is None or city in allowed) and city not in denied]
+
+def buildCityRegex(cityNamesList):
+    """Compiles the "Town state <CityName>" regex for the given names, group(1) is the city name. None on encoding errors."""
+    try:
+        byteCityNames = [city.encode('utf-8') for city in cityNamesList]
+    except UnicodeEncodeError:
+        print("Error: Could not encode city names to UTF-8.")
+        return None 
+    
+    # Modified regex to search for "Town state <CityName>" and capture only <CityName>
+    # This new structure ensures group(1) always captures the matched city name.
+    # Longest names first so a town whose name starts with another town's name isn't cut short by the alternation.
+    byteCityNames = sorted(byteCityNames, key=len, reverse=True)
+    cityRegexPattern = b"Town state (" + b"|".join(re.escape(cn) for cn in byteCityNames) + b")"
+    return re.compile(cityRegexPattern)
+
+def finalizeExtractedData(extractedData):
     if not any(extractedData.values()):
         print("Extraction complete, but no items were successfully associated with any cities according to the logic.")
         return extractedData 
 
+    return applyCityFrequencyFilter(extractedData)
+
+def applyCityFrequencyFilter(extractedData):
+    """Removes items that appear in fewer than 10% of the cities that have any data (likely false positives)."""
     print("\n--- Applying city appearance frequency filter ---")
     itemCityCounts = {}
     for cityName, items in extractedData.items():
@@ -267,73 +696,140 @@ def extractMarkupsFromGameFile(filePath, cityNamesList, markupLowerBound, markup
 
     return filteredExtractedData
 
-if __name__ == "__main__":
-
-    saveFolderPath = "save"
-    gameFileToProcess = None
-    foundInLocalSave = False
-
-    if os.path.isdir(saveFolderPath): 
-        potentialFiles = [f for f in os.listdir(saveFolderPath) if os.path.isfile(os.path.join(saveFolderPath, f)) and f.endswith(".save")]
-        if potentialFiles:
-            if len(potentialFiles) > 1:
-                print(f"Warning: Multiple .save files found in '{saveFolderPath}'. Using the first one found: '{potentialFiles[0]}'")
-            gameFileToProcess = os.path.join(saveFolderPath, potentialFiles[0])
-            print(f"Using game file from local 'save' folder: {gameFileToProcess}")
-            foundInLocalSave = True
-        else:
-            print(f"Local '{saveFolderPath}' directory is empty or contains no .save files.")
+VANILLA_CITY_NAMES = [
+    "Admag", "Bad Teeth", "Bark", "Black Desert City", "Black Scratch", "Blister Hill",
+    "Brink", "Catun", "Clownsteady", "Crab Town", "Drifter's Last",
+    "Eyesocket", "Flats Lagoon", "Floodlands", "Free Settlement",
+    "Grayflayer Village", "Heft", "Heng", "Hub",
+    "Kral's Chosen", "Last Stand", "Mongrel", "Mourn", "Okran's Fist",
+    "Okran's Gulf", "Okran's Pride", "Okran's Shield", "Rebirth", "Rot",
+    "Shark", "Sho-Battai", "Squin", "Stack", "Stoat", "The Great Fortress",
+    "The Hook", "Tinfist's Hideout", "Trader's Edge", "Treg's Tower",
+    "Waystation", "World's End",
+]
+EXTRACTED_MARKUPS_FILE = "extracted_game_markups.json"
+
+def findGameSaveFile(saveFolderPath=LOCAL_SAVE_FOLDER, saveIndexPath=SAVE_INDEX_FILE):
+    """
+    The save to process: the newest .save in the local saveFolderPath, otherwise the newest .save in the game's
+    save folders (%LOCALAPPDATA%\\kenshi, or Kenshi's Proton prefix on Linux). Returns None if nothing was found.
+    saveIndexPath is the save index (see save_discovery.SaveIndex) kept between runs.
+    """
+    searchRoots = getSaveSearchRoots()
+    saveRecords = listSaves(saveFolderPath, searchRoots, SaveIndex(saveIndexPath))
+    localSaves = [saveRecord for saveRecord in saveRecords if saveRecord["source"] == "local"]
+
+    if localSaves:
+        if len(localSaves) > 1:
+            print(f"Warning: Multiple .save files found in '{saveFolderPath}'. Using the newest one: '{localSaves[0]['path']}'")
+        print(f"Using game file from local 'save' folder: {localSaves[0]['path']}")
+        return localSaves[0]["path"]
+    if os.path.isdir(saveFolderPath):
+        print(f"Local '{saveFolderPath}' directory is empty or contains no .save files.")
     else:
         print(f"Local '{saveFolderPath}' directory was not found.")
 
-    if not foundInLocalSave: 
-        print(f"Attempting to find save file in %LOCALAPPDATA%\\kenshi...")
-        localAppData = os.getenv('LOCALAPPDATA')
-        if localAppData:
-            kenshiAppDataPath = os.path.join(localAppData, 'kenshi')
-            searchPaths = [os.path.join(kenshiAppDataPath, 'save'), kenshiAppDataPath]
-            appdataSaveFiles = []
-
-            for pathToSearch in searchPaths:
-                if os.path.isdir(pathToSearch):
-                    print(f"Searching in: {pathToSearch}")
-                    for filepath in glob.glob(os.path.join(pathToSearch, '**', '*.save'), recursive=True):
-                        appdataSaveFiles.append(filepath)
-                else:
-                    print(f"Directory not found: {pathToSearch}")
-            
-            if appdataSaveFiles:
-                latestFile = max(appdataSaveFiles, key=os.path.getmtime)
-                gameFileToProcess = latestFile
-                print(f"Found latest save file in AppData: {gameFileToProcess}")
-            else:
-                print(f"No .save files found in %LOCALAPPDATA%\\kenshi or its 'save' subdirectory.")
-        else:
-            print("Error: LOCALAPPDATA environment variable not found.")
+    if not searchRoots:
+        print("Error: No Kenshi save folder found (neither %LOCALAPPDATA%\\kenshi nor a Proton prefix).")
+        return None
+    print(f"Searched for save files in: {', '.join(searchRoots)}")
+    if saveRecords:
+        print(f"Found latest save file: {saveRecords[0]['path']} ({len(saveRecords)} saves in total)")
+        return saveRecords[0]["path"]
+    print("No .save files found in the Kenshi save folders.")
+    return None
+
+def resolveCityNames(gameFilePath, discoverCities=True, cityAllowList=None, cityDenyList=None, cityCachePath=CITY_CACHE_FILE):
+    """
+    Towns to extract for a save and the boundary-only towns (discovered but filtered out), see extractMarkupsFromGameFile.
+    Falls back to VANILLA_CITY_NAMES when discovery is off or finds nothing. Discovered towns are cached in cityCachePath.
+    """
+    boundaryCityNames = []
+    if discoverCities:
+        discoveredCityNames = loadDiscoveredCityNames(gameFilePath, cityCachePath) or []
+        cityNames = filterCityNames(discoveredCityNames, cityAllowList, cityDenyList)
+        boundaryCityNames = [city for city in discoveredCityNames if city not in cityNames]
+        if not discoveredCityNames:
+            print("Warning: No towns were discovered in the save, falling back to the vanilla town list.")
+            cityNames = filterCityNames(VANILLA_CITY_NAMES, cityAllowList, cityDenyList)
+    else:
+        cityNames = filterCityNames(VANILLA_CITY_NAMES, cityAllowList, cityDenyList)
+    return cityNames, boundaryCityNames
+
+def runExtraction(gameFilePath, cityNames, markupLowerBound, markupUpperBound, boundaryCityNames=None,
+                  workers=1, incremental=True, useCache=True, streaming=False, onItemIdsFound=None, saveFingerprint=None, onCityExtracted=None,
+                  cacheDir=EXTRACTION_CACHE_DIR, incrementalStatePath=None):
+    """
+    Extraction as configured in __main__: served from the extraction cache when the save is unchanged,
+    otherwise incremental (default), streaming or full/parallel extraction. Returns the results or None on failure.
+    cacheDir is the extraction cache folder, incrementalStatePath the incremental state file (default INCREMENTAL_STATE_FILE).
+    onItemIdsFound and onCityExtracted are passed on to the extractor (see extractMarkupsFromGameFile); they are not called on a cache hit.
+    saveFingerprint saves hashing the save again when the caller already has computeSaveFingerprint's result.
+    """
+    results = None
+    extractionCache = None
+    cacheKey = None
+    if useCache:
+        try:
+            if saveFingerprint is None:
+                saveFingerprint = computeSaveFingerprint(gameFilePath)
+            extractionCache = ExtractionCache(cacheDir)
+            cacheKey = makeExtractionCacheKey(saveFingerprint, cityNames, markupLowerBound, markupUpperBound, boundaryCityNames)
+            results = extractionCache.get(cacheKey)
+        except OSError as e:
+            print(f"Warning: Could not fingerprint {gameFilePath} for the extraction cache: {e}")
+        if results is not None:
+            print(f"Save unchanged since a previous run, serving extraction from cache (key {cacheKey}).")
+            return results
+
+    if incremental and not streaming:
+        from incremental_extraction import INCREMENTAL_STATE_FILE, extractMarkupsIncremental # imported here, it builds on this module
+        results = extractMarkupsIncremental(gameFilePath, cityNames, markupLowerBound, markupUpperBound, boundaryCityNames=boundaryCityNames,
+                                            statePath=incrementalStatePath or INCREMENTAL_STATE_FILE, onItemIdsFound=onItemIdsFound,
+                                            onCityExtracted=onCityExtracted, workers=workers)
+    else:
+        results = extractMarkupsFromGameFile(gameFilePath, cityNames, markupLowerBound, markupUpperBound, streaming=streaming, workers=workers,
+                                             boundaryCityNames=boundaryCityNames, onItemIdsFound=onItemIdsFound, onCityExtracted=onCityExtracted)
+    if results is not None and extractionCache is not None and cacheKey is not None:
+        extractionCache.put(cacheKey, results, os.path.abspath(gameFilePath))
+    return results
+
+def writeExtractedMarkups(results, outputFilename=EXTRACTED_MARKUPS_FILE):
+    try:
+        with open(outputFilename, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+        print(f"\nData also saved to: {outputFilename}")
+        return True
+    except IOError:
+        print(f"\nCould not write output to file: {outputFilename}")
+        return False
+
+if __name__ == "__main__":
+
+    saveFolderPath = LOCAL_SAVE_FOLDER
+    gameFileToProcess = findGameSaveFile(saveFolderPath)
 
     if not gameFileToProcess:
         print(f"\nError: No game save file could be automatically detected.")
         print(f"Please ensure a '.save' file exists in the '{saveFolderPath}' directory")
-        print(f"or in your Kenshi AppData directory (usually %LOCALAPPDATA%\\kenshi or %LOCALAPPDATA%\\kenshi\\save).")
+        print(f"or in your Kenshi AppData directory (usually %LOCALAPPDATA%\\kenshi\\save, or the Proton prefix on Linux).")
         exit()
     
     print(f"Using game file: {gameFileToProcess}")
     gameFilePath = gameFileToProcess 
 
-    cityNames = [
-        "Admag", "Bad Teeth", "Bark", "Black Desert City", "Black Scratch", "Blister Hill",
-        "Brink", "Catun", "Clownsteady", "Crab Town", "Drifter's Last",
-        "Eyesocket", "Flats Lagoon", "Floodlands", "Free Settlement",
-        "Grayflayer Village", "Heft", "Heng", "Hub",
-        "Kral's Chosen", "Last Stand", "Mongrel", "Mourn", "Okran's Fist",
-        "Okran's Gulf", "Okran's Pride", "Okran's Shield", "Rebirth", "Rot",
-        "Shark", "Sho-Battai", "Squin", "Stack", "Stoat", "The Great Fortress",
-        "The Hook", "Tinfist's Hideout", "Trader's Edge", "Treg's Tower",
-        "Waystation", "World's End",
-    ]
+    discoverCities = True # find every "Town state <name>" in the save (vanilla and modded towns), cached per save
+    cityAllowList = None # optional filter on discovered towns, e.g. VANILLA_CITY_NAMES to skip modded ones, None keeps all
+    cityDenyList = [] # discovered towns to leave out
+
+    cityNames, boundaryCityNames = resolveCityNames(gameFilePath, discoverCities, cityAllowList, cityDenyList)
 
     markupLowerBoundConfig = 1.0 
     markupUpperBoundConfig = 175.0 
+    extractionWorkers = 1 # >1 extracts city segments in that many worker processes
+    incrementalExtraction = True # only re-scan city segments that changed since the previous extraction (incremental_extraction_state.json)
+    useExtractionCache = True # serve unchanged saves from the extraction cache instead of re-scanning them
+    streamingExtraction = False # read the save in bounded chunks instead of mapping it whole (for very large saves / small machines)
 
     print(f"Starting data extraction for file: {gameFilePath}")
     print(f"Searching for cities: {cityNames}")
@@ -344,9 +840,10 @@ if __name__ == "__main__":
         if gameFilePath is None:
             print("Error: No game file was identified to process.")
         if not cityNames:
-            print("Please open the script and populate the cityNames list.")
+            print("No towns left to search. Check discoverCities, VANILLA_CITY_NAMES and the cityAllowList/cityDenyList filters.")
     else:
-        results = extractMarkupsFromGameFile(gameFilePath, cityNames, markupLowerBoundConfig, markupUpperBoundConfig)
+        results = runExtraction(gameFilePath, cityNames, markupLowerBoundConfig, markupUpperBoundConfig, boundaryCityNames,
+                                workers=extractionWorkers, incremental=incrementalExtraction, useCache=useExtractionCache, streaming=streamingExtraction)
 
         if results is not None: 
             if results: 
@@ -355,13 +852,7 @@ if __name__ == "__main__":
                 print("\nFinal JSON Output:")
                 print(jsonOutput)
 
-                outputFilename = "extracted_game_markups.json"
-                try:
-                    with open(outputFilename, "w") as outfile:
-                        json.dump(results, outfile, indent=2)
-                    print(f"\nData also saved to: {outputFilename}")
-                except IOError:
-                    print(f"\nCould not write output to file: {outputFilename}")
+                writeExtractedMarkups(results)
             else: 
                 print("\n--- EXTRACTION COMPLETE ---")
                 print("No data was extracted. This could be due to no items/cities matching the criteria or other logic paths.")
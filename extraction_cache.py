@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import time
+
+EXTRACTION_CACHE_DIR = "extraction_cache"
+EXTRACTION_CACHE_INDEX = "index.json"
+EXTRACTION_CACHE_VERSION = 1 # bump when the extraction output for the same save/config would change
+DEFAULT_MAX_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_CACHE_ENTRIES = 32
+
+def makeExtractionCacheKey(saveFingerprint, cityNamesList, markupLowerBound, markupUpperBound, boundaryCityNames=None):
+    """Cache key for one extraction: the save's size/mtime/content hash plus everything that changes the output."""
+    keySource = json.dumps({
+        "version": EXTRACTION_CACHE_VERSION,
+        "save": [saveFingerprint["size"], saveFingerprint["mtime"], saveFingerprint["hash"]],
+        "cities": list(cityNamesList),
+        "boundaryCities": sorted(boundaryCityNames or ()),
+        "bounds": [markupLowerBound, markupUpperBound],
+    }, sort_keys=True)
+    return hashlib.blake2b(keySource.encode('utf-8'), digest_size=16).hexdigest()
+
+class ExtractionCache:
+    """
+    Persistent cache of extractMarkupsFromGameFile results, one JSON file per key plus an index with sizes and
+    last-use times. Least recently used entries are evicted once the cache exceeds maxBytes or maxEntries.
+    """
+    def __init__(self, cacheDir=EXTRACTION_CACHE_DIR, maxBytes=DEFAULT_MAX_CACHE_BYTES, maxEntries=DEFAULT_MAX_CACHE_ENTRIES):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.indexPath = os.path.join(cacheDir, EXTRACTION_CACHE_INDEX)
+        self.index = self.loadIndex()
+
+    def loadIndex(self):
+        try:
+            with open(self.indexPath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def saveIndex(self):
+        try:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=2, ensure_ascii=False)
+            os.replace(tempPath, self.indexPath)
+        except OSError as e:
+            print(f"Warning: Could not write extraction cache index {self.indexPath}: {e}")
+
+    def entryPath(self, key):
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    def get(self, key):
+        """Cached extraction results for key, or None on a miss."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(self.entryPath(key), 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            print(f"Warning: Extraction cache entry {key} is missing or corrupted. Dropping it.")
+            self.index.pop(key, None)
+            self.saveIndex()
+            return None
+        entry["lastUsed"] = time.time()
+        self.saveIndex()
+        return results
+
+    def put(self, key, results, savePath=None):
+        try:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            with open(self.entryPath(key), 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False)
+            entrySize = os.path.getsize(self.entryPath(key))
+        except OSError as e:
+            print(f"Warning: Could not write extraction cache entry {key}: {e}")
+            return
+        self.index[key] = {"size": entrySize, "lastUsed": time.time(), "savePath": savePath}
+        self.evict()
+        self.saveIndex()
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits maxBytes and maxEntries."""
+        totalBytes = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["lastUsed"]):
+            if totalBytes <= self.maxBytes and len(self.index) <= self.maxEntries:
+                break
+            totalBytes -= self.index[key]["size"]
+            del self.index[key]
+            try:
+                os.remove(self.entryPath(key))
+            except FileNotFoundError:
+                pass
+            print(f"Evicted extraction cache entry {key}.")
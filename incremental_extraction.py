@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+
+from save_access import SaveFileView
+from extract_game_data import (ITEM_NAME_REGEX, TOWN_STATE_PREFIX, buildCityRegex, buildSuffixTable, extractCitySegment, finalizeExtractedData,
+                               iterSegmentsParallel)
+
+INCREMENTAL_STATE_FILE = "incremental_extraction_state.json"
+INCREMENTAL_STATE_VERSION = 3
+
+def findTailEnd(buffer, endPos, tailBytes):
+    """End of what a scan for matches starting before endPos can read: matches never contain a null byte, so up to the first null at or after endPos, plus tailBytes."""
+    tailNullPos = buffer.find(b"\x00", endPos)
+    return len(buffer) if tailNullPos == -1 else min(len(buffer), tailNullPos + tailBytes)
+
+def findTownHeaders(buffer, cityRegex):
+    """
+    [[cityName, position]] of every cityRegex match, exactly as cityRegex.finditer over the whole file finds them.
+    Every match starts with TOWN_STATE_PREFIX, so the regex is only tried where bytes.find lands instead of at every byte.
+    """
+    towns = []
+    searchPos = 0
+    while True:
+        prefixPos = buffer.find(TOWN_STATE_PREFIX, searchPos)
+        if prefixPos == -1:
+            return towns
+        match = cityRegex.match(buffer, prefixPos)
+        if match is None:
+            searchPos = prefixPos + 1
+            continue
+        try:
+            towns.append([match.group(1).decode('utf-8'), prefixPos])
+        except UnicodeDecodeError:
+            print(f"Warning: Could not decode a potential city name at raw offset {prefixPos} using UTF-8.")
+        searchPos = match.end() # finditer doesn't overlap matches
+
+def hashSegment(saveView, startPos, endPos):
+    """
+    (digest, digestStart, digestEnd) for the segment [startPos, endPos): blake2b of every byte its item-name scan and
+    markup reads depend on, from the last null before it (matches never contain a null byte, so a scan from there is in
+    step with a scan of the whole file) to two bytes past the first null at or after endPos (a match's markup).
+    """
+    buffer = saveView.buffer
+    digestStart = max(buffer.rfind(b"\x00", 0, startPos), 0)
+    digestEnd = findTailEnd(buffer, endPos, 2)
+    return hashlib.blake2b(saveView.view[digestStart:digestEnd], digest_size=16).hexdigest(), digestStart, digestEnd
+
+def scanItemNames(buffer, startPos, endPos):
+    """Sorted item names whose match starts in [startPos, endPos), exactly as a scan of the whole file finds them."""
+    itemNames = set()
+    for match in ITEM_NAME_REGEX.finditer(buffer, max(buffer.rfind(b"\x00", 0, startPos), 0)):
+        matchStart = match.start()
+        if matchStart >= endPos:
+            break
+        if matchStart < startPos:
+            continue
+        try:
+            itemNames.add(match.group(1).decode('utf-8'))
+        except UnicodeDecodeError:
+            print(f"Warning: Could not decode an item name at raw offset {matchStart}. Skipping this potential item.")
+    return sorted(itemNames)
+
+def loadIncrementalState(statePath):
+    try:
+        with open(statePath, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if state.get("version") != INCREMENTAL_STATE_VERSION:
+        return None
+    return state
+
+def saveIncrementalState(statePath, state):
+    try:
+        tempPath = statePath + ".tmp"
+        with open(tempPath, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tempPath, statePath)
+    except OSError as e:
+        print(f"Warning: Could not write incremental extraction state to {statePath}: {e}")
+
+def extractMarkupsIncremental(filePath, cityNamesList, markupLowerBound, markupUpperBound, boundaryCityNames=None, statePath=INCREMENTAL_STATE_FILE, onItemIdsFound=None,
+                              onCityExtracted=None, workers=None):
+    """
+    Same result as extractMarkupsFromGameFile, but only re-scans the city segments that changed since the extraction
+    stored in statePath. Segments are anchored by content, not position: the file is split at its "Town state" headers
+    (found with bytes.find), each segment is keyed by its town and which occurrence of that town it is, and hashed
+    over the bytes its scan depends on (hashSegment). A segment whose key and digest match the stored one:
+        - keeps its stored item names, the item-name scan (the layout pass) only runs over changed segments
+        - keeps its stored markups with every offset moved by how far its header moved, so bytes inserted or removed
+          earlier in the save (Kenshi rewrites quicksaves with the layout shifted a little) don't cost a re-scan
+    unless an item name that appeared or disappeared elsewhere is a suffix of a name inside it (suffix occurrences
+    count as items of their own). A different town list, boundary towns or markup bounds starts over. With workers > 1
+    the segments that need extracting run on a process pool (iterSegmentsParallel).
+    onCityExtracted is called after every segment like in extractMarkupsFromGameFile; if it raises, the state isn't saved.
+    """
+    if not cityNamesList:
+        print("Warning: City names list is empty. No cities to search for.")
+        return {}
+    skippedCityNames = set(boundaryCityNames or ()) - set(cityNamesList)
+    cityRegex = buildCityRegex(list(cityNamesList) + sorted(skippedCityNames))
+    if cityRegex is None:
+        return None
+    try:
+        saveView = SaveFileView(filePath)
+    except FileNotFoundError:
+        print(f"Error: File not found at {filePath}")
+        return None
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        return None
+
+    try:
+        buffer = saveView.buffer
+        fileLength = len(saveView)
+        stateConfig = {
+            "cities": list(cityNamesList),
+            "boundaryCities": sorted(skippedCityNames),
+            "bounds": [markupLowerBound, markupUpperBound],
+        }
+        previousState = loadIncrementalState(statePath)
+        if previousState is not None and not all(previousState.get(key) == value for key, value in stateConfig.items()):
+            print("Previous extraction state was made with different towns or bounds. Re-scanning everything.")
+            previousState = None
+        previousItemNames = previousState["itemNames"] if previousState is not None else []
+        previousSegments = {tuple(segment["key"]): segment for segment in previousState["segments"]} if previousState is not None else {}
+
+        # the segments between town headers, plus whatever comes before the first one (item names only)
+        towns = findTownHeaders(buffer, cityRegex)
+        segmentBounds = [((None, 0), 0, towns[0][1] if towns else fileLength)] if not towns or towns[0][1] > 0 else []
+        townOrdinals = {}
+        for townIdx, (cityName, startPos) in enumerate(towns):
+            townOrdinals[cityName] = townOrdinals.get(cityName, 0) + 1
+            endPos = towns[townIdx + 1][1] if townIdx + 1 < len(towns) else fileLength
+            segmentBounds.append(((cityName, townOrdinals[cityName]), startPos, endPos))
+
+        segments = []
+        for key, startPos, endPos in segmentBounds:
+            digest, digestStart, digestEnd = hashSegment(saveView, startPos, endPos)
+            segment = {"key": list(key), "start": startPos, "end": endPos, "digestStart": digestStart, "digestEnd": digestEnd, "digest": digest}
+            previousSegment = previousSegments.get(key)
+            if (previousSegment is not None and previousSegment["digest"] == digest
+                    and previousSegment["end"] - previousSegment["start"] == endPos - startPos
+                    and previousSegment["start"] - previousSegment["digestStart"] == startPos - digestStart
+                    and previousSegment["digestEnd"] - previousSegment["start"] == digestEnd - startPos):
+                segment["previous"] = previousSegment
+                segment["itemNames"] = [previousItemNames[nameIdx] for nameIdx in previousSegment["itemNames"]]
+            else:
+                segment["itemNames"] = scanItemNames(buffer, startPos, endPos)
+            segments.append(segment)
+        rescannedCount = sum(1 for segment in segments if "previous" not in segment)
+
+        uniqueItemNames = sorted({itemName for segment in segments for itemName in segment["itemNames"]})
+        if not uniqueItemNames:
+            print(f"Warning: No item patterns matching the .base or .mod suffix found in the file. Cannot extract data.")
+            return {}
+        print(f"Found {len(uniqueItemNames)} unique item types ({rescannedCount} of {len(segments)} segments scanned).")
+        if onItemIdsFound is not None:
+            onItemIdsFound(uniqueItemNames)
+        uniqueItemNamesBytes = {}
+        for itemNameStr in uniqueItemNames:
+            try:
+                uniqueItemNamesBytes[itemNameStr.encode('utf-8')] = itemNameStr
+            except UnicodeEncodeError:
+                print(f"Warning: Could not encode item name '{itemNameStr}'. Skipping this item.")
+        if not towns:
+            print("Warning: No specified city names found in the file.")
+            return {}
+        print(f"Found {len(towns)} occurrences of specified cities.")
+
+        # item names that came or went: a segment holding a name they are a proper suffix of yields different occurrences
+        changedItemNames = set(uniqueItemNames).symmetric_difference(previousItemNames) if previousState is not None else set()
+        suffixAffected = {}
+        def hasChangedSuffix(itemName):
+            if itemName not in suffixAffected:
+                suffixAffected[itemName] = any(itemName[offset:] in changedItemNames for offset in range(1, len(itemName)))
+            return suffixAffected[itemName]
+
+        citySegments = [segment for segment in segments if segment["key"][0] is not None and segment["key"][0] not in skippedCityNames]
+        rebasedCount = 0
+        for segment in citySegments:
+            previousSegment = segment.get("previous")
+            if previousSegment is None or any(hasChangedSuffix(itemName) for itemName in segment["itemNames"]):
+                segment["items"] = None # needs extracting
+                continue
+            shift = segment["start"] - previousSegment["start"]
+            segment["items"] = {itemName: [markup, offset + shift] for itemName, (markup, offset) in previousSegment["items"].items()}
+            rebasedCount += shift != 0
+        dirtySegments = [(segment["key"][0], segment["start"], segment["end"]) for segment in citySegments if segment["items"] is None]
+        reusedCount = len(citySegments) - len(dirtySegments)
+
+        if dirtySegments and workers and workers > 1 and len(dirtySegments) > 1:
+            extractedSegments = iterSegmentsParallel(filePath, dirtySegments, uniqueItemNamesBytes, markupLowerBound, markupUpperBound, workers)
+        else:
+            suffixTable = buildSuffixTable(uniqueItemNamesBytes) if dirtySegments else None
+            extractedSegments = (extractCitySegment(saveView, cityName, startPos, endPos, uniqueItemNamesBytes, suffixTable, markupLowerBound, markupUpperBound)
+                                 for cityName, startPos, endPos in dirtySegments)
+        extractedData = {}
+        try:
+            for segmentIdx, segment in enumerate(citySegments, 1):
+                cityName = segment["key"][0]
+                if segment["items"] is None:
+                    print(f"Processing city: {cityName} (found at raw offset {segment['start']})")
+                    segment["items"] = next(extractedSegments)
+                if segment["items"]:
+                    extractedData.setdefault(cityName, {}).update(segment["items"])
+                if onCityExtracted is not None:
+                    onCityExtracted(cityName, extractedData.get(cityName, {}), segmentIdx, len(citySegments))
+        finally:
+            extractedSegments.close()
+
+        print(f"Incremental extraction: reused {reusedCount} of {len(citySegments)} city segments ({rebasedCount} moved, offsets rebased), "
+              f"re-scanned {len(dirtySegments)}.")
+        itemNameIndex = {itemName: nameIdx for nameIdx, itemName in enumerate(uniqueItemNames)}
+        storedSegments = []
+        for segment in segments:
+            segment.pop("previous", None)
+            storedSegments.append(dict(segment, itemNames=[itemNameIndex[itemName] for itemName in segment["itemNames"]], items=segment.get("items")))
+        saveIncrementalState(statePath, dict(stateConfig, version=INCREMENTAL_STATE_VERSION, savePath=os.path.abspath(filePath),
+                                             itemNames=uniqueItemNames, segments=storedSegments))
+    finally:
+        saveView.close()
+
+    return finalizeExtractedData(extractedData)
@@ -1,10 +1,15 @@
 import json
 import csv
+import contextlib
 import os
+import markup_matrix
+from markup_matrix import MarkupMatrix, MARKUP_SCALE
+from markup_sidecar import MARKUP_SIDECAR_FILE, readMarkupSidecar
 
-def convertJsonToCsv(jsonFilePath, csvFilePath, citiesHorizontal=False): # this entire file is AI written based on the other files I wrote myself
+EXPORT_FORMATS = ("csvCityRows", "csvItemRows", "tsvCityRows", "tsvItemRows", "jsonl", "npz")
+
+def convertJsonToCsv(jsonFilePath, csvFilePath, citiesHorizontal=False, extraExports=None): # this entire file is AI written based on the other files I wrote myself
     print(f"Starting JSON to CSV conversion")
-    print(f"Cities horizontal: {citiesHorizontal}")
     print(f"Attempting to load JSON data from: {jsonFilePath}")
     try:
         with open(jsonFilePath, 'r', encoding='utf-8') as f:
@@ -20,102 +25,181 @@ def convertJsonToCsv(jsonFilePath, csvFilePath, citiesHorizontal=False): # this
         print(f"Error reading {jsonFilePath}: {e}")
         return
 
+    print(f"Cities horizontal: {citiesHorizontal}")
+    exportMarkups(data, {csvFormatFor(citiesHorizontal): csvFilePath, **(extraExports or {})})
+    print(f"--- JSON to CSV conversion finished ---")
+
+def csvFormatFor(citiesHorizontal):
+    """The export format matching the old citiesHorizontal flag (True: one row per city, items as columns)."""
+    return "csvCityRows" if citiesHorizontal else "csvItemRows"
+
+def unknownExportFormats(outputPaths):
+    """The keys of outputPaths that are not in EXPORT_FORMATS, in order."""
+    return [exportFormat for exportFormat in outputPaths if exportFormat not in EXPORT_FORMATS]
+
+def writeMarkupsNpz(matrix, npzPath, cityOrder, itemOrder):
+    """
+    Writes the matrix in sorted city x item order as an .npz: markups (float64, NaN where a town has no markup),
+    rawMarkups, offsets, present, cityNames and itemNames. Needs NumPy, returns True if the file was written.
+    """
+    views = matrix.numpyViews()
+    if views is None:
+        print(f"Warning: NumPy is not installed, skipping {npzPath}.")
+        return False
+    np = markup_matrix.np
+    grid = np.ix_(np.asarray(cityOrder, dtype=np.intp), np.asarray(itemOrder, dtype=np.intp))
+    present = views["present"][grid]
+    rawMarkups = views["rawMarkups"][grid]
+    markups = np.where(present, rawMarkups / MARKUP_SCALE, np.nan)
+    try:
+        with open(npzPath, 'wb') as f: # a file object keeps np.savez from appending .npz to the name
+            np.savez(f, markups=markups, rawMarkups=rawMarkups, offsets=views["offsets"][grid], present=present,
+                     cityNames=np.array([matrix.cityNames[cityIdx] for cityIdx in cityOrder]),
+                     itemNames=np.array([matrix.itemNames[itemIdx] for itemIdx in itemOrder]))
+        return True
+    except OSError as e:
+        print(f"Error: Could not write {npzPath}: {e}")
+        return False
+
+def exportMarkups(data, outputPaths):
+    """
+    Writes markups ({city: {itemName: [markup, offset]}} or a MarkupMatrix) to every format in outputPaths
+    ({format: path}, formats from EXPORT_FORMATS) in one go:
+        csvCityRows / tsvCityRows   one row per city, items as columns (citiesHorizontal=True)
+        csvItemRows / tsvItemRows   one row per item, cities as columns
+        jsonl                       one {"city", "item", "markup", "offset"} record per markup
+        npz                         the whole matrix as NumPy arrays (only when NumPy is installed)
+    Cities and items are sorted once for all formats. The city-row tables and the JSON Lines file share a single pass
+    over the cities, each row built once and handed to every writer; the item-row tables read their columns straight
+    from the matrix arrays. Only one row is held at a time, so memory stays at the matrix itself however many items
+    there are. Unknown formats are skipped with a warning and the rest still written. Returns {format: path} of the
+    files written.
+    """
+    unknownFormats = unknownExportFormats(outputPaths)
+    if unknownFormats:
+        print(f"Warning: Skipping unknown export format(s) {unknownFormats}, expected any of {list(EXPORT_FORMATS)}.")
+        outputPaths = {exportFormat: path for exportFormat, path in outputPaths.items() if exportFormat in EXPORT_FORMATS}
+        if not outputPaths:
+            return {}
     if not data:
-        print("JSON data is empty. CSV will not be generated.")
-        return
+        print("Markup data is empty. Nothing will be exported.")
+        return {}
 
     # Collect all unique item names (row headers) and city names (column headers)
     print("Collecting city names and item names...")
-    allItemNames = set()
-    cityNamesOrdered = [] # Keep order of cities as they appear in JSON for consistency, or sort if preferred
-
-    # Determine city names (column headers) - assuming first city entry has all/most items to get a good list
-    # Or, iterate through all to be sure, then sort them.
-    tempCityNames = list(data.keys())
-    if not tempCityNames:
-        print("No city data found in JSON. CSV will not be generated.")
-        return
-    
+    matrix = data if isinstance(data, MarkupMatrix) else MarkupMatrix.fromNestedDict(data)
+    if not matrix.cityNames:
+        print("No city data found. Nothing will be exported.")
+        return {}
+
     # Sort city names for consistent column order
-    cityNamesOrdered = sorted(tempCityNames)
+    cityOrder = sorted(range(len(matrix.cityNames)), key=matrix.cityNames.__getitem__)
+    cityNamesOrdered = [matrix.cityNames[cityIdx] for cityIdx in cityOrder]
     print(f"Found {len(cityNamesOrdered)} cities: {cityNamesOrdered}")
 
-    for city, items in data.items():
-        for itemName in items.keys():
-            allItemNames.add(itemName)
-    
-    sortedItemNames = sorted(list(allItemNames))
+    itemOrder = sorted(range(len(matrix.itemNames)), key=matrix.itemNames.__getitem__)
+    sortedItemNames = [matrix.itemNames[itemIdx] for itemIdx in itemOrder]
     if not sortedItemNames:
-        print("No item names found in JSON data. CSV will not be generated.")
-        return
+        print("No item names found. Nothing will be exported.")
+        return {}
     print(f"Found {len(sortedItemNames)} unique item names.")
 
-    print(f"Attempting to write data to CSV file: {csvFilePath}")
+    writtenPaths = {}
+    if "npz" in outputPaths and writeMarkupsNpz(matrix, outputPaths["npz"], cityOrder, itemOrder):
+        writtenPaths["npz"] = outputPaths["npz"]
+    textFormats = [exportFormat for exportFormat in outputPaths if exportFormat != "npz"]
+    if not textFormats:
+        return writtenPaths
+
+    itemCount = len(matrix.itemNames)
+    rawMarkups = matrix.rawMarkups
+    offsets = matrix.offsets
+    present = matrix.present
+    print(f"Attempting to write {', '.join(textFormats)}: {[outputPaths[exportFormat] for exportFormat in textFormats]}")
     try:
-        with open(csvFilePath, 'w', newline='', encoding='utf-8') as csvfile:
-            csvWriter = csv.writer(csvfile)
+        with contextlib.ExitStack() as openFiles:
+            cityRowWriters = []
+            itemRowWriters = []
+            jsonlFile = None
+            for exportFormat in textFormats:
+                if exportFormat == "jsonl":
+                    jsonlFile = openFiles.enter_context(open(outputPaths[exportFormat], 'w', encoding='utf-8'))
+                    continue
+                outputFile = openFiles.enter_context(open(outputPaths[exportFormat], 'w', newline='', encoding='utf-8'))
+                tableWriter = csv.writer(outputFile, delimiter='\t' if exportFormat.startswith("tsv") else ',')
+                (cityRowWriters if exportFormat.endswith("CityRows") else itemRowWriters).append(tableWriter)
 
-            if citiesHorizontal:
+            if cityRowWriters or jsonlFile is not None:
                 # Items as columns, Cities as rows
                 headerRow = [''] + sortedItemNames
-                print(f"Writing header row (items horizontal): {headerRow}")
-                csvWriter.writerow(headerRow)
-
-                for cityName in cityNamesOrdered:
-                    rowToWrite = [cityName]
-                    for itemName in sortedItemNames:
-                        markup_entry = data.get(cityName, {}).get(itemName)
-                        actual_markup_value = ''
-                        if isinstance(markup_entry, list) and len(markup_entry) > 0:
-                            actual_markup_value = markup_entry[0] # Get the value
-                        elif markup_entry is not None and not isinstance(markup_entry, list):
-                            # Handle case where data might be old format (not a list)
-                            actual_markup_value = markup_entry 
-                        rowToWrite.append(actual_markup_value)
-                    csvWriter.writerow(rowToWrite)
-            else:
+                for tableWriter in cityRowWriters:
+                    tableWriter.writerow(headerRow)
+                itemNamesJson = [json.dumps(itemName, ensure_ascii=False) for itemName in sortedItemNames] if jsonlFile is not None else None
+                for cityIdx in cityOrder:
+                    rowStart = cityIdx * itemCount
+                    rowToWrite = [matrix.cityNames[cityIdx]]
+                    rowToWrite.extend(rawMarkups[rowStart + itemIdx] / MARKUP_SCALE if present[rowStart + itemIdx] else ''
+                                      for itemIdx in itemOrder)
+                    for tableWriter in cityRowWriters:
+                        tableWriter.writerow(rowToWrite)
+                    if jsonlFile is not None:
+                        cityNameJson = json.dumps(matrix.cityNames[cityIdx], ensure_ascii=False)
+                        jsonlFile.write("".join(
+                            f'{{"city": {cityNameJson}, "item": {itemNamesJson[position]}, "markup": {markupValue!r}, '
+                            f'"offset": {offsets[rowStart + itemOrder[position]]}}}\n'
+                            for position, markupValue in enumerate(rowToWrite[1:]) if markupValue != ''))
+
+            if itemRowWriters:
                 # Cities as columns, Items as rows (original logic)
                 headerRow = [''] + cityNamesOrdered
-                print(f"Writing header row (cities horizontal): {headerRow}")
-                csvWriter.writerow(headerRow)
-
-                # Write data rows (item name, then markups for each city)
-                for itemName in sortedItemNames:
-                    rowToWrite = [itemName]
-                    for cityName in cityNamesOrdered:
-                        # Get the markup for the item in the current city
-                        markup_entry = data.get(cityName, {}).get(itemName)
-                        actual_markup_value = ''
-                        if isinstance(markup_entry, list) and len(markup_entry) > 0:
-                            actual_markup_value = markup_entry[0] # Get the value
-                        elif markup_entry is not None and not isinstance(markup_entry, list):
-                            # Handle case where data might be old format (not a list)
-                            actual_markup_value = markup_entry
-                        rowToWrite.append(actual_markup_value)
-                    # print(f"Writing data row for '{itemName}': {rowToWrite[:5]}...") # Log a snippet
-                    csvWriter.writerow(rowToWrite)
-            
-        print(f"Successfully wrote data to {csvFilePath}")
-
-    except IOError:
-        print(f"Error: Could not write to CSV file at {csvFilePath}. Check permissions or path.")
+                for tableWriter in itemRowWriters:
+                    tableWriter.writerow(headerRow)
+                rowStarts = [cityIdx * itemCount for cityIdx in cityOrder]
+                for itemIdx in itemOrder:
+                    rowToWrite = [matrix.itemNames[itemIdx]]
+                    rowToWrite.extend(rawMarkups[rowStart + itemIdx] / MARKUP_SCALE if present[rowStart + itemIdx] else ''
+                                      for rowStart in rowStarts)
+                    for tableWriter in itemRowWriters:
+                        tableWriter.writerow(rowToWrite)
+
+        for exportFormat in textFormats:
+            writtenPaths[exportFormat] = outputPaths[exportFormat]
+            print(f"Successfully wrote {exportFormat} to {outputPaths[exportFormat]}")
+    except OSError as e:
+        print(f"Error: Could not write the exports ({e}). Check permissions or paths.")
     except Exception as e:
-        print(f"An unexpected error occurred during CSV writing: {e}")
-    
-    print(f"--- JSON to CSV conversion finished ---")
+        print(f"An unexpected error occurred during export: {e}")
+    return writtenPaths
+
+def writeMarkupsCsv(data, csvFilePath, citiesHorizontal=False):
+    """
+    Writes markups ({city: {itemName: [markup, offset]}} or a MarkupMatrix) as a city x item CSV table.
+    Shorthand for exportMarkups with a single CSV. Returns True if the file was written.
+    """
+    print(f"Cities horizontal: {citiesHorizontal}")
+    return csvFilePath in exportMarkups(data, {csvFormatFor(citiesHorizontal): csvFilePath}).values()
 
 if __name__ == "__main__":
     # --- USER CONFIGURATION ---
     inputJsonFile = "translated_game_markups.json" 
+    inputSidecarFile = MARKUP_SIDECAR_FILE # used instead of the JSON when it's newer (or the JSON wasn't written)
     outputCsvFile = "game_markups_spreadsheet.csv"
     citiesHorizontal = True # Set to True to have items as columns and cities as rows
+    # Other formats written in the same pass, {format: path}. Formats: csvCityRows, csvItemRows, tsvCityRows, tsvItemRows, jsonl, npz (needs NumPy)
+    extraExports = {} # e.g. {"csvItemRows": "game_markups_by_item.csv", "jsonl": "game_markups.jsonl", "npz": "game_markups.npz"}
     # --- END USER CONFIGURATION ---
 
-    print(f"Input JSON: {os.path.abspath(inputJsonFile)}")
+    sidecar = None
+    if os.path.exists(inputSidecarFile) and (not os.path.exists(inputJsonFile) or os.path.getmtime(inputSidecarFile) >= os.path.getmtime(inputJsonFile)):
+        sidecar = readMarkupSidecar(inputSidecarFile, copyArrays=False)
+    print(f"Input: {os.path.abspath(inputSidecarFile if sidecar else inputJsonFile)}")
     print(f"Output CSV: {os.path.abspath(outputCsvFile)}")
 
-    if not os.path.exists(inputJsonFile):
+    if sidecar:
+        print(f"Cities horizontal: {citiesHorizontal}")
+        exportMarkups(sidecar[0], {csvFormatFor(citiesHorizontal): outputCsvFile, **extraExports})
+    elif not os.path.exists(inputJsonFile):
         print(f"Error: The input JSON file '{inputJsonFile}' was not found.")
         print("Please ensure the file from the previous script exists or update the inputJsonFile path.")
     else:
-        convertJsonToCsv(inputJsonFile, outputCsvFile, citiesHorizontal)
+        convertJsonToCsv(inputJsonFile, outputCsvFile, citiesHorizontal, extraExports)
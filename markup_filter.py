@@ -0,0 +1,112 @@
+import bisect
+import re
+from array import array
+
+FILTER_MODES = ["Contains", "Exact", "Regex"]
+TRIGRAM_LENGTH = 3
+
+def makeTrigrams(text):
+    return {text[position:position + TRIGRAM_LENGTH] for position in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+class MarkupFilterIndex:
+    """
+    Lower-cased lookup structures for filtering the editor table by city and item name, built once per load:
+        cityRowRanges   per city the [start, end) slice of allCells holding its markups (allCells is row-major)
+        itemTrigrams    trigram -> array of item indexes whose lower-cased name contains it
+        exactItems      lower-cased name -> item indexes
+    A "Contains" query of three or more characters only checks the items that have every trigram of the query,
+    starting from the rarest one; shorter queries and regexes scan the (few thousand) lower-cased names. Either way
+    matching costs per name, never per table row. The matching cells are then collected city by city.
+    """
+    def __init__(self, matrix, allCells):
+        self.matrix = matrix
+        self.allCells = allCells
+        self.itemCount = len(matrix.itemNames)
+        self.lowerCityNames = [cityName.lower() for cityName in matrix.cityNames]
+        self.lowerItemNames = [itemName.lower() for itemName in matrix.itemNames]
+
+        self.cityRowRanges = []
+        for cityIdx in range(len(matrix.cityNames)):
+            rowStart = bisect.bisect_left(allCells, cityIdx * self.itemCount)
+            rowEnd = bisect.bisect_left(allCells, (cityIdx + 1) * self.itemCount)
+            self.cityRowRanges.append((rowStart, rowEnd))
+
+        self.exactItems = {}
+        trigramItems = {}
+        for itemIdx, lowerItemName in enumerate(self.lowerItemNames):
+            self.exactItems.setdefault(lowerItemName, []).append(itemIdx)
+            for trigram in makeTrigrams(lowerItemName):
+                trigramItems.setdefault(trigram, array('i')).append(itemIdx)
+        self.itemTrigrams = trigramItems
+
+    def compilePattern(self, filterText, filterMode):
+        """A name predicate for the mode, None for an empty filter. Raises re.error for a bad regex."""
+        lowerFilterText = filterText.lower()
+        if not lowerFilterText:
+            return None
+        if filterMode == "Exact":
+            return lambda lowerName: lowerName == lowerFilterText
+        if filterMode == "Regex":
+            pattern = re.compile(filterText, re.IGNORECASE)
+            return lambda lowerName: pattern.search(lowerName) is not None
+        return lambda lowerName: lowerFilterText in lowerName
+
+    def matchCities(self, filterText, filterMode="Contains"):
+        """Indexes of the cities matching the filter, all of them for an empty filter."""
+        matches = self.compilePattern(filterText, filterMode)
+        if matches is None:
+            return list(range(len(self.lowerCityNames)))
+        return [cityIdx for cityIdx, lowerCityName in enumerate(self.lowerCityNames) if matches(lowerCityName)]
+
+    def matchItems(self, filterText, filterMode="Contains"):
+        """Sorted indexes of the items matching the filter, or None for an empty filter (every item)."""
+        lowerFilterText = filterText.lower()
+        if not lowerFilterText:
+            return None
+        if filterMode == "Exact":
+            return sorted(self.exactItems.get(lowerFilterText, []))
+        if filterMode == "Contains" and len(lowerFilterText) >= TRIGRAM_LENGTH:
+            postingLists = []
+            for trigram in makeTrigrams(lowerFilterText):
+                postingList = self.itemTrigrams.get(trigram)
+                if postingList is None:
+                    return []
+                postingLists.append(postingList)
+            postingLists.sort(key=len)
+            candidates = set(postingLists[0])
+            for postingList in postingLists[1:]:
+                candidates.intersection_update(postingList)
+                if not candidates:
+                    return []
+            lowerItemNames = self.lowerItemNames
+            return sorted(itemIdx for itemIdx in candidates if lowerFilterText in lowerItemNames[itemIdx])
+        matches = self.compilePattern(filterText, filterMode)
+        return [itemIdx for itemIdx, lowerItemName in enumerate(self.lowerItemNames) if matches(lowerItemName)]
+
+    def filterCells(self, cityFilterText="", itemFilterText="", filterMode="Contains"):
+        """
+        array('q') of the cells (in table order) matching both filters, or None when neither filter is set.
+        Raises re.error for an invalid regex.
+        """
+        if not cityFilterText and not itemFilterText:
+            return None
+        cityIdxs = self.matchCities(cityFilterText, filterMode)
+        itemIdxs = self.matchItems(itemFilterText, filterMode)
+        allCells = self.allCells
+        present = self.matrix.present
+        itemCount = self.itemCount
+        visibleCells = array('q')
+        if itemIdxs is not None:
+            itemMask = bytearray(itemCount)
+            for itemIdx in itemIdxs:
+                itemMask[itemIdx] = 1
+        for cityIdx in cityIdxs:
+            rowStart, rowEnd = self.cityRowRanges[cityIdx]
+            if itemIdxs is None:
+                visibleCells.extend(allCells[rowStart:rowEnd]) # whole city, a C-level slice copy
+            elif len(itemIdxs) < rowEnd - rowStart: # few items: probe them instead of walking the city's rows
+                cityStart = cityIdx * itemCount
+                visibleCells.extend(cityStart + itemIdx for itemIdx in itemIdxs if present[cityStart + itemIdx])
+            else:
+                visibleCells.extend(cellIdx for cellIdx in allCells[rowStart:rowEnd] if itemMask[cellIdx % itemCount])
+        return visibleCells
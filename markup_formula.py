@@ -0,0 +1,492 @@
+import argparse
+import ast
+import math
+import operator
+import os
+import re
+import shutil
+import statistics
+import struct
+from array import array
+
+from markup_matrix import MARKUP_SCALE, MISSING_OFFSET, RAW_MARKUP_MAX, RAW_MARKUP_MIN, MarkupMatrix, markupToRaw
+from markup_pipeline import runPipeline
+from markup_randomizer import ITEM_CATEGORIES, categorizeItems
+from save_access import SaveFileView
+from translate_item_ids import DEFAULT_DATAFILES_DIR
+
+# numpy is optional, without it the cell columns are plain lists
+np = None
+numpyAvailable = False
+try:
+    import numpy as np
+    numpyAvailable = True
+except ImportError:
+    numpyAvailable = False
+
+FORMULA_NAMES = {
+    "value": "the cell's markup in percent",
+    "city": "town name",
+    "item": "item name",
+    "category": "item category (markup_randomizer.ITEM_CATEGORIES), None if it has none",
+    "itemMedian": "median markup of the item across towns", "itemMean": "mean markup of the item across towns",
+    "itemMin": "lowest markup of the item across towns", "itemMax": "highest markup of the item across towns",
+    "cityMedian": "median markup in the town", "cityMean": "mean markup in the town",
+    "cityMin": "lowest markup in the town", "cityMax": "highest markup in the town",
+}
+AGGREGATES = {"Median": statistics.median, "Mean": statistics.fmean, "Min": min, "Max": max}
+
+def logicalAnd(*operands): # like Python's `and`: the first falsy operand, otherwise the last one
+    for operand in operands[:-1]:
+        if not operand:
+            return operand
+    return operands[-1]
+
+def logicalOr(*operands): # like Python's `or`: the first truthy operand, otherwise the last one
+    for operand in operands[:-1]:
+        if operand:
+            return operand
+    return operands[-1]
+
+def indexRows(rowIdxs):
+    """(sorted distinct rows, position of each entry's row in them)."""
+    rows = sorted(set(rowIdxs))
+    rowPositions = {row: position for position, row in enumerate(rows)}
+    return rows, [rowPositions[row] for row in rowIdxs]
+
+def multiply(a, b):
+    if isinstance(a, str) or isinstance(b, str): # "text" * 10**9 would just eat memory
+        raise TypeError("text can't be multiplied")
+    return a * b
+
+def clamp(x, lowerBound, upperBound):
+    return min(max(x, lowerBound), upperBound)
+
+def matches(text, pattern):
+    return text is not None and re.search(pattern, text, re.IGNORECASE) is not None
+
+def numericOperation(npFunction):
+    """npFunction with True/False operands as 1/0 first, numpy would otherwise keep bool * bool a bool where Python gives an int."""
+    def applyToNumbers(*operands):
+        return npFunction(*(operand.astype(np.int64) if isinstance(operand, np.ndarray) and operand.dtype == bool else
+                            int(operand) if isinstance(operand, bool) else operand for operand in operands))
+    return applyToNumbers
+
+def checkedDivision(npFunction):
+    """npFunction raising ZeroDivisionError for a zero divisor like Python, numpy's inf/nan would otherwise still pass a where clause."""
+    def divide(dividend, divisor):
+        if np.any(np.asarray(divisor) == 0):
+            raise ZeroDivisionError
+        return npFunction(dividend, divisor)
+    return divide
+
+# operation -> (Python function on single values, numpy function on arrays or None to always go element by element)
+BINARY_OPERATORS = {
+    ast.Add: (operator.add, numericOperation(operator.add)), ast.Sub: (operator.sub, numericOperation(operator.sub)),
+    ast.Mult: (multiply, numericOperation(operator.mul)), ast.Div: (operator.truediv, numericOperation(checkedDivision(operator.truediv))),
+    ast.FloorDiv: (operator.floordiv, numericOperation(checkedDivision(operator.floordiv))), ast.Mod: (operator.mod, numericOperation(checkedDivision(operator.mod))),
+    ast.Pow: (math.pow, numericOperation(operator.pow)), # floats, so 10 ** 10 ** 10 overflows instead of running for ages
+}
+COMPARE_OPERATORS = {
+    ast.Eq: (operator.eq, operator.eq), ast.NotEq: (operator.ne, operator.ne), ast.Lt: (operator.lt, operator.lt),
+    ast.LtE: (operator.le, operator.le), ast.Gt: (operator.gt, operator.gt), ast.GtE: (operator.ge, operator.ge),
+    ast.In: (lambda a, b: b is not None and a in b, None), ast.NotIn: (lambda a, b: b is None or a not in b, None),
+}
+UNARY_OPERATORS = {
+    ast.USub: (operator.neg, numericOperation(operator.neg)), ast.UAdd: (operator.pos, numericOperation(operator.pos)),
+    ast.Not: (operator.not_, lambda a: np.logical_not(a)),
+}
+BOOL_OPERATORS = { # and/or nodes short-circuit per cell (FormulaEvaluator.evaluateBoolOp), this is for chained comparisons
+    ast.And: (logicalAnd, lambda *operands: np.logical_and.reduce(operands)),
+    ast.Or: (logicalOr, lambda *operands: np.logical_or.reduce(operands)),
+}
+FORMULA_FUNCTIONS = {
+    "clamp": (clamp, lambda x, lowerBound, upperBound: np.clip(x, lowerBound, upperBound)),
+    "min": (min, lambda *operands: np.minimum.reduce(np.broadcast_arrays(*operands))),
+    "max": (max, lambda *operands: np.maximum.reduce(np.broadcast_arrays(*operands))),
+    "abs": (abs, lambda x: np.abs(x)),
+    "round": (lambda x, digits=0: round(x, int(digits)), lambda x, digits=0: np.round(x, int(digits))),
+    "matches": (matches, None), # matches(city, "regex"), case-insensitive
+}
+
+class FormulaError(ValueError):
+    """A formula that doesn't parse, uses something outside the language, or gives values that don't fit the save."""
+
+def parseFormula(formulaText):
+    """
+    Parses and checks a formula: a Python expression limited to numbers, strings, the names in FORMULA_NAMES,
+    arithmetic, comparisons (including `in`), and/or/not, `a if condition else b` and the functions in
+    FORMULA_FUNCTIONS. Raises FormulaError for anything else.
+    """
+    try:
+        tree = ast.parse(formulaText.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula '{formulaText}': {e.msg}.") from None
+    calledNames = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load, ast.IfExp, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare)):
+            continue
+        if type(node) in BINARY_OPERATORS or type(node) in COMPARE_OPERATORS or type(node) in UNARY_OPERATORS or type(node) in BOOL_OPERATORS:
+            continue
+        if isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, (bool, int, float, str))):
+            continue
+        if isinstance(node, ast.Name):
+            if node.id in FORMULA_FUNCTIONS and id(node) not in calledNames:
+                raise FormulaError(f"'{node.id}' is a function, call it like {node.id}(...).")
+            if node.id in FORMULA_NAMES or node.id in FORMULA_FUNCTIONS:
+                continue
+            raise FormulaError(f"Unknown name '{node.id}', use one of: {', '.join(FORMULA_NAMES)}.")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORMULA_FUNCTIONS and not node.keywords:
+            continue
+        raise FormulaError(f"Not allowed in a formula: {ast.unparse(node) if isinstance(node, ast.expr) else type(node).__name__}.")
+    return tree
+
+class FormulaEvaluator:
+    """
+    Evaluates parsed formulas over a set of cells of a MarkupMatrix, a whole column at a time. Every intermediate
+    value lives at the coarsest level it can: a scalar, one entry per town, one per item, or one per cell. So
+    `city == "The Hub"` or `matches(item, "katana")` is worked out once per name and only then spread over the cells,
+    and the per-cell arithmetic runs as numpy array operations when numpy is installed (lists otherwise).
+    The town and item columns only hold the towns and items the cells are in, and the branches of `if`/`else` and the
+    later operands of and/or get an evaluator for just their cells (subEvaluator), so like in Python
+    `100 / (value - 100) if value != 100 else 0` never divides by zero.
+    rawMarkups (default: the matrix's) are the current values, e.g. the editor's edited markups.
+    """
+    def __init__(self, matrix, cells, rawMarkups=None, useNumpy=None, itemCategories=ITEM_CATEGORIES, matrixNames=None):
+        self.matrix = matrix
+        self.cells = cells
+        self.rawMarkups = matrix.rawMarkups if rawMarkups is None else rawMarkups
+        self.useNumpy = numpyAvailable if useNumpy is None else useNumpy
+        self.itemCategories = itemCategories
+        itemCount = max(len(matrix.itemNames), 1)
+        if self.useNumpy:
+            cellIdxs = np.asarray(cells, dtype=np.int64)
+            cityRows, self.cellCityIdxs = np.unique(cellIdxs // itemCount, return_inverse=True)
+            itemRows, self.cellItemIdxs = np.unique(cellIdxs % itemCount, return_inverse=True)
+            self.cityRows, self.itemRows = cityRows.tolist(), itemRows.tolist()
+        else:
+            self.cityRows, self.cellCityIdxs = indexRows([cellIdx // itemCount for cellIdx in cells])
+            self.itemRows, self.cellItemIdxs = indexRows([cellIdx % itemCount for cellIdx in cells])
+        self.matrixNames = {} if matrixNames is None else matrixNames # town/item level names over the whole matrix, shared with sub-evaluators
+        self.names = {}
+
+    def lookupName(self, name):
+        """(level, data) for a name, computed on first use."""
+        if name not in self.names:
+            matrix = self.matrix
+            if name == "value":
+                rawMarkups = self.rawMarkups
+                if self.useNumpy:
+                    cellValues = np.asarray(rawMarkups, dtype=np.int16)[np.asarray(self.cells, dtype=np.int64)] / MARKUP_SCALE
+                else:
+                    cellValues = [rawMarkups[cellIdx] / MARKUP_SCALE for cellIdx in self.cells]
+                self.names[name] = ("cell", cellValues)
+                return self.names[name]
+            if name not in self.matrixNames:
+                if name == "city":
+                    self.matrixNames[name] = ("city", matrix.cityNames)
+                elif name == "item":
+                    self.matrixNames[name] = ("item", matrix.itemNames)
+                elif name == "category":
+                    self.matrixNames[name] = ("item", categorizeItems(matrix.itemNames, self.itemCategories))
+                else: # itemMedian, cityMax, ...
+                    level, aggregateName = ("item", name[4:]) if name.startswith("item") else ("city", name[4:])
+                    self.matrixNames[name] = (level, self.aggregate(level, AGGREGATES[aggregateName]))
+            level, data = self.matrixNames[name]
+            self.names[name] = (level, [data[row] for row in (self.cityRows if level == "city" else self.itemRows)])
+        return self.names[name]
+
+    def aggregate(self, level, aggregateFunction):
+        """aggregateFunction over the current markups of every town an item is in (level "item") or every item a town has, NaN where there are none."""
+        matrix, rawMarkups = self.matrix, self.rawMarkups
+        itemCount = len(matrix.itemNames)
+        groups = [[] for _ in range(itemCount if level == "item" else len(matrix.cityNames))]
+        for cityIdx in range(len(matrix.cityNames)):
+            rowStart = cityIdx * itemCount
+            for itemIdx in matrix.presentItemIndexes(cityIdx):
+                groups[itemIdx if level == "item" else cityIdx].append(rawMarkups[rowStart + itemIdx] / MARKUP_SCALE)
+        return [aggregateFunction(group) if group else math.nan for group in groups]
+
+    def toCells(self, operand):
+        """Spreads a (level, data) value over the cells."""
+        level, data = operand
+        if level in ("scalar", "cell"):
+            return data
+        cellIdxs = self.cellCityIdxs if level == "city" else self.cellItemIdxs
+        if self.useNumpy and all(isinstance(entry, (bool, int, float)) for entry in data):
+            return np.asarray(data, dtype=bool if data and all(isinstance(entry, bool) for entry in data) else np.float64)[cellIdxs]
+        return [data[idx] for idx in cellIdxs]
+
+    def combine(self, pyFunction, npFunction, operands):
+        """Applies an operation element-wise at the finest level among the operands."""
+        levels = {level for level, _ in operands if level != "scalar"}
+        try:
+            if not levels:
+                return ("scalar", pyFunction(*(data for _, data in operands)))
+            if len(levels) == 1 and "cell" not in levels: # one town or item column, never more than a few thousand entries
+                level = levels.pop()
+                columns = [data if operandLevel == level else [data] * len(self.cityRows if level == "city" else self.itemRows)
+                           for operandLevel, data in operands]
+                return (level, [pyFunction(*entries) for entries in zip(*columns)])
+            cellColumns = [self.toCells(operand) for operand in operands]
+            if self.useNumpy and npFunction is not None and all(
+                    isinstance(column, np.ndarray) or isinstance(column, (bool, int, float)) for column in cellColumns):
+                with np.errstate(all="ignore"): # division by zero etc. ends up as inf/nan, rejected when the values are stored
+                    return ("cell", npFunction(*cellColumns))
+            cellCount = len(self.cells)
+            cellColumns = [column.tolist() if self.useNumpy and isinstance(column, np.ndarray) else
+                           column if isinstance(column, list) else [column] * cellCount for column in cellColumns]
+            return ("cell", [pyFunction(*entries) for entries in zip(*cellColumns)])
+        except ZeroDivisionError:
+            raise FormulaError("Division by zero.") from None
+        except (TypeError, ValueError, OverflowError, re.error) as e:
+            raise FormulaError(f"Can't evaluate the formula: {e}") from None
+
+    def evaluate(self, node):
+        """(level, data) of an expression node."""
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body)
+        if isinstance(node, ast.Constant):
+            return ("scalar", node.value)
+        if isinstance(node, ast.Name):
+            return self.lookupName(node.id)
+        if isinstance(node, ast.BinOp):
+            return self.combine(*BINARY_OPERATORS[type(node.op)], [self.evaluate(node.left), self.evaluate(node.right)])
+        if isinstance(node, ast.UnaryOp):
+            return self.combine(*UNARY_OPERATORS[type(node.op)], [self.evaluate(node.operand)])
+        if isinstance(node, ast.BoolOp):
+            return self.evaluateBoolOp(node)
+        if isinstance(node, ast.Compare): # a < b < c is (a < b) and (b < c)
+            left = self.evaluate(node.left)
+            results = []
+            for compareOperator, comparator in zip(node.ops, node.comparators):
+                right = self.evaluate(comparator)
+                results.append(self.combine(*COMPARE_OPERATORS[type(compareOperator)], [left, right]))
+                left = right
+            return results[0] if len(results) == 1 else self.combine(*BOOL_OPERATORS[ast.And], results)
+        if isinstance(node, ast.IfExp): # each branch only for the cells it applies to
+            condition = self.evaluate(node.test)
+            if condition[0] == "scalar":
+                return self.evaluate(node.body if condition[1] else node.orelse)
+            truePositions, falsePositions = self.splitPositions(self.cellTruth(condition))
+            parts = []
+            for positions, branch in ((truePositions, node.body), (falsePositions, node.orelse)):
+                if len(positions):
+                    branchEvaluator = self.subEvaluator(positions)
+                    parts.append((positions, branchEvaluator.toCells(branchEvaluator.evaluate(branch))))
+            return self.mergeCells(parts)
+        if isinstance(node, ast.Call):
+            return self.combine(*FORMULA_FUNCTIONS[node.func.id], [self.evaluate(argument) for argument in node.args])
+        raise FormulaError(f"Not allowed in a formula: {type(node).__name__}.")
+
+    def evaluateBoolOp(self, node):
+        """
+        Python's and/or: per cell, the value of the first operand that decides it (falsy for `and`, truthy for `or`),
+        otherwise of the last one. Each operand is only evaluated for the cells the ones before it left undecided.
+        """
+        decidingTruth = isinstance(node.op, ast.Or)
+        evaluator, positions, parts = self, None, [] # positions: which of self.cells the evaluator has, None for all of them
+        for operandIdx, operandNode in enumerate(node.values):
+            operand = evaluator.evaluate(operandNode)
+            isLast = operandIdx == len(node.values) - 1
+            if operand[0] == "scalar" and not isLast and bool(operand[1]) != decidingTruth:
+                continue # decides none of the cells
+            if operand[0] == "scalar" or isLast: # the value for every cell still undecided
+                if positions is None:
+                    return operand
+                parts.append((positions, evaluator.toCells(operand)))
+                break
+            decidedPositions, undecidedPositions = evaluator.splitPositions(evaluator.cellTruth(operand), decidingTruth)
+            parts.append((self.takeCells(positions, decidedPositions) if positions is not None else decidedPositions,
+                          evaluator.takeCells(evaluator.toCells(operand), decidedPositions)))
+            if not len(undecidedPositions):
+                break
+            positions = self.takeCells(positions, undecidedPositions) if positions is not None else undecidedPositions
+            evaluator = evaluator.subEvaluator(undecidedPositions)
+        return self.mergeCells(parts)
+
+    def subEvaluator(self, positions):
+        """Evaluator for the cells at these positions of self.cells, sharing the town and item level names."""
+        cells = np.asarray(self.cells, dtype=np.int64)[positions] if self.useNumpy else self.takeCells(self.cells, positions)
+        return FormulaEvaluator(self.matrix, cells, self.rawMarkups, self.useNumpy, self.itemCategories, self.matrixNames)
+
+    def takeCells(self, column, positions):
+        """The entries of a cell column (or of a positions list) at these positions."""
+        if self.useNumpy and isinstance(column, np.ndarray):
+            return column[positions]
+        return [column[position] for position in positions]
+
+    def splitPositions(self, truth, value=True):
+        """(positions where truth is value, the other positions)."""
+        if self.useNumpy:
+            truth = np.asarray(truth, dtype=bool)
+            return np.flatnonzero(truth == value), np.flatnonzero(truth != value)
+        return ([position for position, entry in enumerate(truth) if entry == value],
+                [position for position, entry in enumerate(truth) if entry != value])
+
+    def mergeCells(self, parts):
+        """("cell", data) from (positions, cell values) parts that between them cover every cell once."""
+        cellCount = len(self.cells)
+        if self.useNumpy:
+            columns = [np.asarray(values) if isinstance(values, (np.ndarray, bool, int, float)) else None for _, values in parts]
+            # True/False stay apart from numbers like they would in Python, mixing them goes element by element
+            if all(column is not None for column in columns) and len({column.dtype == bool for column in columns}) == 1:
+                merged = np.empty(cellCount, dtype=np.result_type(*columns))
+                for (positions, _), column in zip(parts, columns):
+                    merged[positions] = column
+                return ("cell", merged)
+        merged = [None] * cellCount
+        for positions, values in parts:
+            if self.useNumpy and isinstance(values, np.ndarray):
+                values = values.tolist()
+            if not isinstance(values, list):
+                values = [values] * len(positions)
+            for position, value in zip(positions, values):
+                merged[position] = value
+        return ("cell", merged)
+
+    def cellTruth(self, operand):
+        """Truth value of an evaluated (level, data) per cell."""
+        truth = self.toCells(operand)
+        if self.useNumpy and isinstance(truth, np.ndarray):
+            return np.broadcast_to(truth.astype(bool), (len(self.cells),))
+        if not isinstance(truth, list):
+            return [bool(truth)] * len(self.cells)
+        return [bool(entry) for entry in truth]
+
+    def cellMask(self, tree):
+        """Truth value of a formula per cell (a where clause)."""
+        return self.cellTruth(self.evaluate(tree))
+
+    def cellRawMarkups(self, tree):
+        """Raw markups (array('h')) of a formula per cell (a set expression). Raises FormulaError for values that don't fit the save."""
+        values = self.toCells(self.evaluate(tree))
+        cells, matrix = self.cells, self.matrix
+        itemCount = len(matrix.itemNames)
+        if len(cells) and (isinstance(values, bool) or (self.useNumpy and (isinstance(values, np.bool_) or
+                                                                            (isinstance(values, np.ndarray) and values.dtype == bool)))):
+            raise FormulaError("The formula gives True/False instead of a markup, pick a value with `a if condition else b`.")
+        if self.useNumpy and (isinstance(values, np.ndarray) or isinstance(values, (int, float))) and not isinstance(values, bool):
+            values = np.broadcast_to(np.asarray(values, dtype=np.float64), (len(cells),))
+            rawValues = np.rint(values * MARKUP_SCALE)
+            badCells = np.flatnonzero(~np.isfinite(rawValues) | (rawValues < RAW_MARKUP_MIN) | (rawValues > RAW_MARKUP_MAX))
+            if badCells.size:
+                cellIdx = cells[int(badCells[0])]
+                raise FormulaError(f"{badCells.size} cell(s) get a markup that doesn't fit the save, e.g. {values[badCells[0]]}% for "
+                                   f"'{matrix.itemNames[cellIdx % itemCount]}' in {matrix.cityNames[cellIdx // itemCount]}.")
+            return array('h', rawValues.astype(np.int16).tobytes())
+        if not isinstance(values, list):
+            values = [values] * len(cells)
+        rawMarkups = array('h')
+        for cellIdx, value in zip(cells, values):
+            try:
+                if isinstance(value, bool):
+                    raise ValueError(f"{value} is not a markup, pick a value with `a if condition else b`")
+                if isinstance(value, str) or value is None:
+                    raise ValueError(f"{value!r} is not a markup")
+                if not math.isfinite(value):
+                    raise ValueError(f"{value} is not a finite number")
+                rawMarkups.append(markupToRaw(value))
+            except (TypeError, ValueError) as e:
+                raise FormulaError(f"Bad markup for '{matrix.itemNames[cellIdx % itemCount]}' in {matrix.cityNames[cellIdx // itemCount]}: {e}") from None
+        return rawMarkups
+
+def evaluateFormula(matrix, setFormula, whereFormula="", cells=None, rawMarkups=None, useNumpy=None):
+    """
+    Runs "set <setFormula> where <whereFormula>" over cells (array('q') of cell indexes, default every markup):
+    whereFormula picks the cells (empty: all of them), setFormula gives their new markup in percent.
+    Returns {"matchedCells": cells the where clause picked, "changedCells": those whose raw markup changes,
+    "newRawMarkups": array('h') aligned with changedCells}; the matrix itself is left alone.
+    Raises FormulaError for a bad formula or results that don't fit the save.
+    """
+    if cells is None:
+        cells = matrix.presentCells()
+    if rawMarkups is None:
+        rawMarkups = matrix.rawMarkups
+    setTree = parseFormula(setFormula)
+    whereTree = parseFormula(whereFormula) if whereFormula.strip() else None
+    if whereTree is not None:
+        mask = FormulaEvaluator(matrix, cells, rawMarkups, useNumpy).cellMask(whereTree)
+        cells = array('q', (cellIdx for cellIdx, matched in zip(cells, mask) if matched))
+    newRawMarkups = FormulaEvaluator(matrix, cells, rawMarkups, useNumpy).cellRawMarkups(setTree)
+    changedCells, changedRawMarkups = array('q'), array('h')
+    for cellIdx, newRawMarkup in zip(cells, newRawMarkups):
+        if newRawMarkup != rawMarkups[cellIdx]:
+            changedCells.append(cellIdx)
+            changedRawMarkups.append(newRawMarkup)
+    return {"matchedCells": cells, "changedCells": changedCells, "newRawMarkups": changedRawMarkups}
+
+def buildSaveChanges(matrix, cells, rawMarkups):
+    """SaveFileView.writeChanges entries for giving cells[i] the markup rawMarkups[i]; cells without a save offset are skipped with a warning."""
+    itemCount = len(matrix.itemNames)
+    changes = []
+    for cellIdx, rawMarkup in zip(cells, rawMarkups):
+        cityName, itemName = matrix.cityNames[cellIdx // itemCount], matrix.itemNames[cellIdx % itemCount]
+        offset = matrix.offsets[cellIdx]
+        if offset == MISSING_OFFSET:
+            print(f"Warning: No save offset is known for '{itemName}' (City: {cityName}), skipping it.")
+            continue
+        changes.append({"offset": offset, "bytes": struct.pack('<h', rawMarkup), "itemName": itemName, "city": cityName})
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-edit Kenshi save markups with a formula, e.g. "
+                                                 "--set 'value * 0.9' --where 'city == \"The Hub\"'.")
+    parser.add_argument("--set", dest="setFormula", required=True, help="new markup in percent, e.g. 'clamp(value, 50, 150)' or 'itemMedian'")
+    parser.add_argument("--where", dest="whereFormula", default="", help="which markups to change, e.g. 'value > 150 and category == \"Food\"' (default: all)")
+    parser.add_argument("--save", default=None, help="save file (default: the save extract_game_data would pick)")
+    parser.add_argument("--datafiles", default=DEFAULT_DATAFILES_DIR, help="dictionary folder for item names")
+    parser.add_argument("--output", default=None, help="where to write the edited copy (default: edited_<save name> here)")
+    parser.add_argument("--in-place", action="store_true", help="write into the save itself instead of a copy")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would change")
+    parser.add_argument("--show", type=int, default=10, help="changes to list (default: 10)")
+    args = parser.parse_args(argv)
+
+    try: # check the formulas before spending time on the save
+        parseFormula(args.setFormula)
+        if args.whereFormula.strip():
+            parseFormula(args.whereFormula)
+    except FormulaError as e:
+        print(f"Error: {e}")
+        return 1
+    pipelineResult = runPipeline(gameFilePath=args.save, datafilesDir=args.datafiles)
+    if pipelineResult["error"]:
+        print(f"Error: {pipelineResult['error']}")
+        return 1
+    matrix = pipelineResult["matrix"] or MarkupMatrix.fromNestedDict(pipelineResult["markups"])
+    try:
+        formulaResult = evaluateFormula(matrix, args.setFormula, args.whereFormula)
+    except FormulaError as e:
+        print(f"Error: {e}")
+        return 1
+    changedCells, newRawMarkups = formulaResult["changedCells"], formulaResult["newRawMarkups"]
+    print(f"{len(formulaResult['matchedCells'])} markups match, {len(changedCells)} would change.")
+    itemCount = len(matrix.itemNames)
+    for cellIdx, newRawMarkup in list(zip(changedCells, newRawMarkups))[:args.show]:
+        print(f"  {matrix.cityNames[cellIdx // itemCount]:<20} {matrix.itemNames[cellIdx % itemCount]:<40} "
+              f"{matrix.rawMarkups[cellIdx] / MARKUP_SCALE:>8.2f}% -> {newRawMarkup / MARKUP_SCALE:.2f}%")
+    if args.dry_run or not changedCells:
+        return 0
+
+    savePath = pipelineResult["savePath"]
+    if args.in_place:
+        targetFilePath = savePath
+    else:
+        targetFilePath = args.output or f"edited_{os.path.basename(savePath)}"
+        try:
+            shutil.copy2(savePath, targetFilePath)
+        except OSError as e:
+            print(f"Error: Could not copy {savePath} to {targetFilePath}: {e}")
+            return 1
+    changes = buildSaveChanges(matrix, changedCells, newRawMarkups)
+    try:
+        with SaveFileView(targetFilePath, writable=True) as saveView:
+            saveView.writeChanges(changes)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not write changes to {targetFilePath}: {e}")
+        return 1
+    print(f"Wrote {len(changes)} change(s) to {targetFilePath}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
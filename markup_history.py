@@ -0,0 +1,317 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import time
+
+from extract_game_data import findGameSaveFile, resolveCityNames, runExtraction
+from markup_matrix import MARKUP_SCALE, markupToRaw
+from save_access import computeSaveFingerprint
+from translate_item_ids import DEFAULT_DATAFILES_DIR, locateDictionaryFiles, lookupItemNames
+from translation_cache import TRANSLATION_CACHE_FILE
+
+MARKUP_HISTORY_FILE = "markup_history.sqlite"
+
+def markupFromEntry(entry):
+    """The markup of an extracted entry ([markup, offset], or a bare markup from old files)."""
+    return entry[0] if isinstance(entry, list) else entry
+
+def rawToMarkup(rawMarkup):
+    return None if rawMarkup is None else rawMarkup / MARKUP_SCALE
+
+class MarkupHistory:
+    """
+    SQLite store of the markups of every recorded save, for price drift over a playthrough.
+    A snapshot is one extraction (the save's fingerprint, its mtime as the point in time, and when it was recorded).
+    Only changes are stored: markup_changes gets a row when an item's markup in a town differs from the latest
+    recorded one (latest_markups), or a NULL markup when the town stopped listing it. A value at any time is the last
+    change at or before it. City and item names are interned, and markup_changes is keyed (item, city, time) so one
+    item's history is a single index range; a second index on time serves "what changed between two snapshots".
+    Markups are kept as the save's raw values (percent * 100), so unchanged values compare exactly.
+    """
+    def __init__(self, dbPath=MARKUP_HISTORY_FILE):
+        self.dbPath = dbPath
+        self.connection = sqlite3.connect(dbPath)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                save_path TEXT,
+                save_size INTEGER NOT NULL,
+                save_hash TEXT NOT NULL UNIQUE,
+                taken_at REAL NOT NULL,
+                recorded_at REAL NOT NULL,
+                markup_count INTEGER NOT NULL,
+                change_count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cities (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL UNIQUE,
+                name TEXT
+            );
+            CREATE TABLE IF NOT EXISTS markup_changes (
+                item INTEGER NOT NULL,
+                city INTEGER NOT NULL,
+                taken_at REAL NOT NULL,
+                snapshot INTEGER NOT NULL,
+                markup INTEGER,
+                PRIMARY KEY (item, city, taken_at, snapshot)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS markup_changes_by_time ON markup_changes (taken_at, markup);
+            CREATE TABLE IF NOT EXISTS latest_markups (
+                item INTEGER NOT NULL,
+                city INTEGER NOT NULL,
+                markup INTEGER NOT NULL,
+                PRIMARY KEY (item, city)
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def internNames(self, table, column, names):
+        """{name: row id} for the given names in cities/items, adding the missing ones."""
+        nameIds = dict(self.connection.execute(f"SELECT {column}, id FROM {table}"))
+        newNames = [name for name in dict.fromkeys(names) if name not in nameIds]
+        if newNames:
+            self.connection.executemany(f"INSERT INTO {table} ({column}) VALUES (?)", ((name,) for name in newNames))
+            nameIds = dict(self.connection.execute(f"SELECT {column}, id FROM {table}"))
+        return nameIds
+
+    def recordSnapshot(self, itemIdMarkups, saveFingerprint, savePath=None, itemNames=None):
+        """
+        Adds one extraction ({city: {itemId: [markup, offset]}}, as extractMarkupsFromGameFile returns it) of the save
+        with the given fingerprint (computeSaveFingerprint). itemNames ({itemId: name}) labels items for queries.
+        Towns missing from the extraction are left alone, items a recorded town no longer lists get a NULL markup.
+        Returns the snapshot id, the existing one if this save was recorded before, or None when the save is older than
+        the newest snapshot (history only grows forward, record saves oldest first).
+        """
+        existing = self.connection.execute("SELECT id FROM snapshots WHERE save_hash = ?", (saveFingerprint["hash"],)).fetchone()
+        if existing is not None:
+            print(f"Save {savePath or saveFingerprint['hash']} is already recorded as snapshot {existing[0]}.")
+            return existing[0]
+        takenAt = saveFingerprint["mtime"]
+        newestTakenAt = self.connection.execute("SELECT MAX(taken_at) FROM snapshots").fetchone()[0]
+        if newestTakenAt is not None and takenAt < newestTakenAt:
+            print(f"Warning: {savePath or saveFingerprint['hash']} is older than the newest recorded save, not recording it. "
+                  f"Record saves oldest first.")
+            return None
+
+        with self.connection:
+            cityIds = self.internNames("cities", "name", itemIdMarkups.keys())
+            itemIds = self.internNames("items", "item_id", (itemId for cityItems in itemIdMarkups.values() for itemId in cityItems))
+            if itemNames:
+                self.connection.executemany("UPDATE items SET name = ? WHERE item_id = ? AND name IS NOT ?",
+                                            ((itemNames[itemId], itemId, itemNames[itemId]) for itemId in itemIds if itemId in itemNames))
+            latestMarkups = {(item, city): markup for item, city, markup in self.connection.execute("SELECT item, city, markup FROM latest_markups")}
+
+            changedMarkups = []
+            seenCells = set()
+            markupCount = 0
+            for cityName, cityItems in itemIdMarkups.items():
+                city = cityIds[cityName]
+                for itemId, entry in cityItems.items():
+                    cellKey = (itemIds[itemId], city)
+                    rawMarkup = markupToRaw(float(markupFromEntry(entry)))
+                    seenCells.add(cellKey)
+                    markupCount += 1
+                    if latestMarkups.get(cellKey) != rawMarkup:
+                        changedMarkups.append((cellKey[0], city, rawMarkup))
+            recordedCities = {cityIds[cityName] for cityName in itemIdMarkups}
+            droppedCells = [cellKey for cellKey in latestMarkups if cellKey[1] in recordedCities and cellKey not in seenCells]
+
+            snapshotId = self.connection.execute(
+                "INSERT INTO snapshots (save_path, save_size, save_hash, taken_at, recorded_at, markup_count, change_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (savePath, saveFingerprint["size"], saveFingerprint["hash"], takenAt, time.time(), markupCount,
+                 len(changedMarkups) + len(droppedCells))).lastrowid
+            self.connection.executemany("INSERT INTO markup_changes (item, city, taken_at, snapshot, markup) VALUES (?, ?, ?, ?, ?)",
+                                        [(item, city, takenAt, snapshotId, rawMarkup) for item, city, rawMarkup in changedMarkups] +
+                                        [(item, city, takenAt, snapshotId, None) for item, city in droppedCells])
+            self.connection.executemany("INSERT OR REPLACE INTO latest_markups (item, city, markup) VALUES (?, ?, ?)", changedMarkups)
+            self.connection.executemany("DELETE FROM latest_markups WHERE item = ? AND city = ?", droppedCells)
+        print(f"Recorded snapshot {snapshotId}: {markupCount} markups, {len(changedMarkups)} changed, {len(droppedCells)} no longer listed.")
+        return snapshotId
+
+    def findSnapshot(self, saveHash):
+        """Id of the snapshot recorded for the save with this content hash (computeSaveFingerprint's "hash"), or None."""
+        row = self.connection.execute("SELECT id FROM snapshots WHERE save_hash = ?", (saveHash,)).fetchone()
+        return row[0] if row else None
+
+    def listSnapshots(self):
+        """Every snapshot, oldest first, as dicts."""
+        rows = self.connection.execute("SELECT id, save_path, save_hash, taken_at, recorded_at, markup_count, change_count FROM snapshots ORDER BY taken_at, id")
+        return [{"id": row[0], "savePath": row[1], "saveHash": row[2], "takenAt": row[3], "recordedAt": row[4],
+                 "markups": row[5], "changes": row[6]} for row in rows]
+
+    def getSnapshot(self, snapshotId):
+        """A snapshot by id, or (with snapshotId None) the newest one. Negative ids count back from the newest (-1 is the one before)."""
+        if snapshotId is None or snapshotId < 0:
+            row = self.connection.execute("SELECT id, taken_at FROM snapshots ORDER BY taken_at DESC, id DESC LIMIT 1 OFFSET ?",
+                                          (-(snapshotId or 0),)).fetchone()
+        else:
+            row = self.connection.execute("SELECT id, taken_at FROM snapshots WHERE id = ?", (snapshotId,)).fetchone()
+        return {"id": row[0], "takenAt": row[1]} if row else None
+
+    def findItems(self, itemPattern):
+        """[(item row id, item ID, name)] matching exactly by ID or name, or else containing itemPattern (case-insensitive)."""
+        query = "SELECT id, item_id, name FROM items WHERE item_id = ? OR name = ?"
+        rows = self.connection.execute(query, (itemPattern, itemPattern)).fetchall()
+        if not rows:
+            likePattern = f"%{itemPattern}%"
+            rows = self.connection.execute("SELECT id, item_id, name FROM items WHERE item_id LIKE ? OR name LIKE ? ORDER BY name, item_id",
+                                           (likePattern, likePattern)).fetchall()
+        return rows
+
+    def itemHistory(self, itemPattern, cityName=None, since=None):
+        """
+        Every change of the matching item(s) (see findItems), per town in time order: dicts with itemId, name, city,
+        takenAt, snapshot and markup (None when the town stopped listing it). Optionally one town and/or from a time on.
+        """
+        query = """
+            SELECT items.item_id, items.name, cities.name, markup_changes.taken_at, markup_changes.snapshot, markup_changes.markup
+            FROM markup_changes JOIN items ON items.id = markup_changes.item JOIN cities ON cities.id = markup_changes.city
+            WHERE markup_changes.item = ?"""
+        parameters = []
+        if cityName is not None:
+            query += " AND markup_changes.city = (SELECT id FROM cities WHERE name = ?)"
+            parameters.append(cityName)
+        if since is not None:
+            query += " AND markup_changes.taken_at >= ?"
+            parameters.append(since)
+        query += " ORDER BY markup_changes.city, markup_changes.taken_at, markup_changes.snapshot"
+        history = []
+        for item, _, _ in self.findItems(itemPattern):
+            for itemId, itemName, city, takenAt, snapshotId, rawMarkup in self.connection.execute(query, [item] + parameters):
+                history.append({"itemId": itemId, "name": itemName, "city": city, "takenAt": takenAt, "snapshot": snapshotId,
+                                "markup": rawToMarkup(rawMarkup)})
+        return history
+
+    def largestMovers(self, fromSnapshot=-1, toSnapshot=None, limit=20, cityName=None):
+        """
+        Markups that changed between two snapshots (default: the one before the newest, and the newest), biggest absolute
+        change first. Dicts with itemId, name, city, before, after and change; items that appeared or vanished have a
+        None on one side and come after the numeric changes. Only the changes recorded in between are read.
+        """
+        fromInfo, toInfo = self.getSnapshot(fromSnapshot), self.getSnapshot(toSnapshot)
+        if fromInfo is None or toInfo is None or fromInfo["takenAt"] >= toInfo["takenAt"]:
+            return []
+        cityFilter = "AND city = (SELECT id FROM cities WHERE name = :city)" if cityName is not None else ""
+        rows = self.connection.execute(f"""
+            WITH changed AS (
+                SELECT item, city, MAX(taken_at) AS last_taken_at FROM markup_changes
+                WHERE taken_at > :fromTime AND taken_at <= :toTime {cityFilter}
+                GROUP BY item, city
+            )
+            SELECT items.item_id, items.name, cities.name,
+                (SELECT markup FROM markup_changes WHERE item = changed.item AND city = changed.city AND taken_at <= :fromTime
+                 ORDER BY taken_at DESC, snapshot DESC LIMIT 1),
+                (SELECT markup FROM markup_changes WHERE item = changed.item AND city = changed.city AND taken_at = changed.last_taken_at
+                 ORDER BY snapshot DESC LIMIT 1)
+            FROM changed JOIN items ON items.id = changed.item JOIN cities ON cities.id = changed.city
+        """, {"fromTime": fromInfo["takenAt"], "toTime": toInfo["takenAt"], "city": cityName})
+        movers = []
+        for itemId, itemName, city, rawBefore, rawAfter in rows:
+            if rawBefore == rawAfter: # changed and changed back
+                continue
+            before, after = rawToMarkup(rawBefore), rawToMarkup(rawAfter)
+            change = after - before if before is not None and after is not None else None
+            movers.append({"itemId": itemId, "name": itemName, "city": city, "before": before, "after": after, "change": change})
+        movers.sort(key=lambda mover: (mover["change"] is None, -abs(mover["change"] or 0), mover["name"] or mover["itemId"], mover["city"]))
+        return movers[:limit] if limit else movers
+
+def recordSaveInHistory(gameFilePath, historyPath=MARKUP_HISTORY_FILE, markupLowerBound=1.0, markupUpperBound=175.0,
+                        datafilesDir=DEFAULT_DATAFILES_DIR, resolveNames=True):
+    """Extracts a save (through the extraction cache) and records it. Returns the snapshot id or None."""
+    saveFingerprint = computeSaveFingerprint(gameFilePath)
+    cityNames, boundaryCityNames = resolveCityNames(gameFilePath)
+    if not cityNames:
+        print(f"Error: No towns found in {gameFilePath}.")
+        return None
+    itemIdMarkups = runExtraction(gameFilePath, cityNames, markupLowerBound, markupUpperBound, boundaryCityNames, saveFingerprint=saveFingerprint)
+    if itemIdMarkups is None:
+        print(f"Error: Extraction failed for {gameFilePath}.")
+        return None
+    itemNames = None
+    if resolveNames:
+        dictionaryFiles = locateDictionaryFiles(datafilesDir)
+        allItemIds = {itemId for cityItems in itemIdMarkups.values() for itemId in cityItems}
+        itemNames = lookupItemNames(allItemIds, dictionaryFiles, TRANSLATION_CACHE_FILE) if dictionaryFiles else None
+    with MarkupHistory(historyPath) as markupHistory:
+        return markupHistory.recordSnapshot(itemIdMarkups, saveFingerprint, gameFilePath, itemNames)
+
+def formatTime(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def formatMarkup(markupValue):
+    return "-" if markupValue is None else f"{markupValue:.2f}%"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Markup history across recorded Kenshi saves.")
+    parser.add_argument("--db", default=MARKUP_HISTORY_FILE, help=f"history database (default: {MARKUP_HISTORY_FILE})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    recordParser = subparsers.add_parser("record", help="extract saves and add them to the history (oldest first)")
+    recordParser.add_argument("saves", nargs="*", help="save files (default: the save extract_game_data would pick)")
+    recordParser.add_argument("--datafiles", default=DEFAULT_DATAFILES_DIR, help="dictionary folder for item names")
+    recordParser.add_argument("--no-names", action="store_true", help="don't look up item names")
+
+    historyParser = subparsers.add_parser("history", help="markup history of an item")
+    historyParser.add_argument("item", help="item ID or name, or part of one")
+    historyParser.add_argument("--city", default=None, help="only this town")
+
+    moversParser = subparsers.add_parser("movers", help="largest markup changes between two snapshots")
+    moversParser.add_argument("--from", dest="fromSnapshot", type=int, default=-1, help="snapshot id, or -N for N saves before the newest (default: -1)")
+    moversParser.add_argument("--to", dest="toSnapshot", type=int, default=None, help="snapshot id (default: the newest)")
+    moversParser.add_argument("--city", default=None, help="only this town")
+    moversParser.add_argument("--limit", type=int, default=20)
+
+    subparsers.add_parser("snapshots", help="list the recorded snapshots")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        savePaths = args.saves
+        if not savePaths:
+            latestSave = findGameSaveFile()
+            savePaths = [latestSave] if latestSave else []
+        if not savePaths:
+            print("Error: No save file found.")
+            return 1
+        for savePath in sorted(savePaths, key=os.path.getmtime):
+            recordSaveInHistory(savePath, args.db, datafilesDir=args.datafiles, resolveNames=not args.no_names)
+        return 0
+
+    with MarkupHistory(args.db) as markupHistory:
+        queryStart = time.perf_counter()
+        if args.command == "history":
+            history = markupHistory.itemHistory(args.item, args.city)
+            for change in history:
+                print(f"{formatTime(change['takenAt'])}  {change['city']:<20} {formatMarkup(change['markup']):>9}  {change['name'] or change['itemId']}")
+            if not history:
+                print(f"No history for '{args.item}'" + (f" in {args.city}." if args.city else "."))
+        elif args.command == "movers":
+            movers = markupHistory.largestMovers(args.fromSnapshot, args.toSnapshot, args.limit, args.city)
+            for mover in movers:
+                change = "new" if mover["before"] is None else "gone" if mover["after"] is None else f"{mover['change']:+.2f}"
+                print(f"{change:>8}  {formatMarkup(mover['before']):>9} -> {formatMarkup(mover['after']):>9}  {mover['city']:<20} {mover['name'] or mover['itemId']}")
+            if not movers:
+                print("No changes between those snapshots (the history needs at least two).")
+        elif args.command == "snapshots":
+            for snapshot in markupHistory.listSnapshots():
+                print(f"{snapshot['id']:>5}  {formatTime(snapshot['takenAt'])}  {snapshot['markups']:>7} markups  {snapshot['changes']:>7} changes  {snapshot['savePath']}")
+        print(f"({(time.perf_counter() - queryStart) * 1000:.1f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
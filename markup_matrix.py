@@ -0,0 +1,199 @@
+import sys
+from array import array
+
+# numpy is optional, only needed for numpyViews()
+np = None
+numpyAvailable = False
+try:
+    import numpy as np
+    numpyAvailable = True
+except ImportError:
+    numpyAvailable = False
+
+MARKUP_SCALE = 100 # markups are stored like the save stores them: percent * 100 in a signed short
+MISSING_OFFSET = -1
+RAW_MARKUP_MIN = -32768
+RAW_MARKUP_MAX = 32767
+
+def markupToRaw(markupPercentage):
+    """Raw save value for a markup in percent, raises ValueError if it doesn't fit a signed short."""
+    rawValue = int(round(markupPercentage * MARKUP_SCALE))
+    if not (RAW_MARKUP_MIN <= rawValue <= RAW_MARKUP_MAX):
+        raise ValueError(f"Markup value {markupPercentage}% ({rawValue}) is out of range for a 16-bit signed integer.")
+    return rawValue
+
+class MarkupMatrix:
+    """
+    City x item markups in flat typed arrays instead of nested {city: {item: [markup, offset]}} dicts.
+    Cities and items are interned once (cityNames/itemNames lists plus name -> index dicts) and cell (cityIdx, itemIdx)
+    lives at cityIdx * itemCount + itemIdx in three parallel arrays:
+        rawMarkups  array('h')  markup * 100, exactly what the save holds (so no float rounding on the way back)
+        offsets     array('q')  file offset of the markup, MISSING_OFFSET for cells without one
+        present     bytearray   1 where the town actually lists the item
+    That is 11 bytes per cell against well over 100 for a dict entry holding a two-element list.
+    """
+    def __init__(self, cityNames, itemNames):
+        self.cityNames = list(cityNames)
+        self.itemNames = list(itemNames)
+        self.cityIndex = {cityName: cityIdx for cityIdx, cityName in enumerate(self.cityNames)}
+        self.itemIndex = {itemName: itemIdx for itemIdx, itemName in enumerate(self.itemNames)}
+        cellCount = len(self.cityNames) * len(self.itemNames)
+        self.rawMarkups = array('h', bytes(2 * cellCount))
+        self.offsets = array('q', [MISSING_OFFSET]) * cellCount
+        self.present = bytearray(cellCount)
+
+    @classmethod
+    def fromArrays(cls, cityNames, itemNames, rawMarkups, offsets, present):
+        """Wraps existing cell arrays (e.g. read from a sidecar file) without copying them. Lengths must match the name counts."""
+        matrix = cls.__new__(cls)
+        matrix.cityNames = list(cityNames)
+        matrix.itemNames = list(itemNames)
+        matrix.cityIndex = {cityName: cityIdx for cityIdx, cityName in enumerate(matrix.cityNames)}
+        matrix.itemIndex = {itemName: itemIdx for itemIdx, itemName in enumerate(matrix.itemNames)}
+        cellCount = len(matrix.cityNames) * len(matrix.itemNames)
+        if not (len(rawMarkups) == len(offsets) == len(present) == cellCount):
+            raise ValueError(f"Cell arrays don't match a {len(matrix.cityNames)} x {len(matrix.itemNames)} matrix.")
+        matrix.rawMarkups = rawMarkups
+        matrix.offsets = offsets
+        matrix.present = present
+        return matrix
+
+    @classmethod
+    def fromNestedDict(cls, data):
+        """
+        Builds a matrix from the JSON shape {city: {item: [markup, offset]}}. Cities keep their order, items are
+        interned in first-seen order. Bare markups (old files without offsets) get MISSING_OFFSET.
+        """
+        itemIndex = {}
+        for cityItems in data.values():
+            for itemName in cityItems:
+                if itemName not in itemIndex:
+                    itemIndex[itemName] = len(itemIndex)
+        matrix = cls(data.keys(), itemIndex)
+        itemCount = len(matrix.itemNames)
+        rawMarkups, offsets, present = matrix.rawMarkups, matrix.offsets, matrix.present
+        for cityIdx, cityItems in enumerate(data.values()):
+            rowStart = cityIdx * itemCount
+            for itemName, entry in cityItems.items():
+                if isinstance(entry, list):
+                    if not entry:
+                        continue
+                    markupValue = entry[0]
+                    offset = entry[1] if len(entry) > 1 else MISSING_OFFSET
+                else:
+                    markupValue, offset = entry, MISSING_OFFSET
+                cellIdx = rowStart + itemIndex[itemName]
+                rawMarkups[cellIdx] = markupToRaw(float(markupValue))
+                offsets[cellIdx] = offset
+                present[cellIdx] = 1
+        return matrix
+
+    def toNestedDict(self):
+        """The JSON shape back, {city: {item: [markup, offset]}} with items in matrix order. Every city is kept."""
+        data = {}
+        itemCount = len(self.itemNames)
+        for cityIdx, cityName in enumerate(self.cityNames):
+            rowStart = cityIdx * itemCount
+            cityItems = {}
+            for itemIdx in self.presentItemIndexes(cityIdx):
+                cellIdx = rowStart + itemIdx
+                cityItems[self.itemNames[itemIdx]] = [self.rawMarkups[cellIdx] / MARKUP_SCALE, self.offsets[cellIdx]]
+            data[cityName] = cityItems
+        return data
+
+    @property
+    def shape(self):
+        return len(self.cityNames), len(self.itemNames)
+
+    def __len__(self):
+        """Number of cells that hold a markup."""
+        return self.present.count(1)
+
+    def cellIndex(self, cityIdx, itemIdx):
+        return cityIdx * len(self.itemNames) + itemIdx
+
+    def presentItemIndexes(self, cityIdx):
+        """Item indexes the city has a markup for, in matrix order."""
+        itemCount = len(self.itemNames)
+        rowStart = cityIdx * itemCount
+        rowMask = self.present[rowStart:rowStart + itemCount]
+        itemIdx = rowMask.find(1)
+        while itemIdx != -1:
+            yield itemIdx
+            itemIdx = rowMask.find(1, itemIdx + 1)
+
+    def iterCells(self):
+        """(cityIdx, itemIdx, rawMarkup, offset) for every present cell, row by row."""
+        for cityIdx in range(len(self.cityNames)):
+            rowStart = cityIdx * len(self.itemNames)
+            for itemIdx in self.presentItemIndexes(cityIdx):
+                yield cityIdx, itemIdx, self.rawMarkups[rowStart + itemIdx], self.offsets[rowStart + itemIdx]
+
+    def presentCells(self):
+        """array('q') of the cell index of every present cell, row by row (what a table of all markups shows)."""
+        if numpyAvailable:
+            return array('q', np.flatnonzero(np.frombuffer(self.present, dtype=np.uint8)).astype(np.int64).tobytes())
+        cells = array('q')
+        present = self.present
+        cellIdx = present.find(1)
+        while cellIdx != -1:
+            cells.append(cellIdx)
+            cellIdx = present.find(1, cellIdx + 1)
+        return cells
+
+    def isPresent(self, cityIdx, itemIdx):
+        return self.present[self.cellIndex(cityIdx, itemIdx)] == 1
+
+    def markup(self, cityIdx, itemIdx):
+        """Markup in percent, or None if the city doesn't list the item."""
+        cellIdx = self.cellIndex(cityIdx, itemIdx)
+        return self.rawMarkups[cellIdx] / MARKUP_SCALE if self.present[cellIdx] else None
+
+    def offset(self, cityIdx, itemIdx):
+        cellIdx = self.cellIndex(cityIdx, itemIdx)
+        return self.offsets[cellIdx] if self.present[cellIdx] else None
+
+    def get(self, cityName, itemName):
+        """[markup, offset] by name like the nested dict, or None."""
+        cityIdx = self.cityIndex.get(cityName)
+        itemIdx = self.itemIndex.get(itemName)
+        if cityIdx is None or itemIdx is None or not self.isPresent(cityIdx, itemIdx):
+            return None
+        cellIdx = self.cellIndex(cityIdx, itemIdx)
+        return [self.rawMarkups[cellIdx] / MARKUP_SCALE, self.offsets[cellIdx]]
+
+    def setMarkup(self, cityIdx, itemIdx, markupPercentage):
+        """Changes an existing cell's markup (raises ValueError if it doesn't fit the save's signed short)."""
+        cellIdx = self.cellIndex(cityIdx, itemIdx)
+        if not self.present[cellIdx]:
+            raise KeyError(f"'{self.cityNames[cityIdx]}' has no markup for '{self.itemNames[itemIdx]}'.")
+        self.rawMarkups[cellIdx] = markupToRaw(markupPercentage)
+
+    def nbytes(self):
+        """Bytes held by the cell arrays (the name tables come on top)."""
+        return self.rawMarkups.itemsize * len(self.rawMarkups) + self.offsets.itemsize * len(self.offsets) + len(self.present)
+
+    def numpyViews(self):
+        """
+        Zero-copy numpy views shaped (cities, items): {"rawMarkups": int16, "offsets": int64, "present": bool}.
+        Writes through them change the matrix. None when numpy isn't installed.
+        """
+        if not numpyAvailable:
+            return None
+        matrixShape = self.shape
+        return {
+            "rawMarkups": np.frombuffer(self.rawMarkups, dtype=np.int16).reshape(matrixShape),
+            "offsets": np.frombuffer(self.offsets, dtype=np.int64).reshape(matrixShape),
+            "present": np.frombuffer(self.present, dtype=np.bool_).reshape(matrixShape),
+        }
+
+def estimateNestedDictBytes(data):
+    """Rough memory held by a nested markups dict (containers and values, not the shared name strings)."""
+    totalBytes = sys.getsizeof(data)
+    for cityItems in data.values():
+        totalBytes += sys.getsizeof(cityItems)
+        for entry in cityItems.values():
+            totalBytes += sys.getsizeof(entry)
+            if isinstance(entry, list):
+                totalBytes += sum(sys.getsizeof(value) for value in entry)
+    return totalBytes
@@ -0,0 +1,322 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+
+from extraction_cache import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_VERSION
+from extract_game_data import CITY_CACHE_FILE, EXTRACTED_MARKUPS_FILE, findGameSaveFile, resolveCityNames, runExtraction, writeExtractedMarkups
+from incremental_extraction import INCREMENTAL_STATE_FILE
+from save_discovery import LOCAL_SAVE_FOLDER, SAVE_INDEX_FILE
+from steam_library import KENSHI_INSTALL_CACHE_FILE
+from translation_cache import TRANSLATION_CACHE_FILE
+from translate_item_ids import (DEFAULT_DATAFILES_DIR, TRANSLATED_MARKUPS_FILE, locateDictionaryFiles, lookupItemNames,
+                                translateMarkups, writeTranslatedMarkups)
+from json_to_csv_converter import csvFormatFor, exportMarkups, unknownExportFormats
+from markup_history import MarkupHistory
+from markup_matrix import MarkupMatrix
+from markup_sidecar import MARKUP_SIDECAR_FILE, readMarkupSidecar, readSidecarHeader, writeMarkupSidecar
+from save_access import computeSaveFingerprint
+
+MARKUPS_CSV_FILE = "game_markups_spreadsheet.csv"
+
+class PipelineCancelled(Exception):
+    """Raised from the progress callbacks once the pipeline's cancelEvent is set, unwinds the running stage."""
+
+def makePipelineResult(savePath=None, error=None):
+    return {
+        "savePath": savePath,
+        "markups": {}, # {city: {itemName: [markup, offset]}}, left empty on a sidecar hit
+        "matrix": None, # the same markups as a MarkupMatrix, what the editor shows; read this one when it is set
+        "itemIdMarkups": {}, # same with the raw item IDs, as extracted
+        "untranslatedIds": [],
+        "snapshotId": None, # markup history snapshot, when recorded
+        "dictionaryFiles": [],
+        "artifacts": {}, # kind -> path of every file written
+        "stats": {},
+        "error": error,
+        "warnings": [], # problems that did not stop the run, e.g. unknown export formats that were skipped
+        "cancelled": False, # True when the run was stopped through cancelEvent
+    }
+
+def resolveNamesEarly(itemIds, dictionaryFiles, datafilesDir, translationCachePath, workers, onDictionaryScanned=None,
+                      kenshiInstallCachePath=KENSHI_INSTALL_CACHE_FILE):
+    """Translation stage body for overlapped runs: locates the dictionaries if needed and resolves every item ID in the save."""
+    stageStart = time.perf_counter()
+    if dictionaryFiles is None:
+        dictionaryFiles = locateDictionaryFiles(datafilesDir, kenshiInstallCachePath=kenshiInstallCachePath)
+    itemIdToNameMap = lookupItemNames(itemIds, dictionaryFiles, translationCachePath, workers, useProcessPool=True,
+                                      onDictionaryScanned=onDictionaryScanned) if dictionaryFiles else {}
+    return dictionaryFiles, itemIdToNameMap, time.perf_counter() - stageStart
+
+def makePipelineConfigDigest(gameFilePath, dictionaryFiles, markupLowerBound, markupUpperBound, discoverCities, cityAllowList, cityDenyList):
+    """Digest of everything besides the save's bytes that shapes the translated markups, stored in the sidecar header."""
+    dictionaryStats = []
+    for dictionaryPath in dictionaryFiles:
+        try:
+            dictionaryStat = os.stat(dictionaryPath)
+            dictionaryStats.append([os.path.abspath(dictionaryPath), dictionaryStat.st_size, dictionaryStat.st_mtime_ns])
+        except OSError:
+            dictionaryStats.append([os.path.abspath(dictionaryPath), -1, -1])
+    digestSource = json.dumps({
+        "extractionVersion": EXTRACTION_CACHE_VERSION,
+        "save": os.path.abspath(gameFilePath),
+        "bounds": [markupLowerBound, markupUpperBound],
+        "discoverCities": discoverCities,
+        "allow": sorted(cityAllowList or ()),
+        "deny": sorted(cityDenyList or ()),
+        "dictionaries": dictionaryStats,
+    }, sort_keys=True)
+    return hashlib.blake2b(digestSource.encode('utf-8'), digest_size=16).digest()
+
+def loadFreshSidecar(sidecarPath, gameFilePath, saveFingerprint, configDigest, historyPath=None):
+    """
+    The sidecar's matrix and the save's markup history snapshot id if the sidecar was written for this save (same size,
+    mtime and content hash as saveFingerprint, see computeSaveFingerprint) and this config, otherwise (None, None).
+    Comparing the hash catches a save rewritten within the mtime resolution or copied over with its timestamp kept.
+    With historyPath the sidecar only counts as fresh when that history already has the save, so a run that has to
+    record it still extracts it.
+    """
+    if saveFingerprint is None:
+        return None, None
+    header = readSidecarHeader(sidecarPath)
+    if header is None:
+        return None, None
+    sidecarSave = header["saveFingerprint"]
+    if sidecarSave != saveFingerprint or header["configDigest"] != configDigest:
+        return None, None
+    snapshotId = None
+    if historyPath:
+        with MarkupHistory(historyPath) as markupHistory:
+            snapshotId = markupHistory.findSnapshot(sidecarSave["hash"])
+        if snapshotId is None:
+            print(f"Save {gameFilePath} is not in the markup history yet, not using the sidecar.")
+            return None, None
+    sidecar = readMarkupSidecar(sidecarPath)
+    return (sidecar[0], snapshotId) if sidecar else (None, None)
+
+def exportPipelineMarkups(markups, result, outputDir, exportCsv, citiesHorizontal, exportFormats):
+    """Export stage: the spreadsheet (exportCsv) and any exportFormats in one exportMarkups pass, recorded in the result."""
+    outputPaths = {exportFormat: os.path.join(outputDir, fileName) for exportFormat, fileName in (exportFormats or {}).items()}
+    if exportCsv:
+        outputPaths[csvFormatFor(citiesHorizontal)] = os.path.join(outputDir, MARKUPS_CSV_FILE)
+    if not outputPaths:
+        return
+    unknownFormats = unknownExportFormats(outputPaths)
+    if unknownFormats:
+        result["warnings"].append(f"Unknown export format(s) {unknownFormats} were skipped, the other exports were written.")
+    stepStart = time.perf_counter()
+    for exportFormat, exportPath in exportMarkups(markups, outputPaths).items():
+        artifactKind = "csv" if exportCsv and exportFormat == csvFormatFor(citiesHorizontal) else exportFormat
+        result["artifacts"][artifactKind] = exportPath
+    result["stats"]["exportSeconds"] = time.perf_counter() - stepStart
+
+def runPipeline(gameFilePath=None, saveFolderPath=LOCAL_SAVE_FOLDER, outputDir=".", writeArtifacts=False, exportCsv=False, citiesHorizontal=True,
+                markupLowerBound=1.0, markupUpperBound=175.0, discoverCities=True, cityAllowList=None, cityDenyList=None,
+                datafilesDir=DEFAULT_DATAFILES_DIR, dictionaryFiles=None, extractionWorkers=1, translationWorkers=1,
+                incremental=True, useExtractionCache=True, useTranslationCache=True, overlapTranslation=None, useSidecar=True,
+                exportFormats=None, historyPath=None, onProgress=None, cancelEvent=None):
+    """
+    Extract -> translate -> (optionally) export in this process, passing the markups along as dicts instead of
+    round-tripping them through JSON files. gameFilePath defaults to the save findGameSaveFile picks.
+    writeArtifacts also writes extracted_game_markups.json and translated_game_markups.json to outputDir like the
+    scripts do, exportCsv the spreadsheet. exportFormats ({format: file name in outputDir}, see json_to_csv_converter.exportMarkups)
+    adds more exports, written in the same pass as the spreadsheet; unknown formats are skipped and listed in result["warnings"]. dictionaryFiles skips locating them (callers reloading often keep the list).
+    With overlapTranslation the extractor hands over the save's item IDs after its first pass and a background thread
+    locates and indexes the dictionaries (in a worker process, so it really runs alongside the regex scans) while
+    the city segments are extracted. That stage resolves every ID in the save, a superset of what survives the
+    filters, so the result is identical to translating afterwards; only the wall time drops towards max(extract, translate).
+    None (default) overlaps only on machines with more than one CPU, on a single core the stages would just take turns.
+    useSidecar keeps the translated markups in translated_game_markups.kmm in outputDir (see markup_sidecar). When its
+    header matches the save's size, mtime and content hash and the config, extraction and translation are skipped and the matrix is
+    mapped straight from it; stats["sidecarHit"] is True and only "matrix" holds the markups then (markups, itemIdMarkups
+    and untranslatedIds stay empty), so callers should read result["matrix"] or MarkupMatrix.fromNestedDict(result["markups"]).
+    historyPath records every extracted save in that markup history database (see markup_history). The sidecar is only
+    used for a save that history already has (snapshotId is set to that snapshot), otherwise the save is extracted and recorded.
+    onProgress(stage, done, total, detail), if given, is called after every city segment ("cities", detail is
+    (cityName, that city's markups so far by item ID)) and every dictionary file ("dictionaries", detail is the file
+    about to be scanned, None once all are). With overlapTranslation the two stages report from different threads.
+    cancelEvent (a threading.Event) stops the run at the next report or stage boundary; the result then has
+    "cancelled" set. A stopped extraction doesn't save its incremental state, and nothing is written to the history,
+    sidecar or exports.
+    The caches and state files (translation cache, extraction cache, incremental state, discovered towns, save index,
+    Kenshi install path) live in outputDir, and relative saveFolderPath and datafilesDir are resolved against it,
+    so the result doesn't depend on the working directory.
+    Returns a result dict (see makePipelineResult); on failure "error" says why and the rest is whatever got done.
+    """
+    saveFolderPath = os.path.join(outputDir, saveFolderPath) # absolute paths are kept as they are
+    datafilesDir = os.path.join(outputDir, datafilesDir)
+    kenshiInstallCachePath = os.path.join(outputDir, KENSHI_INSTALL_CACHE_FILE)
+    if overlapTranslation is None:
+        overlapTranslation = (os.cpu_count() or 1) > 1
+    stats = {}
+    pipelineStart = time.perf_counter()
+    if gameFilePath is None:
+        gameFilePath = findGameSaveFile(saveFolderPath, os.path.join(outputDir, SAVE_INDEX_FILE))
+        if not gameFilePath:
+            return makePipelineResult(error=f"No .save file found in '{saveFolderPath}' or the Kenshi save folders.")
+    result = makePipelineResult(gameFilePath)
+    result["stats"] = stats
+
+    translationCachePath = os.path.join(outputDir, TRANSLATION_CACHE_FILE) if useTranslationCache else None
+
+    def checkCancelled():
+        if cancelEvent is not None and cancelEvent.is_set():
+            raise PipelineCancelled()
+
+    def onCityExtracted(cityName, cityItems, segmentsDone, segmentsTotal):
+        checkCancelled()
+        if onProgress is not None:
+            onProgress("cities", segmentsDone, segmentsTotal, (cityName, cityItems))
+
+    def onDictionaryScanned(dictFilePath, filesDone, filesTotal):
+        checkCancelled()
+        if onProgress is not None:
+            onProgress("dictionaries", filesDone, filesTotal, dictFilePath)
+
+    sidecarPath = os.path.join(outputDir, MARKUP_SIDECAR_FILE)
+    configDigest = None
+    saveFingerprint = None
+    stats["sidecarHit"] = False
+    if useSidecar or historyPath:
+        try:
+            saveFingerprint = computeSaveFingerprint(gameFilePath) # hashed once, shared with the sidecar check and the extraction cache
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not fingerprint {gameFilePath}: {e}")
+    if useSidecar:
+        if dictionaryFiles is None:
+            dictionaryFiles = locateDictionaryFiles(datafilesDir, kenshiInstallCachePath=kenshiInstallCachePath)
+        configDigest = makePipelineConfigDigest(gameFilePath, dictionaryFiles, markupLowerBound, markupUpperBound,
+                                                discoverCities, cityAllowList, cityDenyList)
+        matrix, snapshotId = loadFreshSidecar(sidecarPath, gameFilePath, saveFingerprint, configDigest, historyPath)
+        if matrix is not None:
+            result["matrix"] = matrix # markups stays empty, building the nested dict would cost more than the whole load
+            result["dictionaryFiles"] = dictionaryFiles
+            result["snapshotId"] = snapshotId
+            result["artifacts"]["sidecar"] = sidecarPath
+            stats["sidecarHit"] = True
+            stats["cities"], stats["markups"] = len(matrix.cityNames), len(matrix)
+            exportPipelineMarkups(matrix, result, outputDir, exportCsv, citiesHorizontal, exportFormats)
+            stats["totalSeconds"] = time.perf_counter() - pipelineStart
+            print(f"Pipeline loaded {stats['markups']} markups in {stats['cities']} cities from {sidecarPath} in {stats['totalSeconds']:.2f}s.")
+            return result
+    try:
+        translationExecutor = None
+        translationFuture = None
+        translationStageStop = threading.Event() # set when extraction fails, nobody will wait for the names then
+
+        def onEarlyDictionaryScanned(dictFilePath, filesDone, filesTotal):
+            if translationStageStop.is_set():
+                raise PipelineCancelled()
+            onDictionaryScanned(dictFilePath, filesDone, filesTotal)
+
+        def onItemIdsFound(itemIds): # runs on the extraction thread, starts the translation stage
+            nonlocal translationExecutor, translationFuture
+            if translationFuture is not None:
+                return
+            translationExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="TranslationStage")
+            translationFuture = translationExecutor.submit(resolveNamesEarly, list(itemIds), dictionaryFiles, datafilesDir,
+                                                           translationCachePath, translationWorkers, onEarlyDictionaryScanned,
+                                                           kenshiInstallCachePath)
+
+        checkCancelled()
+        stepStart = time.perf_counter()
+        cityNames, boundaryCityNames = resolveCityNames(gameFilePath, discoverCities, cityAllowList, cityDenyList,
+                                                        os.path.join(outputDir, CITY_CACHE_FILE))
+        if not cityNames:
+            result["error"] = "No towns to extract. Check the town discovery and allow/deny lists."
+            return result
+        itemIdMarkups = None
+        try:
+            itemIdMarkups = runExtraction(gameFilePath, cityNames, markupLowerBound, markupUpperBound, boundaryCityNames,
+                                          workers=extractionWorkers, incremental=incremental, useCache=useExtractionCache,
+                                          onItemIdsFound=onItemIdsFound if overlapTranslation else None, saveFingerprint=saveFingerprint,
+                                          onCityExtracted=onCityExtracted, cacheDir=os.path.join(outputDir, EXTRACTION_CACHE_DIR),
+                                          incrementalStatePath=os.path.join(outputDir, INCREMENTAL_STATE_FILE))
+        finally:
+            if translationExecutor is not None:
+                if itemIdMarkups is None: # failed, raised or cancelled: stop the stage at its next dictionary file
+                    translationStageStop.set()
+                    translationFuture.cancel()
+                translationExecutor.shutdown(wait=False) # the running stage finishes on its own, its future stays usable
+        stats["extractSeconds"] = time.perf_counter() - stepStart
+        if itemIdMarkups is None:
+            result["error"] = f"Extraction failed for {gameFilePath}, see the log for details."
+            return result
+        result["itemIdMarkups"] = itemIdMarkups
+        stats["cities"] = len(itemIdMarkups)
+        stats["markups"] = sum(len(cityItems) for cityItems in itemIdMarkups.values())
+        if writeArtifacts:
+            extractedPath = os.path.join(outputDir, EXTRACTED_MARKUPS_FILE)
+            if writeExtractedMarkups(itemIdMarkups, extractedPath):
+                result["artifacts"]["extracted"] = extractedPath
+
+        stepStart = time.perf_counter()
+        itemIdToNameMap = None
+        if translationFuture is not None:
+            dictionaryFiles, itemIdToNameMap, stats["translateSeconds"] = translationFuture.result()
+            stats["translateWaitSeconds"] = time.perf_counter() - stepStart # how long translation outlasted extraction
+        elif dictionaryFiles is None:
+            dictionaryFiles = locateDictionaryFiles(datafilesDir, kenshiInstallCachePath=kenshiInstallCachePath)
+        result["dictionaryFiles"] = dictionaryFiles
+        if not dictionaryFiles:
+            result["error"] = "No dictionary files (.mod/.base) found. Add them to the datafiles folder or install Kenshi through Steam."
+            return result
+        if historyPath and itemIdToNameMap is None: # the history stores the names too, resolve them once for both
+            allItemIds = {itemId for cityItems in itemIdMarkups.values() for itemId in cityItems}
+            itemIdToNameMap = lookupItemNames(allItemIds, dictionaryFiles, translationCachePath, translationWorkers,
+                                              onDictionaryScanned=onDictionaryScanned)
+        translatedMarkups, untranslatedIds = translateMarkups(itemIdMarkups, dictionaryFiles, translationCachePath, translationWorkers,
+                                                              itemIdToNameMap, onDictionaryScanned)
+        checkCancelled() # last point to stop before the history, sidecar and exports are written
+        if translationFuture is None:
+            stats["translateSeconds"] = time.perf_counter() - stepStart
+        result["markups"] = translatedMarkups
+        result["untranslatedIds"] = sorted(untranslatedIds)
+        if historyPath and saveFingerprint is not None:
+            stepStart = time.perf_counter()
+            with MarkupHistory(historyPath) as markupHistory:
+                result["snapshotId"] = markupHistory.recordSnapshot(itemIdMarkups, saveFingerprint, gameFilePath, itemIdToNameMap)
+            stats["historySeconds"] = time.perf_counter() - stepStart
+        if useSidecar and saveFingerprint is not None:
+            try:
+                result["matrix"] = MarkupMatrix.fromNestedDict(translatedMarkups)
+            except ValueError as e:
+                print(f"Warning: Not writing the markup sidecar: {e}")
+            if result["matrix"] is not None and writeMarkupSidecar(sidecarPath, result["matrix"], saveFingerprint, configDigest):
+                result["artifacts"]["sidecar"] = sidecarPath
+        if writeArtifacts:
+            translatedPath = os.path.join(outputDir, TRANSLATED_MARKUPS_FILE)
+            if writeTranslatedMarkups(translatedMarkups, translatedPath):
+                result["artifacts"]["translated"] = translatedPath
+
+        exportPipelineMarkups(result["matrix"] or translatedMarkups, result, outputDir, exportCsv, citiesHorizontal, exportFormats)
+
+        stats["totalSeconds"] = time.perf_counter() - pipelineStart
+        print(f"Pipeline finished in {stats['totalSeconds']:.2f}s: {stats['markups']} markups in {stats['cities']} cities, "
+              f"{len(untranslatedIds)} untranslated item IDs.")
+        return result
+    except PipelineCancelled:
+        stats["totalSeconds"] = time.perf_counter() - pipelineStart
+        print(f"Pipeline cancelled after {stats['totalSeconds']:.2f}s.")
+        result["error"] = "Cancelled."
+        result["cancelled"] = True
+        return result
+
+if __name__ == "__main__":
+    # --- USER CONFIGURATION ---
+    WRITE_JSON_FILES = True # also write extracted_game_markups.json and translated_game_markups.json
+    EXPORT_CSV = True # also write game_markups_spreadsheet.csv
+    EXPORT_FORMATS = {} # more exports in the same pass, e.g. {"jsonl": "game_markups.jsonl", "npz": "game_markups.npz"}
+    # --- END USER CONFIGURATION ---
+
+    pipelineResult = runPipeline(writeArtifacts=WRITE_JSON_FILES, exportCsv=EXPORT_CSV, exportFormats=EXPORT_FORMATS)
+    if pipelineResult["error"]:
+        print(f"\nError: {pipelineResult['error']}")
+    else:
+        print(f"\nSave: {pipelineResult['savePath']}")
+        for warning in pipelineResult["warnings"]:
+            print(f"Warning: {warning}")
+        for kind, artifactPath in pipelineResult["artifacts"].items():
+            print(f"Wrote {kind}: {artifactPath}")
@@ -0,0 +1,155 @@
+import math
+import random
+import re
+from array import array
+from statistics import NormalDist
+
+from markup_matrix import MARKUP_SCALE, markupToRaw
+
+# numpy is optional, the pure-Python path draws the same distributions
+np = None
+numpyAvailable = False
+try:
+    import numpy as np
+    numpyAvailable = True
+except ImportError:
+    numpyAvailable = False
+
+DISTRIBUTIONS = ["Uniform", "Normal", "Truncated Normal", "Triangular", "Beta (Two-Peak)"]
+NORMAL_SIGMAS = 2.0 # the caps sit this many standard deviations from the middle (sigma = (upper - lower) / 4)
+BETA_TWO_PEAK_SHAPE = 0.5 # alpha = beta = 0.5, the arcsine distribution
+
+# item category -> regex on the item name, the first match wins. Used for per-category caps.
+ITEM_CATEGORIES = {
+    "Weapons": r"\b(?:katana|sabre|blade|sword|cleaver|hacker|axe|club|hammer|spear|naginata|polearm|crossbow|harpoon)s?\b",
+    "Armour": r"\b(?:armou?r|helmet|hat|mask|boots|shoes|gloves|coat|shirt|pants|robe|vest)s?\b",
+    "Food": r"\b(?:bread|meat|fish|rice|ration|wheat|cactus|foodcube|gohan|dustwich|sandwich|noodle|soup)s?\b",
+    "Drugs & Drink": r"\b(?:grog|sake|rum|hashish|hash|tea|beer|wine|liquor)\b",
+    "Medical": r"\b(?:bandage|first aid|medkit|splint|surgical|repair kit)s?\b",
+    "Materials": r"\b(?:iron plate|copper|fabric|leather|hemp|cotton|building materials?|steel bar|electrical components?|hide|flour|dye)s?\b",
+    "Blueprints": r"\b(?:blueprint|book|research)s?\b",
+}
+
+def categorizeItems(itemNames, itemCategories=ITEM_CATEGORIES):
+    """Category name per item (None if no pattern matches), patterns are case-insensitive."""
+    categoryPatterns = [(categoryName, re.compile(pattern, re.IGNORECASE)) for categoryName, pattern in itemCategories.items()]
+    itemCategoryNames = []
+    for itemName in itemNames:
+        itemCategoryNames.append(next((categoryName for categoryName, pattern in categoryPatterns if pattern.search(itemName)), None))
+    return itemCategoryNames
+
+def checkCaps(lowerCap, upperCap, capsName="Caps"):
+    """(lowerCap, upperCap - lowerCap) as floats, raises ValueError when they're reversed or don't fit the save."""
+    lowerCap, upperCap = float(lowerCap), float(upperCap)
+    if lowerCap >= upperCap:
+        raise ValueError(f"{capsName}: lower cap {lowerCap}% must be less than upper cap {upperCap}%.")
+    markupToRaw(lowerCap)
+    markupToRaw(upperCap)
+    return lowerCap, upperCap - lowerCap
+
+def resolveCaps(matrix, lowerCap, upperCap, cityCaps=None, categoryCaps=None, itemCategories=ITEM_CATEGORIES):
+    """
+    Per-city and per-item (lower, span) tables. A city listed in cityCaps ({cityName: (lower, upper)}) uses those
+    caps instead of the defaults; an item whose category is in categoryCaps ({categoryName: (lower, upper)}) uses the
+    category's caps in every city, so the most specific rule wins. Items without a category cap get None.
+    Raises ValueError for caps that are reversed or don't fit the save.
+    """
+    defaultCaps = checkCaps(lowerCap, upperCap)
+    cityCapsTable = [defaultCaps] * len(matrix.cityNames)
+    for cityName, (cityLowerCap, cityUpperCap) in (cityCaps or {}).items():
+        cityIdx = matrix.cityIndex.get(cityName)
+        if cityIdx is None:
+            print(f"Warning: No town '{cityName}' in the markups, ignoring its caps.")
+            continue
+        cityCapsTable[cityIdx] = checkCaps(cityLowerCap, cityUpperCap, cityName)
+    itemCapsTable = [None] * len(matrix.itemNames)
+    if categoryCaps:
+        checkedCategoryCaps = {categoryName: checkCaps(categoryLowerCap, categoryUpperCap, categoryName)
+                               for categoryName, (categoryLowerCap, categoryUpperCap) in categoryCaps.items()}
+        for itemIdx, categoryName in enumerate(categorizeItems(matrix.itemNames, itemCategories)):
+            itemCapsTable[itemIdx] = checkedCategoryCaps.get(categoryName)
+    return cityCapsTable, itemCapsTable
+
+def drawUnitSamples(distribution, count, seed=None, useNumpy=None):
+    """
+    count draws in [0, 1] from the distribution, scaled onto each cell's caps afterwards (every distribution here
+    is centred between the caps, so one standard draw serves any caps). A numpy array with numpy, otherwise a list.
+    The same seed gives the same draws on the same path (numpy and pure Python use different generators).
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}', expected one of: {', '.join(DISTRIBUTIONS)}.")
+    if useNumpy is None:
+        useNumpy = numpyAvailable
+    if useNumpy:
+        rng = np.random.default_rng(seed)
+        if distribution == "Uniform":
+            return rng.random(count)
+        if distribution == "Normal": # clipped to the caps, like the editor always did
+            return np.clip(0.5 + rng.standard_normal(count) / (2 * NORMAL_SIGMAS), 0.0, 1.0)
+        if distribution == "Truncated Normal": # redraw what falls outside the caps instead of piling it up on them
+            normalDraws = rng.standard_normal(count)
+            outside = np.flatnonzero(np.abs(normalDraws) > NORMAL_SIGMAS)
+            while outside.size:
+                normalDraws[outside] = rng.standard_normal(outside.size)
+                outside = outside[np.abs(normalDraws[outside]) > NORMAL_SIGMAS]
+            return 0.5 + normalDraws / (2 * NORMAL_SIGMAS)
+        if distribution == "Triangular":
+            return rng.triangular(0.0, 0.5, 1.0, count)
+        return rng.beta(BETA_TWO_PEAK_SHAPE, BETA_TWO_PEAK_SHAPE, count)
+
+    generator = random.Random(seed)
+    uniformDraw = generator.random
+    if distribution == "Uniform":
+        return [uniformDraw() for _ in range(count)]
+    if distribution == "Normal":
+        gaussDraw = generator.gauss
+        return [min(1.0, max(0.0, 0.5 + gaussDraw(0.0, 1.0) / (2 * NORMAL_SIGMAS))) for _ in range(count)]
+    if distribution == "Truncated Normal": # inverse CDF over the caps' share of the normal, one uniform draw each
+        standardNormal = NormalDist()
+        lowerTail = standardNormal.cdf(-NORMAL_SIGMAS)
+        tailSpan = 1.0 - 2 * lowerTail
+        invCdf = standardNormal.inv_cdf
+        return [0.5 + invCdf(lowerTail + uniformDraw() * tailSpan) / (2 * NORMAL_SIGMAS) for _ in range(count)]
+    if distribution == "Triangular": # inverse CDF of the symmetric triangle on [0, 1]
+        sqrt = math.sqrt
+        samples = []
+        for _ in range(count):
+            u = uniformDraw()
+            samples.append(sqrt(u / 2) if u < 0.5 else 1.0 - sqrt((1.0 - u) / 2))
+        return samples
+    sin, halfPi = math.sin, math.pi / 2 # Beta(0.5, 0.5) has the closed-form inverse CDF sin^2(pi * u / 2)
+    return [sin(halfPi * uniformDraw()) ** 2 for _ in range(count)]
+
+def randomizeMarkups(matrix, cells, distribution="Uniform", lowerCap=70.0, upperCap=140.5, cityCaps=None, categoryCaps=None,
+                     itemCategories=ITEM_CATEGORIES, seed=None, useNumpy=None):
+    """
+    New raw markups (array('h'), aligned with cells) for the given cell indexes of the matrix, drawn all at once.
+    Caps are in percent, see resolveCaps for the per-town and per-category ones. With a seed the result is reproducible.
+    Raises ValueError for bad caps or an unknown distribution.
+    """
+    if useNumpy is None:
+        useNumpy = numpyAvailable
+    cityCapsTable, itemCapsTable = resolveCaps(matrix, lowerCap, upperCap, cityCaps, categoryCaps, itemCategories)
+    samples = drawUnitSamples(distribution, len(cells), seed, useNumpy)
+    itemCount = len(matrix.itemNames)
+    if useNumpy:
+        cellIdxs = np.asarray(cells, dtype=np.int64)
+        cellCityIdxs = cellIdxs // max(itemCount, 1)
+        lowers = np.array([cityCaps[0] for cityCaps in cityCapsTable], dtype=np.float64)[cellCityIdxs]
+        spans = np.array([cityCaps[1] for cityCaps in cityCapsTable], dtype=np.float64)[cellCityIdxs]
+        if any(itemCaps is not None for itemCaps in itemCapsTable):
+            itemLowers = np.array([itemCaps[0] if itemCaps else np.nan for itemCaps in itemCapsTable], dtype=np.float64)
+            itemSpans = np.array([itemCaps[1] if itemCaps else np.nan for itemCaps in itemCapsTable], dtype=np.float64)
+            cellItemIdxs = cellIdxs % itemCount
+            cellItemLowers, cellItemSpans = itemLowers[cellItemIdxs], itemSpans[cellItemIdxs]
+            hasItemCaps = ~np.isnan(cellItemLowers)
+            lowers = np.where(hasItemCaps, cellItemLowers, lowers)
+            spans = np.where(hasItemCaps, cellItemSpans, spans)
+        rawMarkups = np.rint((lowers + spans * samples) * MARKUP_SCALE).astype(np.int16)
+        return array('h', rawMarkups.tobytes())
+
+    rawMarkups = array('h')
+    for cellIdx, sample in zip(cells, samples):
+        capsLower, capsSpan = itemCapsTable[cellIdx % itemCount] or cityCapsTable[cellIdx // itemCount]
+        rawMarkups.append(round((capsLower + capsSpan * sample) * MARKUP_SCALE))
+    return rawMarkups
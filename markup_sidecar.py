@@ -0,0 +1,165 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from markup_matrix import MarkupMatrix
+
+MARKUP_SIDECAR_FILE = "translated_game_markups.kmm"
+SIDECAR_MAGIC = b"KMKM"
+SIDECAR_VERSION = 1
+SIDECAR_ALIGNMENT = 8
+# magic, version, header size, city count, item count, save size, save mtime, save hash, config digest
+SIDECAR_HEADER = struct.Struct('<4sHHIIQd16s16s')
+SIDECAR_SECTION = struct.Struct('<QQ') # offset, length
+SIDECAR_SECTIONS = ["cityNames", "itemNames", "rawMarkups", "offsets", "present"]
+SIDECAR_HEADER_SIZE = SIDECAR_HEADER.size + SIDECAR_SECTION.size * len(SIDECAR_SECTIONS)
+NAME_END_FORMAT = 'I' # name tables: (count + 1) little-endian uint32 end positions, then the UTF-8 names back to back
+
+def alignUp(position):
+    return (position + SIDECAR_ALIGNMENT - 1) // SIDECAR_ALIGNMENT * SIDECAR_ALIGNMENT
+
+def packLittleEndian(values, typeCode):
+    packed = array(typeCode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def packNameTable(names):
+    encodedNames = [name.encode('utf-8') for name in names]
+    endPositions = [0]
+    for encodedName in encodedNames:
+        endPositions.append(endPositions[-1] + len(encodedName))
+    return packLittleEndian(endPositions, NAME_END_FORMAT) + b"".join(encodedNames)
+
+def unpackNameTable(view, count):
+    endsSize = (count + 1) * 4
+    endPositions = loadLittleEndianArray(NAME_END_FORMAT, view[:endsSize])
+    blob = view[endsSize:]
+    return [str(blob[endPositions[i]:endPositions[i + 1]], 'utf-8') for i in range(count)]
+
+def writeMarkupSidecar(sidecarPath, matrix, saveFingerprint=None, configDigest=b""):
+    """
+    Writes a MarkupMatrix as a versioned binary file that readMarkupSidecar maps without parsing:
+    a fixed header (magic, version, counts, the source save's size/mtime/hash and a config digest), a section table,
+    then the city and item name tables and the raw markup, offset and presence arrays, each 8-byte aligned.
+    Written to a temp file and renamed so readers never see half a file. Returns True on success.
+    """
+    saveFingerprint = saveFingerprint or {"size": 0, "mtime": 0.0, "hash": ""}
+    sectionData = [
+        packNameTable(matrix.cityNames),
+        packNameTable(matrix.itemNames),
+        packLittleEndian(matrix.rawMarkups, 'h'),
+        packLittleEndian(matrix.offsets, 'q'),
+        bytes(matrix.present),
+    ]
+    sectionTable = []
+    position = alignUp(SIDECAR_HEADER_SIZE)
+    for data in sectionData:
+        sectionTable.append((position, len(data)))
+        position = alignUp(position + len(data))
+
+    header = SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, SIDECAR_HEADER_SIZE, len(matrix.cityNames), len(matrix.itemNames),
+                                 saveFingerprint["size"], saveFingerprint["mtime"], bytes.fromhex(saveFingerprint["hash"]).ljust(16, b"\x00"),
+                                 configDigest[:16].ljust(16, b"\x00"))
+    header += b"".join(SIDECAR_SECTION.pack(sectionOffset, sectionLength) for sectionOffset, sectionLength in sectionTable)
+    try:
+        tempPath = sidecarPath + ".tmp"
+        with open(tempPath, 'wb') as f:
+            f.write(header)
+            for (sectionOffset, _), data in zip(sectionTable, sectionData):
+                f.write(b"\x00" * (sectionOffset - f.tell()))
+                f.write(data)
+        os.replace(tempPath, sidecarPath)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not write markup sidecar {sidecarPath}: {e}")
+        return False
+
+def readSidecarHeader(sidecarPath):
+    """Header fields of a sidecar as a dict (no sections read), or None if it's missing, foreign or another version."""
+    try:
+        with open(sidecarPath, 'rb') as f:
+            headerBytes = f.read(SIDECAR_HEADER_SIZE)
+    except OSError:
+        return None
+    return parseSidecarHeader(headerBytes)
+
+def parseSidecarHeader(headerBytes):
+    if len(headerBytes) < SIDECAR_HEADER_SIZE:
+        return None
+    magic, version, headerSize, cityCount, itemCount, saveSize, saveMtime, saveHash, configDigest = SIDECAR_HEADER.unpack_from(headerBytes)
+    if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or headerSize != SIDECAR_HEADER_SIZE:
+        return None
+    sections = {}
+    for sectionIdx, sectionName in enumerate(SIDECAR_SECTIONS):
+        sections[sectionName] = SIDECAR_SECTION.unpack_from(headerBytes, SIDECAR_HEADER.size + sectionIdx * SIDECAR_SECTION.size)
+    return {
+        "cityCount": cityCount,
+        "itemCount": itemCount,
+        "saveFingerprint": {"size": saveSize, "mtime": saveMtime, "hash": saveHash.hex()},
+        "configDigest": configDigest,
+        "sections": sections,
+    }
+
+def loadLittleEndianArray(typeCode, view):
+    """Copies a little-endian section into a native array (a single memcpy on little-endian machines)."""
+    loaded = array(typeCode)
+    loaded.frombytes(view)
+    if sys.byteorder != 'little':
+        loaded.byteswap()
+    return loaded
+
+def readMarkupSidecar(sidecarPath, copyArrays=True):
+    """
+    Opens a sidecar written by writeMarkupSidecar. Returns (matrix, header) or None if the file is missing or invalid.
+    Nothing is parsed: the sections are slices of a memory map and only the names get decoded. With copyArrays the
+    markup and offset arrays are copied out (one memcpy each) so the matrix can be edited and the file replaced;
+    otherwise they stay memoryview.cast views of the map, which the read-only matrix keeps open.
+    """
+    try:
+        with open(sidecarPath, 'rb') as f:
+            sidecarMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(sidecarMap)
+    sectionViews = {}
+
+    def closeMap():
+        for sectionView in sectionViews.values():
+            sectionView.release()
+        view.release()
+        sidecarMap.close()
+
+    header = parseSidecarHeader(view[:SIDECAR_HEADER_SIZE])
+    if header is None:
+        print(f"Warning: {sidecarPath} is not a markup sidecar of version {SIDECAR_VERSION}, ignoring it.")
+        closeMap()
+        return None
+    cityCount, itemCount = header["cityCount"], header["itemCount"]
+    cellCount = cityCount * itemCount
+    expectedLengths = {"rawMarkups": cellCount * 2, "offsets": cellCount * 8, "present": cellCount}
+    for sectionName, (sectionOffset, sectionLength) in header["sections"].items():
+        if sectionOffset + sectionLength > len(view) or expectedLengths.get(sectionName, sectionLength) != sectionLength:
+            print(f"Warning: {sidecarPath} is truncated or inconsistent, ignoring it.")
+            closeMap()
+            return None
+        sectionViews[sectionName] = view[sectionOffset:sectionOffset + sectionLength]
+
+    try:
+        cityNames = unpackNameTable(sectionViews["cityNames"], cityCount)
+        itemNames = unpackNameTable(sectionViews["itemNames"], itemCount)
+    except (UnicodeDecodeError, IndexError, TypeError) as e:
+        print(f"Warning: Could not read the name tables of {sidecarPath}: {e}")
+        closeMap()
+        return None
+    present = bytearray(sectionViews["present"]) # tiny, and bytearray's find/count drive the row iteration
+    if copyArrays or sys.byteorder != 'little':
+        matrix = MarkupMatrix.fromArrays(cityNames, itemNames, loadLittleEndianArray('h', sectionViews["rawMarkups"]),
+                                         loadLittleEndianArray('q', sectionViews["offsets"]), present)
+        closeMap()
+    else:
+        matrix = MarkupMatrix.fromArrays(cityNames, itemNames, sectionViews["rawMarkups"].cast('h'), sectionViews["offsets"].cast('q'), present)
+        matrix.sidecarMap = sidecarMap # keeps the map alive as long as the matrix uses it
+    return matrix, header
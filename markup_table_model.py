@@ -0,0 +1,102 @@
+from array import array
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from markup_matrix import MARKUP_SCALE, MarkupMatrix, markupToRaw
+
+class MarkupTableModel(QAbstractTableModel):
+    """
+    City / item / markup table over a MarkupMatrix, for a QTableView. Nothing is created per row: row r shows cell
+    rowCells[r] of the matrix and the view asks for the text of the rows it actually paints. Edits go to
+    editedMarkups, a copy of the matrix's raw markups, so the matrix keeps the values that are in the save and
+    changedCells() is a comparison of two arrays. rowCells is the filtered view of allCells (see setVisibleCells).
+    """
+    COLUMN_HEADERS = ["City", "Item Name", "Markup (%)"]
+    CITY_COLUMN = 0
+    ITEM_COLUMN = 1
+    MARKUP_COLUMN = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.matrix = MarkupMatrix([], [])
+        self.editedMarkups = array('h')
+        self.allCells = array('q')
+        self.rowCells = self.allCells
+
+    def setMatrix(self, matrix):
+        """Shows a new matrix (all of its markups, unedited) in one model reset."""
+        self.beginResetModel()
+        self.matrix = matrix
+        self.editedMarkups = array('h', matrix.rawMarkups)
+        self.allCells = matrix.presentCells()
+        self.rowCells = self.allCells
+        self.endResetModel()
+
+    def setVisibleCells(self, cells):
+        """Shows only the given cells (array('q') of cell indexes, in display order), or every markup for None."""
+        self.beginResetModel()
+        self.rowCells = self.allCells if cells is None else cells
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rowCells)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMN_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMN_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        baseFlags = super().flags(index)
+        if index.column() == self.MARKUP_COLUMN:
+            return baseFlags | Qt.ItemIsEditable
+        return baseFlags
+
+    def cellAt(self, row):
+        return self.rowCells[row]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        cellIdx = self.rowCells[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            if column == self.MARKUP_COLUMN:
+                return str(self.editedMarkups[cellIdx] / MARKUP_SCALE) # a string for EditRole too, so the editor is a line edit
+            itemCount = len(self.matrix.itemNames)
+            if column == self.CITY_COLUMN:
+                return self.matrix.cityNames[cellIdx // itemCount]
+            return self.matrix.itemNames[cellIdx % itemCount]
+        if role == Qt.UserRole:
+            return divmod(cellIdx, len(self.matrix.itemNames)) # (cityIdx, itemIdx)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """Takes a new markup in percent for the markup column. Rejects (keeps the old value) what isn't a number that fits the save."""
+        if role != Qt.EditRole or not index.isValid() or index.column() != self.MARKUP_COLUMN:
+            return False
+        try:
+            rawMarkup = markupToRaw(float(value))
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Ignoring markup '{value}': {e}")
+            return False
+        self.editedMarkups[self.rowCells[index.row()]] = rawMarkup
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def setEditedMarkups(self, cells, rawMarkups):
+        """Bulk edit: cells[i] gets rawMarkups[i] (raw save values), then a single dataChanged for the markup column."""
+        editedMarkups = self.editedMarkups
+        for cellIdx, rawMarkup in zip(cells, rawMarkups):
+            editedMarkups[cellIdx] = rawMarkup
+        if self.rowCells:
+            self.dataChanged.emit(self.index(0, self.MARKUP_COLUMN), self.index(len(self.rowCells) - 1, self.MARKUP_COLUMN),
+                                  [Qt.DisplayRole, Qt.EditRole])
+
+    def changedCells(self):
+        """Cell indexes whose edited markup differs from the matrix (the save), in row order."""
+        rawMarkups, editedMarkups = self.matrix.rawMarkups, self.editedMarkups
+        return [cellIdx for cellIdx in self.allCells if editedMarkups[cellIdx] != rawMarkups[cellIdx]]
@@ -0,0 +1,91 @@
+import hashlib
+import mmap
+import os
+import struct
+
+MARKUP_STRUCT = struct.Struct('<h') # kenshi stores markups as little-endian signed shorts, value * 100
+
+class SaveFileView:
+    """
+    Memory-mapped view of a save file shared by the extractor and the editor write path.
+    The file is never copied into Python memory: regexes scan the map directly and markups are
+    unpacked/packed in place, so RSS stays flat no matter how big the save is.
+
+    with SaveFileView(path) as save:
+        for match in someRegex.finditer(save.buffer): ...
+        value = save.readMarkupRaw(offset)
+    """
+    def __init__(self, filePath, writable=False):
+        self.filePath = filePath
+        self.writable = writable
+        self._file = open(filePath, "r+b" if writable else "rb")
+        try:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        except ValueError: # empty files can't be mapped
+            self._map = None
+        self.buffer = self._map if self._map is not None else b""
+        self.view = memoryview(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self._map is not None:
+            if self.writable:
+                self._map.flush()
+            self._map.close()
+            self._map = None
+        self.buffer = b""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def readMarkupRaw(self, offset):
+        """Raw signed short at offset, raises struct.error if it would read past EOF."""
+        return MARKUP_STRUCT.unpack_from(self.view, offset)[0]
+
+    def writeMarkupRaw(self, offset, rawValue):
+        if not self.writable:
+            raise IOError(f"{self.filePath} was opened read-only.")
+        MARKUP_STRUCT.pack_into(self.view, offset, rawValue)
+
+    def writeChanges(self, changes):
+        """
+        Writes a list of {"offset": int, "bytes": bytes} changes straight into the map and flushes once.
+        All offsets are checked first so a bad change doesn't leave the file half written.
+        """
+        if not self.writable:
+            raise IOError(f"{self.filePath} was opened read-only.")
+        fileLength = len(self.buffer)
+        for change in changes:
+            if change["offset"] < 0 or change["offset"] + len(change["bytes"]) > fileLength:
+                raise ValueError(f"Change at offset {change['offset']} would write past the end of {self.filePath} ({fileLength} bytes).")
+        for change in changes:
+            start = change["offset"]
+            self.view[start:start + len(change["bytes"])] = change["bytes"]
+        if self._map is not None:
+            self._map.flush()
+        return len(changes)
+
+def computeSaveFingerprint(filePath, blockSize=1024 * 1024):
+    """
+    Identifies a save's exact contents: size, mtime and a blake2b digest of the bytes (hashed straight from the map).
+    Returned as a plain dict so it can be stored in JSON next to whatever was derived from the save.
+    """
+    saveStat = os.stat(filePath)
+    digest = hashlib.blake2b(digest_size=16)
+    with SaveFileView(filePath) as saveView:
+        for blockStart in range(0, len(saveView), blockSize):
+            digest.update(saveView.view[blockStart:blockStart + blockSize])
+    return {"size": saveStat.st_size, "mtime": saveStat.st_mtime, "hash": digest.hexdigest()}
@@ -0,0 +1,173 @@
+import json
+import os
+
+from steam_library import KENSHI_STEAM_APP_ID, getSteamLibraryFolders
+
+LOCAL_SAVE_FOLDER = "save"
+SAVE_INDEX_FILE = "save_index.json"
+SAVE_INDEX_VERSION = 1
+PROTON_KENSHI_APPDATA = os.path.join("pfx", "drive_c", "users", "steamuser", "AppData", "Local", "kenshi")
+
+def getAppDataSaveSearchPaths():
+    """%LOCALAPPDATA%\\kenshi (saves live in its save\\ subfolder), or an empty list when LOCALAPPDATA isn't set."""
+    localAppData = os.getenv('LOCALAPPDATA')
+    if not localAppData:
+        return []
+    return [os.path.join(localAppData, 'kenshi')]
+
+def getProtonSaveSearchPaths(libraryFolders=None):
+    """Kenshi's AppData folder inside the Proton prefix of every Steam library that has one (Linux/Steam Deck)."""
+    if libraryFolders is None:
+        libraryFolders = getSteamLibraryFolders()
+    searchPaths = []
+    for libraryFolder in libraryFolders:
+        kenshiAppDataPath = os.path.join(libraryFolder, "steamapps", "compatdata", KENSHI_STEAM_APP_ID, PROTON_KENSHI_APPDATA)
+        if os.path.isdir(kenshiAppDataPath):
+            searchPaths.append(kenshiAppDataPath)
+    return searchPaths
+
+def getSaveSearchRoots():
+    """Every folder the game may write saves to on this machine: Windows AppData and Proton prefixes. Existing ones only."""
+    return [path for path in getAppDataSaveSearchPaths() + getProtonSaveSearchPaths() if os.path.isdir(path)]
+
+class SaveIndex:
+    """
+    Remembers, per directory under the save roots, its mtime and which subdirectories and .save files it held.
+    A directory's mtime changes whenever an entry is added, removed or renamed in it, so an unchanged directory
+    is not listed again: only its .save files are stat'ed for their current mtime and size. With hundreds of
+    saves (each a folder full of zone and platoon files) a rescan then costs one stat per folder and per save.
+    """
+    def __init__(self, indexPath=SAVE_INDEX_FILE):
+        self.indexPath = indexPath
+        self.directories = self.load()
+        self.dirty = False
+
+    def load(self):
+        if not self.indexPath:
+            return {}
+        try:
+            with open(self.indexPath, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if index.get("version") != SAVE_INDEX_VERSION:
+            return {}
+        return index.get("directories", {})
+
+    def save(self):
+        """Writes the index if a scan changed it."""
+        if not self.dirty or not self.indexPath:
+            return
+        try:
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                json.dump({"version": SAVE_INDEX_VERSION, "directories": self.directories}, f, ensure_ascii=False)
+            os.replace(tempPath, self.indexPath)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not write save index {self.indexPath}: {e}")
+
+    def scanSaves(self, rootPath, seenDirs=None, recursive=True):
+        """
+        All .save files under rootPath as {"path", "name", "mtime", "size"} records, in no particular order.
+        recursive=False only lists rootPath itself, not its subfolders.
+        """
+        saveRecords = []
+        pendingDirs = [rootPath]
+        while pendingDirs:
+            currentDir = pendingDirs.pop()
+            try:
+                dirMtime = os.stat(currentDir).st_mtime_ns
+            except OSError:
+                continue
+            if seenDirs is not None:
+                seenDirs.add(currentDir)
+            cachedDir = self.directories.get(currentDir)
+            if cachedDir is not None and cachedDir["mtime"] == dirMtime:
+                subdirNames = cachedDir["subdirs"]
+                for saveName in cachedDir["saves"]:
+                    savePath = os.path.join(currentDir, saveName)
+                    try:
+                        saveStat = os.stat(savePath)
+                    except OSError: # replaced mid-scan, the directory mtime will have moved by the next scan
+                        continue
+                    saveRecords.append(makeSaveRecord(savePath, rootPath, saveStat))
+            else:
+                subdirNames = []
+                saveNames = []
+                try:
+                    with os.scandir(currentDir) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirNames.append(entry.name)
+                                elif entry.name.endswith(".save") and entry.is_file():
+                                    saveRecords.append(makeSaveRecord(entry.path, rootPath, entry.stat()))
+                                    saveNames.append(entry.name)
+                            except OSError: # file vanished or is being replaced mid-scan
+                                continue
+                except OSError:
+                    continue
+                self.directories[currentDir] = {"mtime": dirMtime, "subdirs": subdirNames, "saves": saveNames}
+                self.dirty = True
+            if recursive:
+                pendingDirs.extend(os.path.join(currentDir, subdirName) for subdirName in subdirNames)
+        return saveRecords
+
+    def prune(self, seenDirs):
+        """Forgets directories that no scan reached anymore (deleted saves)."""
+        staleDirs = [dirPath for dirPath in self.directories if dirPath not in seenDirs]
+        for dirPath in staleDirs:
+            del self.directories[dirPath]
+        if staleDirs:
+            self.dirty = True
+
+def makeSaveRecord(savePath, rootPath, saveStat):
+    """A save as the GUI's save picker shows it: the save folder's name (or the file name for loose saves), mtime and size."""
+    saveDir = os.path.dirname(savePath)
+    if os.path.normpath(saveDir) == os.path.normpath(rootPath):
+        saveName = os.path.basename(savePath)
+    else:
+        saveName = os.path.basename(saveDir)
+    return {"path": savePath, "name": saveName, "mtime": saveStat.st_mtime, "size": saveStat.st_size}
+
+def listSaves(saveFolderPath=LOCAL_SAVE_FOLDER, searchRoots=None, saveIndex=None):
+    """
+    Every .save directly in the local saveFolderPath (not its subfolders, so copies kept in there don't count) and
+    anywhere under the game's save folders (searchRoots, default getSaveSearchRoots()), newest first. Each record gets a "source" of "local" or "game". The index is updated and written as a side effect.
+    """
+    if searchRoots is None:
+        searchRoots = getSaveSearchRoots()
+    ownsIndex = saveIndex is None
+    if ownsIndex:
+        saveIndex = SaveIndex()
+
+    saveRecords = []
+    seenDirs = set()
+    seenPaths = set()
+    for rootPath, source in [(saveFolderPath, "local")] + [(searchRoot, "game") for searchRoot in searchRoots]:
+        if not rootPath or not os.path.isdir(rootPath):
+            continue
+        for saveRecord in saveIndex.scanSaves(rootPath, seenDirs, recursive=source == "game"):
+            realPath = os.path.realpath(saveRecord["path"])
+            if realPath in seenPaths: # overlapping roots
+                continue
+            seenPaths.add(realPath)
+            saveRecord["source"] = source
+            saveRecords.append(saveRecord)
+    saveIndex.prune(seenDirs)
+    saveIndex.save()
+
+    saveRecords.sort(key=lambda saveRecord: saveRecord["mtime"], reverse=True)
+    return saveRecords
+
+def findLatestSave(saveFolderPath=LOCAL_SAVE_FOLDER, searchRoots=None, saveIndex=None):
+    """
+    The save to process: the newest .save in the local saveFolderPath if it has any, otherwise the newest one
+    in the game's save folders. Returns its record, or None when there are no saves at all.
+    """
+    saveRecords = listSaves(saveFolderPath, searchRoots, saveIndex)
+    localSaves = [saveRecord for saveRecord in saveRecords if saveRecord["source"] == "local"]
+    if localSaves:
+        return localSaves[0]
+    return saveRecords[0] if saveRecords else None
@@ -1,19 +1,83 @@
 import sys
 import os
-import json
 import struct
-import subprocess
 import random
-from PySide6.QtWidgets import (QApplication, QMainWindow, QTableWidget, 
-                               QTableWidgetItem, QVBoxLayout, QWidget,
+import re
+import threading
+import time
+from array import array
+from PySide6.QtWidgets import (QApplication, QMainWindow, QTableView,
+                               QHeaderView, QVBoxLayout, QWidget,
                                QPushButton, QMenuBar, QMessageBox, QLineEdit, 
-                               QHBoxLayout, QComboBox, QLabel)
+                               QHBoxLayout, QComboBox, QLabel, QCheckBox,
+                               QProgressBar, QAbstractItemView)
 from PySide6.QtGui import QAction, QActionGroup
-from PySide6.QtCore import Qt
-# few bits AI generated, mostly error handling and subprocess handling
-EXTRACTED_MARKUPS_FILE = "extracted_game_markups.json"
-TRANSLATED_MARKUPS_FILE = "translated_game_markups.json"
-DEFAULT_SAVE_PATH_MARKER = "SAVE_FILE_PATH:"
+from PySide6.QtCore import Qt, QObject, QThread, QTimer, Signal
+from save_access import SaveFileView
+from save_watcher import SaveFolderWatcher
+from save_discovery import LOCAL_SAVE_FOLDER
+from markup_pipeline import makePipelineResult, runPipeline
+from markup_matrix import MarkupMatrix, MISSING_OFFSET
+from markup_table_model import MarkupTableModel
+from markup_filter import FILTER_MODES, MarkupFilterIndex
+from markup_randomizer import DISTRIBUTIONS, randomizeMarkups
+from markup_formula import FormulaError, evaluateFormula
+# few bits AI generated, mostly error handling
+WRITE_JSON_ARTIFACTS = False # also write extracted_game_markups.json / translated_game_markups.json on every reload
+FILTER_DEBOUNCE_MS = 150 # filter once typing pauses this long
+PARTIAL_TABLE_INTERVAL = 0.5 # seconds between table updates while towns are still being extracted
+PROGRESS_STAGE_LABELS = {"cities": "Towns", "dictionaries": "Dictionary files"}
+RANDOMIZER_CITY_CAPS = {} # {town: (lower %, upper %)} overriding the caps above the table, e.g. {"The Hub": (90.0, 160.0)}
+RANDOMIZER_CATEGORY_CAPS = {} # {category: (lower %, upper %)}, categories are markup_randomizer.ITEM_CATEGORIES, e.g. {"Food": (60.0, 100.0)}
+
+class WatcherBridge(QObject): # carries watcher callbacks from its thread to the GUI thread
+    dataRefreshed = Signal(str, object)
+
+class PipelineWorker(QThread):
+    """
+    Runs markup_pipeline.runPipeline off the GUI thread. progress carries (stage, done, total, etaSeconds, -1 while
+    unknown) for the towns and the dictionary files; partialMatrix the towns extracted so far (item IDs, untranslated),
+    at most every PARTIAL_TABLE_INTERVAL; pipelineFinished the result dict. cancel() stops the run at the next town
+    or dictionary file, the result then has "cancelled" set.
+    """
+    progress = Signal(str, int, int, float)
+    partialMatrix = Signal(object)
+    pipelineFinished = Signal(object)
+
+    def __init__(self, pipelineOptions, parent=None):
+        super().__init__(parent)
+        self.pipelineOptions = pipelineOptions
+        self.cancelEvent = threading.Event()
+        self.stageStarts = {}
+        self.partialMarkups = {}
+        self.lastPartialTime = 0.0
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def run(self):
+        try:
+            result = runPipeline(onProgress=self.reportProgress, cancelEvent=self.cancelEvent, **self.pipelineOptions)
+        except Exception as e:
+            result = makePipelineResult(error=f"An unexpected error occurred: {e}")
+        self.pipelineFinished.emit(result)
+
+    def reportProgress(self, stage, done, total, detail): # runs on the pipeline's threads, signals are queued to the GUI
+        now = time.perf_counter()
+        startTime, startDone = self.stageStarts.setdefault(stage, (now, done)) # rate from the stage's first report on
+        etaSeconds = (now - startTime) / (done - startDone) * (total - done) if done > startDone else -1.0
+        self.progress.emit(stage, done, total, etaSeconds)
+        if stage != "cities":
+            return
+        cityName, cityItems = detail
+        if cityItems:
+            self.partialMarkups[cityName] = cityItems
+        if now - self.lastPartialTime >= PARTIAL_TABLE_INTERVAL or done == total:
+            self.lastPartialTime = now
+            try:
+                self.partialMatrix.emit(MarkupMatrix.fromNestedDict(self.partialMarkups)) # a snapshot, the extractor keeps adding
+            except ValueError as e:
+                print(f"Warning: Skipping a preliminary table update: {e}")
 
 class MarkupEditor(QMainWindow):
     def __init__(self):
@@ -28,7 +92,9 @@ class MarkupEditor(QMainWindow):
         self.upperCapLineEdit = QLineEdit("140.5")
         self.upperCapLineEdit.setPlaceholderText("Upper Cap %")
         self.distTypeComboBox = QComboBox()
-        self.distTypeComboBox.addItems(["Uniform", "Normal", "Triangular", "Beta (Two-Peak)"])
+        self.distTypeComboBox.addItems(DISTRIBUTIONS)
+        self.seedLineEdit = QLineEdit()
+        self.seedLineEdit.setPlaceholderText("Seed (random)")
         self.randomizeButton = QPushButton("Randomize Markups")
         self.randomizeButton.clicked.connect(self.randomizeMarkups)
 
@@ -38,27 +104,64 @@ class MarkupEditor(QMainWindow):
         randomizationLayout.addWidget(self.upperCapLineEdit)
         randomizationLayout.addWidget(QLabel("Distribution:"))
         randomizationLayout.addWidget(self.distTypeComboBox)
+        randomizationLayout.addWidget(QLabel("Seed:"))
+        randomizationLayout.addWidget(self.seedLineEdit)
         randomizationLayout.addWidget(self.randomizeButton)
 
         # filterin
         self.cityFilterLineEdit = QLineEdit()
         self.cityFilterLineEdit.setPlaceholderText("Filter by City")
-        self.cityFilterLineEdit.textChanged.connect(self.filterTable)
+        self.cityFilterLineEdit.textChanged.connect(self.scheduleFilter)
 
         self.itemFilterLineEdit = QLineEdit()
         self.itemFilterLineEdit.setPlaceholderText("Filter by Item Name")
-        self.itemFilterLineEdit.textChanged.connect(self.filterTable)
+        self.itemFilterLineEdit.textChanged.connect(self.scheduleFilter)
+
+        self.filterModeComboBox = QComboBox()
+        self.filterModeComboBox.addItems(FILTER_MODES)
+        self.filterModeComboBox.currentIndexChanged.connect(self.filterTable)
+
+        self.filterTimer = QTimer(self) # debounce, restarted on every keystroke
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filterTimer.timeout.connect(self.filterTable)
 
         filterLayout = QHBoxLayout()
         filterLayout.addWidget(self.cityFilterLineEdit)
         filterLayout.addWidget(self.itemFilterLineEdit)
-
-        self.tableWidget = QTableWidget()
-        self.tableWidget.setColumnCount(3)
-        self.tableWidget.setHorizontalHeaderLabels(["City", "Item Name", "Markup (%)"])
-        self.tableWidget.setColumnWidth(0, 150) 
-        self.tableWidget.setColumnWidth(1, 350) 
-        self.tableWidget.setColumnWidth(2, 100)
+        filterLayout.addWidget(self.filterModeComboBox)
+
+        # formula bulk edit, on the selected rows or else everything the filter shows
+        self.formulaSetLineEdit = QLineEdit()
+        self.formulaSetLineEdit.setPlaceholderText("Set, e.g. value * 0.9 or clamp(value, 50, 150) or itemMedian")
+        self.formulaSetLineEdit.textChanged.connect(self.scheduleFormulaPreview)
+        self.formulaWhereLineEdit = QLineEdit()
+        self.formulaWhereLineEdit.setPlaceholderText("Where (optional), e.g. city == \"The Hub\" and value > 150")
+        self.formulaWhereLineEdit.textChanged.connect(self.scheduleFormulaPreview)
+        self.formulaPreviewLabel = QLabel("")
+        self.applyFormulaButton = QPushButton("Apply Formula")
+        self.applyFormulaButton.clicked.connect(self.applyFormula)
+
+        self.formulaTimer = QTimer(self)
+        self.formulaTimer.setSingleShot(True)
+        self.formulaTimer.setInterval(FILTER_DEBOUNCE_MS)
+        self.formulaTimer.timeout.connect(self.previewFormula)
+
+        formulaLayout = QHBoxLayout()
+        formulaLayout.addWidget(QLabel("Set:"))
+        formulaLayout.addWidget(self.formulaSetLineEdit)
+        formulaLayout.addWidget(QLabel("Where:"))
+        formulaLayout.addWidget(self.formulaWhereLineEdit)
+        formulaLayout.addWidget(self.formulaPreviewLabel)
+        formulaLayout.addWidget(self.applyFormulaButton)
+
+        self.tableModel = MarkupTableModel(self) # rows are only materialised when the view paints them
+        self.tableView = QTableView()
+        self.tableView.setModel(self.tableModel)
+        self.tableView.verticalHeader().setSectionResizeMode(QHeaderView.Fixed) # uniform rows, no per-row size hints
+        self.tableView.setColumnWidth(0, 150) 
+        self.tableView.setColumnWidth(1, 350) 
+        self.tableView.setColumnWidth(2, 100)
 
         self.saveButton = QPushButton("Apply Changes")
         self.saveButton.clicked.connect(self.applyChanges)
@@ -70,15 +173,33 @@ class MarkupEditor(QMainWindow):
         self.saveModeComboBox.addItems(["Save to Local Copy (Default)", "Direct Write to Original Save"])
         self.saveModeComboBox.currentIndexChanged.connect(self.handleSaveModeChange)
 
+        self.watchSavesCheckBox = QCheckBox("Auto-Reload on New Save")
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 0)
+        self.progressLabel = QLabel("")
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.clicked.connect(self.cancelPipeline)
+        self.cancelButton.setEnabled(False)
+
+        progressLayout = QHBoxLayout()
+        progressLayout.addWidget(self.progressBar)
+        progressLayout.addWidget(self.progressLabel)
+        progressLayout.addWidget(self.cancelButton)
+        self.watchSavesCheckBox.toggled.connect(self.toggleSaveWatcher)
+
         controlsLayout = QHBoxLayout()
         controlsLayout.addWidget(self.reloadButton)
         controlsLayout.addWidget(self.saveButton)
         controlsLayout.addWidget(self.saveModeComboBox)
+        controlsLayout.addWidget(self.watchSavesCheckBox)
 
         layout = QVBoxLayout()
         layout.addLayout(randomizationLayout) 
         layout.addLayout(filterLayout)
-        layout.addWidget(self.tableWidget)
+        layout.addLayout(formulaLayout)
+        layout.addWidget(self.tableView)
+        layout.addLayout(progressLayout)
         layout.addLayout(controlsLayout)
 
         container = QWidget()
@@ -87,13 +208,20 @@ class MarkupEditor(QMainWindow):
 
         self.menuBar().setVisible(False) # Hide the menu bar
 
-        self.data = {}
+        self.markupMatrix = MarkupMatrix([], []) # the values in the save, edits live in the table model
+        self.filterIndex = MarkupFilterIndex(self.markupMatrix, self.tableModel.allCells)
+        self.pipelineResult = None
+        self.dictionaryFiles = None # kept between reloads, locating them can mean a Steam library search
         self.originalSaveFilePath = None
         self.saveMode = "local_copy" # "direct_write" or "local_copy"
+        self.saveWatcher = None
+        self.watcherBridge = WatcherBridge()
+        self.watcherBridge.dataRefreshed.connect(self.handleWatcherRefresh)
+        self.pipelineWorker = None
+        self.stageProgress = {} # stage -> (done, total, etaSeconds) of the running pipeline
+        self.editTriggers = self.tableView.editTriggers()
 
-        self.runInitialScripts()
-        if self.saveButton.isEnabled(): # only load data when stuff works
-            self.loadData()
+        self.runInitialScripts() # returns right away, the window shows while the save is read
 
     def handleSaveModeChange(self, index):
         if index == 0:
@@ -104,180 +232,250 @@ class MarkupEditor(QMainWindow):
             return
         self.setSaveMode(newMode)
 
+    def toggleSaveWatcher(self, checked):
+        if checked:
+            scriptDir = os.path.dirname(os.path.realpath(__file__))
+            self.saveWatcher = SaveFolderWatcher(onDataRefreshed=lambda savePath, result: self.watcherBridge.dataRefreshed.emit(savePath, result),
+                                                 saveFolderPath=os.path.join(scriptDir, LOCAL_SAVE_FOLDER), outputDir=scriptDir)
+            self.saveWatcher.start()
+        elif self.saveWatcher is not None:
+            self.saveWatcher.stop(wait=False)
+            self.saveWatcher = None
+
+    def handleWatcherRefresh(self, savePath, pipelineResult):
+        print(f"Save watcher refreshed data for: {savePath}")
+        unsavedChangeCount = len(self.tableModel.changedCells())
+        if unsavedChangeCount:
+            reply = QMessageBox.question(self, "New Save Detected",
+                                         f"Kenshi wrote a new save:\n{savePath}\n\nReload the markups from it and discard your "
+                                         f"{unsavedChangeCount} unsaved change(s)?\nChoose No to keep editing the current save.",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.No:
+                print("Kept the unsaved changes, ignoring the watcher's refresh.")
+                return
+        if self.pipelineWorker is not None: # the watcher's result is newer, drop the running load
+            self.pipelineWorker.cancel()
+            self.pipelineWorker = None
+            self.setLoading(False)
+        self.originalSaveFilePath = savePath
+        self.pipelineResult = pipelineResult
+        self.saveButton.setEnabled(True)
+        self.randomizeButton.setEnabled(True)
+        self.applyFormulaButton.setEnabled(True)
+        self.loadData()
+
+    def closeEvent(self, event):
+        if self.saveWatcher is not None:
+            self.saveWatcher.stop(wait=False)
+        for worker in self.findChildren(PipelineWorker): # includes runs dropped for a watcher refresh that are still winding down
+            worker.cancel()
+            worker.wait()
+        super().closeEvent(event)
+
     def setSaveMode(self, saveMode):
         self.saveMode = saveMode
         QMessageBox.information(self, "Save Mode Changed", f"Save mode set to: {saveMode.replace('_', ' ').title()}")
 
+    def scheduleFilter(self):
+        self.filterTimer.start()
+
     def filterTable(self):
-        cityFilterText = self.cityFilterLineEdit.text().lower()
-        itemFilterText = self.itemFilterLineEdit.text().lower()
-
-        for rowIdx in range(self.tableWidget.rowCount()):
-            cityItem = self.tableWidget.item(rowIdx, 0)
-            itemNameItem = self.tableWidget.item(rowIdx, 1)
-
-            if cityItem and itemNameItem:
-                cityMatch = cityFilterText in cityItem.text().lower()
-                itemMatch = itemFilterText in itemNameItem.text().lower()
-                
-                self.tableWidget.setRowHidden(rowIdx, not (cityMatch and itemMatch))
+        self.filterTimer.stop()
+        try:
+            visibleCells = self.filterIndex.filterCells(self.cityFilterLineEdit.text(), self.itemFilterLineEdit.text(),
+                                                        self.filterModeComboBox.currentText())
+        except re.error as e:
+            self.filterModeComboBox.setToolTip(f"Invalid regex: {e}")
+            return # keep showing the last valid result while the pattern is being typed
+        self.filterModeComboBox.setToolTip("")
+        self.tableModel.setVisibleCells(visibleCells) # one model reset for the whole result
+        if self.formulaSetLineEdit.text().strip():
+            self.scheduleFormulaPreview() # the formula runs on what the filter shows
     
+    def formulaCells(self):
+        """Cells a formula runs on: the selected rows, or every row the filter shows."""
+        selectedRows = sorted({index.row() for index in self.tableView.selectionModel().selectedIndexes()})
+        if selectedRows:
+            return array('q', (self.tableModel.cellAt(row) for row in selectedRows))
+        return self.tableModel.rowCells
+
+    def runFormula(self):
+        """evaluateFormula on the formula cells against the edited markups, None (with the reason in the preview label) when it can't run."""
+        setFormula = self.formulaSetLineEdit.text()
+        if not setFormula.strip():
+            self.formulaPreviewLabel.setText("")
+            return None
+        try:
+            formulaResult = evaluateFormula(self.markupMatrix, setFormula, self.formulaWhereLineEdit.text(), self.formulaCells(),
+                                            self.tableModel.editedMarkups)
+        except FormulaError as e:
+            self.formulaPreviewLabel.setText("Invalid formula")
+            self.formulaPreviewLabel.setToolTip(str(e))
+            return None
+        self.formulaPreviewLabel.setToolTip("")
+        self.formulaPreviewLabel.setText(f"{len(formulaResult['matchedCells'])} match, {len(formulaResult['changedCells'])} change")
+        return formulaResult
+
+    def scheduleFormulaPreview(self):
+        self.formulaTimer.start()
+
+    def previewFormula(self):
+        self.formulaTimer.stop()
+        self.runFormula()
+
+    def applyFormula(self):
+        self.formulaTimer.stop()
+        if not self.formulaSetLineEdit.text().strip():
+            QMessageBox.warning(self, "Invalid Input", "Enter a formula for the new markups, e.g. value * 0.9.")
+            return
+        formulaResult = self.runFormula()
+        if formulaResult is None:
+            QMessageBox.warning(self, "Invalid Formula", self.formulaPreviewLabel.toolTip())
+            return
+        self.tableModel.setEditedMarkups(formulaResult["changedCells"], formulaResult["newRawMarkups"])
+        self.runFormula() # the preview now counts against the new values
+        QMessageBox.information(self, "Formula Applied", f"Changed {len(formulaResult['changedCells'])} markups "
+                                f"({len(formulaResult['matchedCells'])} matched). Apply Changes writes them to the save.")
+
     def randomizeMarkups(self):
+        """Draws every markup at once (markup_randomizer) and hands them to the model in one update. The seed used is shown so a run can be repeated."""
         try:
             lowerCap = float(self.lowerCapLineEdit.text())
             upperCap = float(self.upperCapLineEdit.text())
         except ValueError:
             QMessageBox.warning(self, "Invalid Input", "Lower and Upper caps must be valid numbers.")
             return
-
-        if lowerCap >= upperCap:
-            QMessageBox.warning(self, "Invalid Input", "Lower cap must be less than Upper cap.")
+        seedText = self.seedLineEdit.text().strip()
+        try:
+            seed = int(seedText) if seedText else random.randrange(2**32)
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "The seed must be a whole number (or empty for a random one).")
             return
 
-        distributionType = self.distTypeComboBox.currentText()
-        
-        changedCount = 0
-        for rowIdx in range(self.tableWidget.rowCount()):
-            markupItem = self.tableWidget.item(rowIdx, 2)
-            if markupItem:
-                newMarkupValue = 0.0
-                if distributionType == "Uniform":
-                    newMarkupValue = random.uniform(lowerCap, upperCap)
-                elif distributionType == "Normal":
-                    mu = (lowerCap + upperCap) / 2
-                    sigma = (upperCap - lowerCap) / 4 
-                    if sigma <= 0:
-                        newMarkupValue = mu
-                    else:
-                        value = random.normalvariate(mu, sigma)
-                        newMarkupValue = max(lowerCap, min(upperCap, value))
-                elif distributionType == "Triangular":
-                    mode = (lowerCap + upperCap) / 2
-                    newMarkupValue = random.triangular(lowerCap, upperCap, mode)
-                elif distributionType == "Beta (Two-Peak)":
-                    alpha = 0.5
-                    beta = 0.5
-                    x = random.betavariate(alpha, beta)
-                    newMarkupValue = lowerCap + x * (upperCap - lowerCap)
-
-                markupItem.setText(f"{newMarkupValue:.2f}")
-                changedCount +=1
-        
-        if changedCount > 0:
-            QMessageBox.information(self, "Randomization Complete", f"Randomized markups for {changedCount} items.")
-        else:
+        cells = self.tableModel.allCells
+        if not cells:
             QMessageBox.information(self, "Randomization", "No items found to randomize.")
-        
-        self.filterTable()
+            return
+        try:
+            newRawMarkups = randomizeMarkups(self.markupMatrix, cells, self.distTypeComboBox.currentText(), lowerCap, upperCap,
+                                             RANDOMIZER_CITY_CAPS, RANDOMIZER_CATEGORY_CAPS, seed=seed)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Input", str(e))
+            return
+        self.tableModel.setEditedMarkups(cells, newRawMarkups)
+        print(f"Randomized {len(cells)} markups with seed {seed}.")
+        QMessageBox.information(self, "Randomization Complete", f"Randomized markups for {len(cells)} items.\nSeed: {seed}")
 
     def runInitialScripts(self):
-        self.originalSaveFilePath = None 
-        self.saveButton.setEnabled(True)
-        try:
-            scriptDir = os.path.dirname(os.path.realpath(__file__))
-            extractScriptPath = os.path.join(scriptDir, "extract_game_data.py")
-            translateScriptPath = os.path.join(scriptDir, "translate_item_ids.py")
-
-            print("Running extraction script...")
-            processExtract = subprocess.run([sys.executable, extractScriptPath], capture_output=True, text=True, check=False, cwd=scriptDir)
-            print("Extraction script stdout:")
-            print(processExtract.stdout)
-            if processExtract.stderr:
-                print("Extraction script stderr:")
-                print(processExtract.stderr)
-            if processExtract.returncode != 0:
-                raise subprocess.CalledProcessError(processExtract.returncode, extractScriptPath, processExtract.stdout, processExtract.stderr)
-
-            for line in processExtract.stdout.splitlines():
-                if line.startswith(DEFAULT_SAVE_PATH_MARKER):
-                    self.originalSaveFilePath = line.split(DEFAULT_SAVE_PATH_MARKER, 1)[1].strip()
-                    print(f"Detected original save file path: {self.originalSaveFilePath}")
-                    break
-            
-            if not self.originalSaveFilePath:
-                QMessageBox.warning(self, "Error", "Could not determine original save file path from extraction script output. Please ensure the script prints 'SAVE_FILE_PATH:your_path_to.save'. Saving will be disabled.")
-                self.saveButton.setEnabled(False)
-                return 
-
-            print("\nRunning translation script...")
-            processTranslate = subprocess.run([sys.executable, translateScriptPath], capture_output=True, text=True, check=False, cwd=scriptDir)
-            print("Translation script stdout:")
-            print(processTranslate.stdout)
-            if processTranslate.stderr:
-                print("Translation script stderr:")
-                print(processTranslate.stderr)
-            if processTranslate.returncode != 0:
-                raise subprocess.CalledProcessError(processTranslate.returncode, translateScriptPath, processTranslate.stdout, processTranslate.stderr)
-            
-            QMessageBox.information(self, "Scripts Complete", "Data extraction and translation finished successfully.")
-
-        except subprocess.CalledProcessError as e:
-            errorMessage = f"Error running script: {os.path.basename(e.cmd[-1])}\nReturn Code: {e.returncode}\nOutput:\n{e.stdout}\nError:\n{e.stderr}"
-            QMessageBox.critical(self, "Script Execution Error", errorMessage)
-            print(errorMessage)
-            self.saveButton.setEnabled(False) 
-        except FileNotFoundError as e:
-            QMessageBox.critical(self, "Script Not Found", f"A Python script was not found: {e.filename}. Ensure extract_game_data.py and translate_item_ids.py are in the same directory as this editor.")
-            self.saveButton.setEnabled(False)
-        except subprocess.TimeoutExpired as e:
-            QMessageBox.critical(self, "Script Timeout", f"The script {os.path.basename(e.cmd[-1])} timed out.")
-            self.saveButton.setEnabled(False)
-        except Exception as e:
-            QMessageBox.critical(self, "Unexpected Error During Script Execution", f"An unexpected error occurred: {e}")
-            self.saveButton.setEnabled(False)
+        """
+        Starts extracting and translating the markups (markup_pipeline) on a PipelineWorker. The table fills in as towns
+        are extracted and gets the translated markups from handlePipelineFinished.
+        """
+        if self.pipelineWorker is not None:
+            return
+        self.originalSaveFilePath = None
+        self.pipelineResult = None
+        scriptDir = os.path.dirname(os.path.realpath(__file__))
+        worker = PipelineWorker({"saveFolderPath": os.path.join(scriptDir, LOCAL_SAVE_FOLDER), "outputDir": scriptDir,
+                                 "writeArtifacts": WRITE_JSON_ARTIFACTS, "dictionaryFiles": self.dictionaryFiles}, self)
+        worker.progress.connect(self.handlePipelineProgress)
+        worker.partialMatrix.connect(self.handlePartialMatrix)
+        worker.pipelineFinished.connect(self.handlePipelineFinished)
+        worker.finished.connect(worker.deleteLater)
+        self.pipelineWorker = worker
+        self.stageProgress = {}
+        self.setLoading(True)
+        self.progressLabel.setText("Reading the save...")
+        worker.start()
+
+    def setLoading(self, loading):
+        """Locks editing, saving and randomizing while a pipeline run is filling the table."""
+        self.cancelButton.setEnabled(loading)
+        self.reloadButton.setEnabled(not loading)
+        self.randomizeButton.setEnabled(not loading)
+        self.applyFormulaButton.setEnabled(not loading)
+        self.saveButton.setEnabled(not loading)
+        self.tableView.setEditTriggers(QAbstractItemView.NoEditTriggers if loading else self.editTriggers)
+        self.progressBar.setVisible(loading)
+        if loading:
+            self.progressBar.setRange(0, 0) # busy until the first report
+        else:
+            self.progressLabel.setText("")
+
+    def cancelPipeline(self):
+        if self.pipelineWorker is not None:
+            self.pipelineWorker.cancel()
+            self.cancelButton.setEnabled(False)
+            self.progressLabel.setText("Cancelling...")
+
+    def handlePipelineProgress(self, stage, done, total, etaSeconds):
+        if self.sender() is not self.pipelineWorker:
+            return
+        self.stageProgress[stage] = (done, total, etaSeconds)
+        stageTexts = []
+        for progressStage, (stageDone, stageTotal, stageEta) in self.stageProgress.items():
+            stageText = f"{PROGRESS_STAGE_LABELS.get(progressStage, progressStage)}: {stageDone}/{stageTotal}"
+            if stageEta >= 0 and stageDone < stageTotal:
+                stageText += f" (~{stageEta:.0f}s left)"
+            stageTexts.append(stageText)
+        self.progressLabel.setText(", ".join(stageTexts))
+        self.progressBar.setRange(0, sum(stageTotal for _, stageTotal, _ in self.stageProgress.values()))
+        self.progressBar.setValue(sum(stageDone for stageDone, _, _ in self.stageProgress.values()))
+
+    def handlePartialMatrix(self, matrix):
+        if self.sender() is not self.pipelineWorker:
+            return
+        self.markupMatrix = matrix # item IDs until the translation is done, read-only while loading
+        self.populateTable()
+
+    def handlePipelineFinished(self, result):
+        if self.sender() is not self.pipelineWorker:
+            return # cancelled and replaced (watcher refresh)
+        self.pipelineWorker = None
+        self.setLoading(False)
+        self.pipelineResult = result
+        if result["dictionaryFiles"]:
+            self.dictionaryFiles = result["dictionaryFiles"]
+        if result["cancelled"]:
+            print("Extraction cancelled.")
+            self.progressLabel.setText("Cancelled. Reload to extract the save again.")
+        elif result["error"]:
+            QMessageBox.critical(self, "Extraction Error", f"{result['error']}\nSaving will be disabled.")
+        else:
+            self.originalSaveFilePath = result["savePath"]
+            print(f"Detected original save file path: {self.originalSaveFilePath}")
+            self.progressLabel.setText(f"Loaded {result['stats'].get('markups', 0)} markups from {os.path.basename(self.originalSaveFilePath)}.")
+            self.loadData()
+            return
+        self.saveButton.setEnabled(False)
+        self.randomizeButton.setEnabled(False)
+        self.applyFormulaButton.setEnabled(False)
+        self.markupMatrix = MarkupMatrix([], [])
+        self.populateTable()
 
     def loadData(self):
-        try:
-            scriptDir = os.path.dirname(os.path.realpath(__file__))
-            translatedFileFullPath = os.path.join(scriptDir, TRANSLATED_MARKUPS_FILE)
-            with open(translatedFileFullPath, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-        except FileNotFoundError:
-            QMessageBox.warning(self, "Data File Error", f"{TRANSLATED_MARKUPS_FILE} not found in script directory. Was translation successful?")
-            self.data = {}
-            self.tableWidget.setRowCount(0) # we clearin table
+        if self.pipelineResult is None or not (self.pipelineResult["matrix"] or self.pipelineResult["markups"]):
+            QMessageBox.warning(self, "No Data", "No markups were extracted from the save. Was extraction successful?")
+            self.markupMatrix = MarkupMatrix([], [])
+            self.populateTable() # we clearin table
             return
-        except json.JSONDecodeError:
-            QMessageBox.warning(self, "Data File Error", f"Could not decode JSON from {TRANSLATED_MARKUPS_FILE}. The file might be corrupted.")
-            self.data = {}
-            self.tableWidget.setRowCount(0) # again clearin table
+
+        try:
+            self.markupMatrix = self.pipelineResult["matrix"] or MarkupMatrix.fromNestedDict(self.pipelineResult["markups"])
+        except (ValueError, TypeError) as e:
+            QMessageBox.warning(self, "Data Error", f"Could not load the extracted markups: {e}")
+            self.markupMatrix = MarkupMatrix([], [])
+            self.populateTable() # again clearin table
             return
- 
         self.populateTable()
 
     def populateTable(self):
-        self.tableWidget.setRowCount(0)
-        rowIdx = 0
-        for city, items in self.data.items():
-            for itemName, dataList in items.items():
-                if not isinstance(dataList, list) or len(dataList) != 2:
-                    print(f"Skipping malformed data entry for City: '{city}', Item: '{itemName}'. Data: {dataList}")
-                    continue
-
-                markupValue, offset = dataList
-                self.tableWidget.insertRow(rowIdx)
-                
-                cityItemWidget = QTableWidgetItem(city)
-                cityItemWidget.setFlags(cityItemWidget.flags() & ~Qt.ItemIsEditable)
-                self.tableWidget.setItem(rowIdx, 0, cityItemWidget)
-
-                nameItemWidget = QTableWidgetItem(itemName)
-                nameItemWidget.setFlags(nameItemWidget.flags() & ~Qt.ItemIsEditable)
-                self.tableWidget.setItem(rowIdx, 1, nameItemWidget)
-
-                markupItemWidget = QTableWidgetItem(str(markupValue))
-                markupItemWidget.setData(Qt.UserRole, {"originalValue": markupValue, "offset": offset, "city": city, "itemName": itemName})
-                self.tableWidget.setItem(rowIdx, 2, markupItemWidget)
-                rowIdx += 1
+        self.tableModel.setMatrix(self.markupMatrix) # one model reset, the view pulls the rows it shows
+        self.filterIndex = MarkupFilterIndex(self.markupMatrix, self.tableModel.allCells)
         self.filterTable()
 
     def reloadAllData(self):
         self.runInitialScripts()
-        if self.saveButton.isEnabled():
-            self.loadData()
-        else:
-            self.tableWidget.setRowCount(0)
-            self.filterTable()
 
     def applyChanges(self):
         if not self.originalSaveFilePath:
@@ -313,40 +511,28 @@ class MarkupEditor(QMainWindow):
             QMessageBox.critical(self, "Internal Error", "Invalid save mode selected.")
             return
 
+        matrix = self.markupMatrix
+        editedMarkups = self.tableModel.editedMarkups
+        itemCount = len(matrix.itemNames)
         changesToApply = []
-        for rowIdxTable in range(self.tableWidget.rowCount()):
-            markupItem = self.tableWidget.item(rowIdxTable, 2)
-            itemData = markupItem.data(Qt.UserRole)
-            
-            try:
-                newMarkupStr = markupItem.text()
-                newMarkupFloat = float(newMarkupStr)
-            except ValueError:
-                QMessageBox.warning(self, "Invalid Input", f"Invalid markup value for '{itemData['itemName']}' in city '{itemData['city']}': '{newMarkupStr}'. It must be a number. This item will be skipped.")
+        for cellIdx in self.tableModel.changedCells(): # the model only takes values that fit the save
+            cityName = matrix.cityNames[cellIdx // itemCount]
+            itemName = matrix.itemNames[cellIdx % itemCount]
+            offset = matrix.offsets[cellIdx]
+            if offset == MISSING_OFFSET:
+                QMessageBox.warning(self, "Value Error", f"No save offset is known for '{itemName}' (City: {cityName}). This item will be skipped.")
                 continue
-
-            # compare floats with a small tolerance
-            if abs(newMarkupFloat - itemData["originalValue"]) > 1e-9:
-                rawValueToWrite = int(round(newMarkupFloat * 100))
-                try:
-                    # kenshi uses signed short (2 bytes), little-endian (i think)
-                    if not (-32768 <= rawValueToWrite <= 32767):
-                        raise ValueError(f"Markup value {newMarkupFloat}% ({rawValueToWrite}) is out of range for a 16-bit signed integer.")
-                    bytesToWrite = struct.pack('<h', rawValueToWrite)
-                    changesToApply.append({"offset": itemData["offset"], "bytes": bytesToWrite, "itemName": itemData["itemName"], "city": itemData["city"]})
-                except (struct.error, ValueError) as e:
-                    QMessageBox.warning(self, "Value Error", f"Could not prepare value for '{itemData['itemName']}' (City: {itemData['city']}, New Value: {newMarkupFloat}%): {e}. This item will be skipped.")
-                    continue
+            # kenshi uses signed short (2 bytes), little-endian (i think)
+            bytesToWrite = struct.pack('<h', editedMarkups[cellIdx])
+            changesToApply.append({"offset": offset, "bytes": bytesToWrite, "itemName": itemName, "city": cityName})
         
         if not changesToApply:
             QMessageBox.information(self, "No Changes", "No markups were modified or valid changes detected.")
             return
 
         try:
-            with open(targetFilePath, 'r+b') as saveFile:
-                for change in changesToApply:
-                    saveFile.seek(change["offset"])
-                    saveFile.write(change["bytes"])
+            with SaveFileView(targetFilePath, writable=True) as saveView:
+                saveView.writeChanges(changesToApply)
             QMessageBox.information(self, "Success", f"{len(changesToApply)} change(s) successfully applied to:\n{targetFilePath}")
         except FileNotFoundError:
              QMessageBox.critical(self, "File Error", f"Target file for saving not found: {targetFilePath}. This may occur if the original file was moved or deleted.")
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+from markup_history import MARKUP_HISTORY_FILE
+from markup_pipeline import runPipeline
+from save_discovery import LOCAL_SAVE_FOLDER, SAVE_INDEX_FILE, SaveIndex, getSaveSearchRoots, findLatestSave
+from translate_item_ids import DEFAULT_DATAFILES_DIR
+
+class SaveFolderWatcher:
+    """
+    Polls the save folders in a background thread and, once a new or rewritten save has stopped changing for
+    settleTime seconds (Kenshi writes saves in several steps), re-extracts it incrementally, translates it (runPipeline) and
+    calls onDataRefreshed(savePath, pipelineResult) from the watcher thread.
+    Polling is used instead of inotify/ReadDirectoryChangesW so it works the same everywhere without extra packages.
+    """
+    def __init__(self, onDataRefreshed=None, saveFolderPath=LOCAL_SAVE_FOLDER, outputDir=".", pollInterval=2.0, settleTime=3.0,
+                 markupLowerBound=1.0, markupUpperBound=175.0, datafilesDir=DEFAULT_DATAFILES_DIR, processExisting=False, historyPath=None):
+        self.onDataRefreshed = onDataRefreshed
+        self.saveFolderPath = os.path.join(outputDir, saveFolderPath) # like runPipeline, relative to outputDir
+        self.outputDir = outputDir
+        self.pollInterval = pollInterval
+        self.settleTime = settleTime
+        self.markupLowerBound = markupLowerBound
+        self.markupUpperBound = markupUpperBound
+        self.datafilesDir = datafilesDir
+        self.historyPath = historyPath # every refreshed save is recorded in this markup history when set
+        self.dictionaryFiles = None # located on the first refresh, the Steam search is slow
+        self.searchRoots = getSaveSearchRoots() # resolved once, reading the Steam library list on every poll is wasted work
+        self.saveIndex = SaveIndex(os.path.join(outputDir, SAVE_INDEX_FILE)) # shared across polls so unchanged save folders are never listed again
+        self.lastProcessed = None if processExisting else self.findNewestSave()
+        self.pendingSave = None
+        self.pendingSince = 0.0
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, name="SaveFolderWatcher", daemon=True)
+        self.thread.start()
+        print(f"Watching for save changes (polling every {self.pollInterval}s).")
+
+    def stop(self, wait=True):
+        """Stops polling; with wait=False a refresh that is already running finishes in the background."""
+        self.stopEvent.set()
+        if self.thread is not None:
+            if wait:
+                self.thread.join()
+            self.thread = None
+
+    def findNewestSave(self):
+        """Newest save record among those extract_game_data would pick from (see findLatestSave), or None."""
+        return findLatestSave(self.saveFolderPath, self.searchRoots, self.saveIndex)
+
+    def run(self):
+        while not self.stopEvent.wait(self.pollInterval):
+            newestSave = self.findNewestSave()
+            if newestSave is None or newestSave == self.lastProcessed:
+                continue
+            if newestSave != self.pendingSave: # new or still being written, wait until it settles
+                self.pendingSave = newestSave
+                self.pendingSince = time.monotonic()
+                continue
+            if time.monotonic() - self.pendingSince < self.settleTime:
+                continue
+            self.lastProcessed = newestSave
+            self.pendingSave = None
+            try:
+                self.refresh(newestSave["path"])
+            except Exception as e: # keep watching even if one refresh fails
+                print(f"Error refreshing markups for {newestSave['path']}: {e}")
+
+    def refresh(self, savePath):
+        print(f"\nSave changed: {savePath}. Refreshing markups in the background...")
+        result = runPipeline(savePath, outputDir=self.outputDir, writeArtifacts=True,
+                             markupLowerBound=self.markupLowerBound, markupUpperBound=self.markupUpperBound,
+                             datafilesDir=self.datafilesDir, dictionaryFiles=self.dictionaryFiles, incremental=True,
+                             historyPath=self.historyPath)
+        if result["dictionaryFiles"]:
+            self.dictionaryFiles = result["dictionaryFiles"]
+        if result["error"]:
+            print(f"Error: {result['error']} Skipping refresh.")
+            return
+        if not (result["matrix"] or result["markups"]): # a sidecar hit only fills the matrix
+            print("Extraction produced no data, skipping refresh.")
+            return
+        if self.onDataRefreshed is not None:
+            self.onDataRefreshed(savePath, result)
+
+if __name__ == "__main__":
+    # --- USER CONFIGURATION ---
+    RECORD_HISTORY = True # add every new save to markup_history.sqlite (query it with python markup_history.py)
+    # --- END USER CONFIGURATION ---
+
+    watcher = SaveFolderWatcher(onDataRefreshed=lambda savePath, result: print(f"Markups for {savePath} refreshed in {result['artifacts'].get('translated')}"),
+                                historyPath=MARKUP_HISTORY_FILE if RECORD_HISTORY else None)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import string
+import sys
+
+KENSHI_STEAM_APP_ID = "233860"
+KENSHI_DEFAULT_INSTALL_DIR = "Kenshi"
+KENSHI_INSTALL_CACHE_FILE = "kenshi_install_path.json"
+VDF_TOKEN_REGEX = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])|//[^\n]*|\s+')
+
+def parseVdf(text):
+    """
+    Parses Valve's KeyValues text format (libraryfolders.vdf, appmanifest_*.acf) into nested dicts.
+    Keys are lowercased since Steam isn't consistent about their case. Raises ValueError on malformed input.
+    """
+    root = {}
+    stack = [root]
+    pendingKey = None
+    pos = 0
+    while pos < len(text):
+        match = VDF_TOKEN_REGEX.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected character {text[pos]!r} at offset {pos}")
+        pos = match.end()
+        quoted, brace = match.group(1), match.group(2)
+        if brace == "{":
+            if pendingKey is None:
+                raise ValueError(f"Block without a key at offset {match.start()}")
+            block = {}
+            stack[-1][pendingKey] = block
+            stack.append(block)
+            pendingKey = None
+        elif brace == "}":
+            if len(stack) == 1 or pendingKey is not None:
+                raise ValueError(f"Unbalanced '}}' at offset {match.start()}")
+            stack.pop()
+        elif quoted is not None:
+            value = quoted.replace('\\\\', '\\').replace('\\"', '"')
+            if pendingKey is None:
+                pendingKey = value.lower()
+            else:
+                stack[-1][pendingKey] = value
+                pendingKey = None
+    if len(stack) != 1:
+        raise ValueError("Unclosed block at end of input")
+    return root
+
+def readVdfFile(vdfPath):
+    """Parsed contents of a .vdf/.acf file, or None if it is missing or unreadable."""
+    try:
+        with open(vdfPath, 'r', encoding='utf-8', errors='replace') as f:
+            return parseVdf(f.read())
+    except OSError:
+        return None
+    except ValueError as e:
+        print(f"Warning: Could not parse {vdfPath}: {e}")
+        return None
+
+def readSteamPathFromRegistry():
+    """Steam's install folder from the Windows registry, or None (always None off Windows)."""
+    if sys.platform != "win32":
+        return None
+    import winreg
+    registryKeys = [
+        (winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam", "SteamPath"),
+        (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Valve\Steam", "InstallPath"),
+        (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Valve\Steam", "InstallPath"),
+    ]
+    for hive, keyPath, valueName in registryKeys:
+        try:
+            with winreg.OpenKey(hive, keyPath) as key:
+                steamPath = winreg.QueryValueEx(key, valueName)[0]
+        except OSError:
+            continue
+        if steamPath:
+            return os.path.normpath(steamPath)
+    return None
+
+def getSteamRootCandidates():
+    """Folders Steam itself may be installed in on this platform, existing ones only, most likely first."""
+    candidates = []
+    if sys.platform == "win32":
+        candidates.append(readSteamPathFromRegistry())
+        for envName in ("ProgramFiles(x86)", "ProgramFiles"):
+            programFiles = os.getenv(envName)
+            if programFiles:
+                candidates.append(os.path.join(programFiles, "Steam"))
+    else:
+        home = os.path.expanduser("~")
+        candidates.extend([
+            os.path.join(home, ".steam", "steam"),
+            os.path.join(home, ".steam", "root"),
+            os.path.join(home, ".local", "share", "Steam"),
+            os.path.join(home, ".var", "app", "com.valvesoftware.Steam", ".local", "share", "Steam"), # flatpak
+            os.path.join(home, "Library", "Application Support", "Steam"), # macOS
+        ])
+    steamRoots = []
+    seenRoots = set()
+    for candidate in candidates:
+        if not candidate or not os.path.isdir(os.path.join(candidate, "steamapps")):
+            continue
+        realPath = os.path.realpath(candidate) # ~/.steam/steam is usually a symlink to one of the others
+        if realPath not in seenRoots:
+            seenRoots.add(realPath)
+            steamRoots.append(candidate)
+    return steamRoots
+
+def getSteamLibraryFolders(steamRoots=None):
+    """
+    Every Steam library folder listed in the roots' steamapps/libraryfolders.vdf, plus the roots themselves.
+    Understands both the current format ("0" { "path" "..." }) and the old one ("1" "D:\\SteamLibrary").
+    """
+    if steamRoots is None:
+        steamRoots = getSteamRootCandidates()
+    libraryFolders = []
+    seenFolders = set()
+
+    def addFolder(folderPath):
+        realPath = os.path.realpath(folderPath)
+        if realPath not in seenFolders and os.path.isdir(os.path.join(folderPath, "steamapps")):
+            seenFolders.add(realPath)
+            libraryFolders.append(folderPath)
+
+    for steamRoot in steamRoots:
+        addFolder(steamRoot)
+        libraryData = readVdfFile(os.path.join(steamRoot, "steamapps", "libraryfolders.vdf"))
+        if not libraryData:
+            continue
+        libraryEntries = libraryData.get("libraryfolders", {})
+        for entryKey, entryValue in libraryEntries.items():
+            if not entryKey.isdigit():
+                continue
+            folderPath = entryValue.get("path") if isinstance(entryValue, dict) else entryValue
+            if folderPath:
+                addFolder(os.path.normpath(folderPath))
+    return libraryFolders
+
+def isValidKenshiInstall(kenshiPath):
+    """True if kenshiPath looks like a Kenshi install, i.e. has data/gamedata.base (any case)."""
+    if not kenshiPath:
+        return False
+    dataDir = os.path.join(kenshiPath, "data")
+    if os.path.isfile(os.path.join(dataDir, "gamedata.base")):
+        return True
+    try:
+        return any(entry.lower() == "gamedata.base" for entry in os.listdir(dataDir))
+    except OSError:
+        return False
+
+def findKenshiInLibraries(libraryFolders=None):
+    """Kenshi's install folder from the library holding appmanifest_233860.acf, or None."""
+    if libraryFolders is None:
+        libraryFolders = getSteamLibraryFolders()
+    for libraryFolder in libraryFolders:
+        steamAppsPath = os.path.join(libraryFolder, "steamapps")
+        manifestPath = os.path.join(steamAppsPath, f"appmanifest_{KENSHI_STEAM_APP_ID}.acf")
+        if not os.path.isfile(manifestPath):
+            continue
+        manifest = readVdfFile(manifestPath) or {}
+        installDir = manifest.get("appstate", {}).get("installdir") or KENSHI_DEFAULT_INSTALL_DIR
+        kenshiPath = os.path.join(steamAppsPath, "common", installDir)
+        if isValidKenshiInstall(kenshiPath):
+            return kenshiPath
+        print(f"Warning: {manifestPath} points to '{kenshiPath}', which is not a valid Kenshi installation.")
+    return None
+
+def getWindowsDrives(): # get all available drives on Windows using ctypes
+    if sys.platform != "win32":
+        return []
+    import ctypes
+    drives = []
+    bitmask = ctypes.windll.kernel32.GetLogicalDrives()
+    for letter in string.ascii_uppercase:
+        if bitmask & 1:
+            drives.append(letter + ":\\\\") # use double backslash for path compatibility
+        bitmask >>= 1
+    if not drives: # fall back
+        print("ctypes.windll.kernel32.GetLogicalDrives() returned no drives. Falling back to checking C, D, E, F.")
+        for letter in ['C', 'D', 'E', 'F']:
+             drivePath = letter + ":\\\\"
+             if os.path.exists(drivePath):
+                 drives.append(drivePath)
+    return drives
+
+def findKenshiSteamPath(): # searches for kenshi instal path across the drives and only up to 3 levels deep
+    drives = getWindowsDrives()
+    if not drives:
+        print("No drives found to scan for Kenshi installation.")
+        return None
+
+    print(f"Scanning drives: {', '.join(drives)} for Kenshi installation (looking for SteamLibrary)...")
+
+    for drive in drives:
+        print(f"  Scanning drive {drive}...")
+        # level 1: drive:\\SteamLibrary
+        steamLibPathL1 = os.path.join(drive, "SteamLibrary")
+        kenshiPathL1 = os.path.join(steamLibPathL1, "steamapps", "common", "Kenshi")
+        if os.path.isdir(kenshiPathL1):
+            print(f"    Found Kenshi at: {kenshiPathL1}")
+            return kenshiPathL1
+
+        # level 2: drive:\\folder1\\SteamLibrary
+        try:
+            for item1 in os.listdir(drive):
+                pathLevel1Dir = os.path.join(drive, item1)
+                if os.path.isdir(pathLevel1Dir):
+                    steamLibPathL2 = os.path.join(pathLevel1Dir, "SteamLibrary")
+                    kenshiPathL2 = os.path.join(steamLibPathL2, "steamapps", "common", "Kenshi")
+                    if os.path.isdir(kenshiPathL2):
+                        print(f"    Found Kenshi at: {kenshiPathL2}")
+                        return kenshiPathL2
+
+                    # level 3: drive:\\folder1\\folder2\\SteamLibrary
+                    try:
+                        for item2 in os.listdir(pathLevel1Dir):
+                            pathLevel2Dir = os.path.join(pathLevel1Dir, item2)
+                            if os.path.isdir(pathLevel2Dir):
+                                steamLibPathL3 = os.path.join(pathLevel2Dir, "SteamLibrary")
+                                kenshiPathL3 = os.path.join(steamLibPathL3, "steamapps", "common", "Kenshi")
+                                if os.path.isdir(kenshiPathL3):
+                                    print(f"    Found Kenshi at: {kenshiPathL3}")
+                                    return kenshiPathL3
+                    except PermissionError: # silently ignore permission errors for subfolders
+                        pass
+                    except FileNotFoundError:
+                        pass
+        except PermissionError:
+            print(f"Permission denied listing contents of {drive}. Skipping deeper scan on this drive.")
+        except FileNotFoundError:
+            print(f"Drive {drive} or its contents not accessible. Skipping.")
+
+    print("Kenshi installation path not found via SteamLibrary search across all drives.")
+    return None
+
+def loadCachedKenshiPath(cachePath=KENSHI_INSTALL_CACHE_FILE):
+    """The cached install path if it still is a valid Kenshi install, otherwise None."""
+    try:
+        with open(cachePath, 'r', encoding='utf-8') as f:
+            kenshiPath = json.load(f).get("kenshiPath")
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return None
+    if isValidKenshiInstall(kenshiPath):
+        return kenshiPath
+    print(f"Cached Kenshi path '{kenshiPath}' is no longer valid, searching again.")
+    return None
+
+def saveCachedKenshiPath(kenshiPath, source, cachePath=KENSHI_INSTALL_CACHE_FILE):
+    try:
+        with open(cachePath, 'w', encoding='utf-8') as f:
+            json.dump({"kenshiPath": kenshiPath, "source": source}, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        print(f"Warning: Could not write Kenshi install path cache {cachePath}: {e}")
+
+def findKenshiInstallPath(cachePath=KENSHI_INSTALL_CACHE_FILE, allowDriveScan=True):
+    """
+    Kenshi's install folder, or None. Tries, in order: the path cached in cachePath (re-validated with a couple of stats),
+    the Steam library manifests (registry/Program Files on Windows, ~/.steam, ~/.local/share/Steam and flatpak elsewhere),
+    and as a last resort the old drive crawl (Windows only). Whatever is found gets cached for the next run.
+    """
+    kenshiPath = loadCachedKenshiPath(cachePath) if cachePath else None
+    if kenshiPath:
+        return kenshiPath
+
+    source = "steam libraries"
+    kenshiPath = findKenshiInLibraries()
+    if kenshiPath is None and allowDriveScan and sys.platform == "win32":
+        print("Kenshi not found in the Steam library manifests, falling back to scanning drives.")
+        source = "drive scan"
+        kenshiPath = findKenshiSteamPath()
+        if kenshiPath is not None and not isValidKenshiInstall(kenshiPath):
+            print(f"Warning: '{kenshiPath}' has no data/gamedata.base, not caching it.")
+            return kenshiPath
+    if kenshiPath and cachePath:
+        saveCachedKenshiPath(kenshiPath, source, cachePath)
+    return kenshiPath
@@ -0,0 +1,75 @@
+import random
+import re
+import struct
+
+SYNTHETIC_CITY_NAMES = ["Hub", "Squin", "Okran's Fist", "Okran's Pride", "Sho-Battai", "Admag", "Stack", "World's End"]
+SUFFIX_ITEM_NAMES = ["12-foo.base", "312-foo.base", "5-a-12-foo.base"] # names that are suffixes of each other
+
+def makeSyntheticSave(seed=1, cityNames=SYNTHETIC_CITY_NAMES, itemCount=60, rounds=2):
+    """
+    Bytes shaped like a Kenshi save for the extractor: length-prefixed "Town state <name>" records, each followed by
+    item IDs with a 2-byte markup after them, duplicates, names that are suffixes of each other and some junk.
+    """
+    rng = random.Random(seed)
+    itemNames = sorted({f"{rng.randint(1, 99999)}-{''.join(rng.choice('abcdefgh_ 12-') for _ in range(rng.randint(3, 15)))}.{rng.choice(['base', 'mod'])}"
+                        for _ in range(itemCount)}) + SUFFIX_ITEM_NAMES
+    saveBytes = bytearray(b"\x00" * 50 + b"12-foo.base\x10\x27")
+    for _ in range(rounds):
+        for cityName in cityNames:
+            header = ("Town state " + cityName).encode('utf-8')
+            saveBytes += struct.pack("<I", len(header)) + header + b"\x00\x01"
+            for itemName in rng.sample(itemNames, rng.randint(0, len(itemNames))):
+                saveBytes += b"\x03\x00\x00\x00" + itemName.encode('utf-8') + struct.pack("<h", rng.randint(-50, 20000)) + bytes(rng.randint(0, 20))
+                if rng.random() < 0.1:
+                    saveBytes += itemName.encode('utf-8') # a second occurrence, only the first one counts
+            if rng.random() < 0.2:
+                saveBytes += b"\xff\xfe9-bad\xff.base\x20\x20"
+    saveBytes += b"1-end.base\x10"
+    return bytes(saveBytes)
+
+def writeSyntheticSave(path, seed=1, cityNames=SYNTHETIC_CITY_NAMES, itemCount=60, rounds=2):
+    with open(path, 'wb') as f:
+        f.write(makeSyntheticSave(seed, cityNames, itemCount, rounds))
+    return path
+
+def baselineExtract(filePath, cityNames, markupLowerBound, markupUpperBound):
+    """The original extractor's algorithm (a search per item per town occurrence, then the 10% town filter), as the reference."""
+    with open(filePath, 'rb') as f:
+        fileContent = f.read()
+    itemNames = set()
+    for match in re.finditer(rb"(\d+-[^.\x00]+\.(?:base|mod))", fileContent):
+        try:
+            itemNames.add(match.group(1).decode('utf-8'))
+        except UnicodeDecodeError:
+            pass
+    if not itemNames:
+        return {}
+    cityRegex = re.compile(b"Town state (" + b"|".join(re.escape(cityName.encode('utf-8')) for cityName in cityNames) + b")")
+    cityOccurrences = [(match.start(), match.group(1).decode('utf-8')) for match in cityRegex.finditer(fileContent)]
+    extractedData = {}
+    for cityIdx, (cityPos, cityName) in enumerate(cityOccurrences):
+        nextCityPos = cityOccurrences[cityIdx + 1][0] if cityIdx + 1 < len(cityOccurrences) else len(fileContent)
+        cityItems = extractedData.setdefault(cityName, {})
+        for itemName in sorted(itemNames):
+            itemPos = fileContent.find(itemName.encode('utf-8'), cityPos)
+            if itemPos == -1 or itemPos >= nextCityPos:
+                continue
+            markupOffset = itemPos + len(itemName.encode('utf-8'))
+            if markupOffset + 2 > len(fileContent):
+                continue
+            markupPercentage = struct.unpack_from('<h', fileContent, markupOffset)[0] / 100.0
+            if markupLowerBound <= markupPercentage <= markupUpperBound:
+                cityItems[itemName] = [markupPercentage, markupOffset]
+        if not cityItems:
+            del extractedData[cityName]
+    itemCityCounts = {}
+    for cityItems in extractedData.values():
+        for itemName in cityItems:
+            itemCityCounts[itemName] = itemCityCounts.get(itemName, 0) + 1
+    minAppearance = 0.10 * len(extractedData)
+    filteredData = {}
+    for cityName, cityItems in extractedData.items():
+        keptItems = {itemName: entry for itemName, entry in cityItems.items() if itemCityCounts[itemName] >= minAppearance}
+        if keptItems:
+            filteredData[cityName] = keptItems
+    return filteredData
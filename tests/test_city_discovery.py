@@ -0,0 +1,66 @@
+import contextlib
+import io
+import os
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract_game_data
+from extract_game_data import buildCityRegex, discoverCityNames, loadDiscoveredCityNames, resolveCityNames
+from synthetic_save import SYNTHETIC_CITY_NAMES, makeSyntheticSave, writeSyntheticSave
+
+def quietly(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+def townHeader(cityName, trailing=b"\x00"):
+    header = b"Town state " + cityName.encode('utf-8')
+    return struct.pack("<I", len(header)) + header + trailing
+
+class CityRegexTest(unittest.TestCase):
+    def testLongestNameWins(self):
+        saveBytes = townHeader("Okran's Pride") + townHeader("Okran's") + townHeader("Hub") + townHeader("Hubris")
+        for cityNames in (["Okran's", "Okran's Pride", "Hub", "Hubris"], ["Hubris", "Hub", "Okran's Pride", "Okran's"]):
+            with self.subTest(cityNames=cityNames):
+                cityRegex = buildCityRegex(cityNames)
+                self.assertEqual([match.group(1).decode('utf-8') for match in cityRegex.finditer(saveBytes)],
+                                 ["Okran's Pride", "Okran's", "Hub", "Hubris"])
+
+class CityDiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        self.cachePath = os.path.join(self.tempDir.name, "discovered_cities.json")
+
+    def testDiscoversModdedTowns(self):
+        self.assertEqual(discoverCityNames(makeSyntheticSave(seed=2)), SYNTHETIC_CITY_NAMES)
+        # the length prefix cuts a name that runs straight into printable bytes
+        saveBytes = townHeader("Mod Town", trailing=b"ABC\x00") + townHeader("Squin") + townHeader("Mod Town")
+        self.assertEqual(discoverCityNames(saveBytes), ["Mod Town", "Squin"])
+
+    def testDiscoveryIsCachedPerSave(self):
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=2)
+        self.assertEqual(quietly(loadDiscoveredCityNames, savePath, self.cachePath), SYNTHETIC_CITY_NAMES)
+        with mock.patch.object(extract_game_data, "discoverCityNames", side_effect=AssertionError("not cached")):
+            self.assertEqual(quietly(loadDiscoveredCityNames, savePath, self.cachePath), SYNTHETIC_CITY_NAMES)
+        with open(savePath, 'ab') as f: # a changed save is discovered again
+            f.write(townHeader("New Town"))
+        self.assertEqual(quietly(loadDiscoveredCityNames, savePath, self.cachePath), SYNTHETIC_CITY_NAMES + ["New Town"])
+
+    def testAllowAndDenyListsMakeBoundaryTowns(self):
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=2)
+        cityNames, boundaryCityNames = quietly(resolveCityNames, savePath, cityAllowList=["Hub", "Squin", "Stack"],
+                                               cityDenyList=["Stack"], cityCachePath=self.cachePath)
+        self.assertEqual(cityNames, ["Hub", "Squin"])
+        self.assertEqual(boundaryCityNames, [cityName for cityName in SYNTHETIC_CITY_NAMES if cityName not in ("Hub", "Squin")])
+        cityNames, boundaryCityNames = quietly(resolveCityNames, savePath, discoverCities=False, cityDenyList=["Hub"],
+                                               cityCachePath=self.cachePath)
+        self.assertEqual(cityNames, [cityName for cityName in extract_game_data.VANILLA_CITY_NAMES if cityName != "Hub"])
+        self.assertEqual(boundaryCityNames, [])
+
+if __name__ == "__main__":
+    unittest.main()
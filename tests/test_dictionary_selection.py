@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steam_library import KENSHI_STEAM_APP_ID
+from translate_item_ids import collectActiveDictionaryFiles, indexWorkshopModFiles
+
+def writeFile(path, content=b""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+class FakeInstallTest(unittest.TestCase):
+    """collectActiveDictionaryFiles against a fake <steamapps>/common/Kenshi tree with a workshop folder."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.steamAppsPath = self.tempDir.name
+        self.kenshiPath = os.path.join(self.steamAppsPath, "common", "Kenshi")
+        self.workshopDir = os.path.join(self.steamAppsPath, "workshop", "content", KENSHI_STEAM_APP_ID)
+        dataDir = os.path.join(self.kenshiPath, "data")
+        writeFile(os.path.join(dataDir, "gamedata.base"))
+        writeFile(os.path.join(dataDir, "rebirth.mod"))
+        writeFile(os.path.join(dataDir, "newwworld.mod")) # Proton installs don't always keep the case
+        writeFile(os.path.join(self.kenshiPath, "mods", "LocalMod", "LocalMod.mod"))
+        writeFile(os.path.join(self.kenshiPath, "mods", "DisabledMod", "DisabledMod.mod"))
+        writeFile(os.path.join(self.workshopDir, "1000", "WorkshopMod.mod"))
+        writeFile(os.path.join(self.workshopDir, "1000", "preview.png"))
+        writeFile(os.path.join(self.workshopDir, "2000", "Shared.mod"))
+        writeFile(os.path.join(self.workshopDir, "3000", "Shared.mod"))
+        writeFile(os.path.join(self.workshopDir, "4000", "Unused.mod"))
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def writeModsConfig(self, modFileNames):
+        with open(os.path.join(self.kenshiPath, "data", "mods.cfg"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(modFileNames) + "\n")
+
+    def relativePaths(self, paths):
+        return [os.path.relpath(path, self.steamAppsPath).replace(os.sep, "/") for path in paths]
+
+    def testOnlyActiveModsInReverseLoadOrder(self):
+        self.writeModsConfig(["LocalMod.mod", "workshopmod.MOD", "Shared.mod", "Missing.mod"])
+        dictionaryFiles = collectActiveDictionaryFiles(self.kenshiPath)
+        self.assertEqual(self.relativePaths(dictionaryFiles), [
+            "workshop/content/233860/2000/Shared.mod",
+            "workshop/content/233860/1000/WorkshopMod.mod",
+            "common/Kenshi/mods/LocalMod/LocalMod.mod",
+            "common/Kenshi/data/newwworld.mod",
+            "common/Kenshi/data/rebirth.mod",
+            "common/Kenshi/data/gamedata.base",
+        ])
+
+    def testNoModsConfigMeansBaseFilesOnly(self):
+        dictionaryFiles = collectActiveDictionaryFiles(self.kenshiPath)
+        self.assertEqual(self.relativePaths(dictionaryFiles), [
+            "common/Kenshi/data/newwworld.mod",
+            "common/Kenshi/data/rebirth.mod",
+            "common/Kenshi/data/gamedata.base",
+        ])
+
+    def testNotAKenshiInstall(self):
+        self.assertIsNone(collectActiveDictionaryFiles(os.path.join(self.steamAppsPath, "common")))
+
+    def testWorkshopIndex(self):
+        workshopModFiles = indexWorkshopModFiles(self.workshopDir)
+        self.assertEqual(sorted(workshopModFiles), ["shared.mod", "unused.mod", "workshopmod.mod"])
+        self.assertEqual(self.relativePaths([workshopModFiles["shared.mod"]]), ["workshop/content/233860/2000/Shared.mod"])
+        self.assertEqual(indexWorkshopModFiles(os.path.join(self.steamAppsPath, "nowhere")), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_to_csv_converter import exportMarkups
+from markup_pipeline import exportPipelineMarkups, makePipelineResult
+
+MARKUPS = {"Hub": {"Rice": [1.25, 100], "Hashish": [0.8, 140]}, "Squin": {"Rice": [1.1, 300]}}
+
+def quietly(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+class UnknownExportFormatTest(unittest.TestCase):
+    """A misspelled format is skipped and the valid ones are still written."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def testUnknownFormatIsSkipped(self):
+        outputPaths = {"jsonl": os.path.join(self.tempDir.name, "markups.jsonl"),
+                       "csvItemRows": os.path.join(self.tempDir.name, "markups.csv"),
+                       "jsnol": os.path.join(self.tempDir.name, "typo.jsonl")}
+        written = quietly(exportMarkups, MARKUPS, outputPaths)
+        self.assertEqual(set(written), {"jsonl", "csvItemRows"})
+        self.assertFalse(os.path.exists(outputPaths["jsnol"]))
+        with open(outputPaths["jsonl"], encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 3)
+
+    def testOnlyUnknownFormatsWritesNothing(self):
+        self.assertEqual(quietly(exportMarkups, MARKUPS, {"xlsx": os.path.join(self.tempDir.name, "markups.xlsx")}), {})
+
+    def testPipelineListsSkippedFormats(self):
+        result = makePipelineResult()
+        quietly(exportPipelineMarkups, MARKUPS, result, self.tempDir.name, True, False, {"jsonl": "markups.jsonl", "jsnol": "typo.jsonl"})
+        self.assertEqual(set(result["artifacts"]), {"csv", "jsonl"})
+        self.assertEqual(len(result["warnings"]), 1)
+        self.assertIn("jsnol", result["warnings"][0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import contextlib
+import io
+import os
+import random
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incremental_extraction
+from extract_game_data import extractMarkupsFromGameFile
+from incremental_extraction import extractMarkupsIncremental
+from save_access import SaveFileView
+from synthetic_save import SYNTHETIC_CITY_NAMES, makeSyntheticSave
+
+def quietly(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+class IncrementalExtractionTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.savePath = os.path.join(self.tempDir.name, "quick.save")
+        self.statePath = os.path.join(self.tempDir.name, "state.json")
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def writeSave(self, saveBytes):
+        with open(self.savePath, 'wb') as f:
+            f.write(saveBytes)
+
+    def extractIncrementally(self):
+        """(result, number of segments extracted from the bytes rather than reused)."""
+        with mock.patch.object(incremental_extraction, "extractCitySegment", wraps=incremental_extraction.extractCitySegment) as extractCitySegment:
+            result = quietly(extractMarkupsIncremental, self.savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0, statePath=self.statePath)
+        return result, extractCitySegment.call_count
+
+    def testPrependedBytesRebaseOffsets(self):
+        saveBytes = makeSyntheticSave(seed=3)
+        self.writeSave(saveBytes)
+        firstResult, firstExtracted = self.extractIncrementally()
+        self.assertEqual(firstExtracted, 2 * len(SYNTHETIC_CITY_NAMES))
+
+        shift = 37
+        self.writeSave(b"\x00" * shift + saveBytes)
+        shiftedResult, shiftedExtracted = self.extractIncrementally()
+        self.assertEqual(shiftedExtracted, 0) # every segment moved but none changed
+        self.assertEqual(shiftedResult, {cityName: {itemName: [markup, offset + shift] for itemName, (markup, offset) in cityItems.items()}
+                                         for cityName, cityItems in firstResult.items()})
+        self.assertEqual(shiftedResult, quietly(extractMarkupsFromGameFile, self.savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0))
+        with SaveFileView(self.savePath) as saveView:
+            for cityItems in shiftedResult.values():
+                for markup, offset in cityItems.values():
+                    self.assertEqual(saveView.readMarkupRaw(offset) / 100.0, markup)
+
+    def testOnlyTheEditedSegmentIsRescanned(self):
+        saveBytes = bytearray(makeSyntheticSave(seed=4))
+        self.writeSave(saveBytes)
+        firstResult, _ = self.extractIncrementally()
+        cityName, cityItems = next(iter(firstResult.items()))
+        itemName, (_, offset) = next(iter(cityItems.items()))
+        saveBytes[offset:offset + 2] = struct.pack("<h", 4321)
+        saveBytes[:0] = b"\x00\x07" # and move everything
+        self.writeSave(saveBytes)
+        result, extracted = self.extractIncrementally()
+        self.assertEqual(extracted, 1)
+        self.assertEqual(result[cityName][itemName], [43.21, offset + 2])
+        self.assertEqual(result, quietly(extractMarkupsFromGameFile, self.savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0))
+
+    def testRandomEditsMatchFullExtraction(self):
+        rng = random.Random(7)
+        saveBytes = bytearray(makeSyntheticSave(seed=5))
+        for step in range(12):
+            editKind = rng.choice(["markup", "insert", "delete", "newName", "town"])
+            editPos = rng.randrange(len(saveBytes) - 40)
+            if editKind == "markup":
+                saveBytes[editPos:editPos + 2] = struct.pack("<h", rng.randint(0, 15000))
+            elif editKind == "insert":
+                saveBytes[editPos:editPos] = bytes(rng.randint(1, 40))
+            elif editKind == "delete":
+                del saveBytes[editPos:editPos + rng.randint(1, 30)]
+            elif editKind == "newName": # may be a suffix of names elsewhere
+                saveBytes[editPos:editPos] = b"\x00" + rng.choice([b"2-foo.base", b"9-zz.mod", b"oo.base"]) + b"\x10\x20\x00"
+            else:
+                saveBytes[editPos:editPos] = b"\x00Town state " + rng.choice(SYNTHETIC_CITY_NAMES).encode('utf-8') + b"\x00"
+            self.writeSave(saveBytes)
+            result, _ = self.extractIncrementally()
+            self.assertEqual(result, quietly(extractMarkupsFromGameFile, self.savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0), f"step {step}: {editKind}")
+
+if __name__ == "__main__":
+    unittest.main()
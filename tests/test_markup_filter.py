@@ -0,0 +1,68 @@
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markup_filter import FILTER_MODES, MarkupFilterIndex
+from markup_matrix import MarkupMatrix
+
+def naiveMatches(filterText, filterMode, name):
+    """The table's filter before the index: test every row's names."""
+    if not filterText:
+        return True
+    if filterMode == "Exact":
+        return name.lower() == filterText.lower()
+    if filterMode == "Regex":
+        return re.search(filterText, name.lower(), re.IGNORECASE) is not None
+    return filterText.lower() in name.lower()
+
+class MarkupFilterIndexTest(unittest.TestCase):
+    """The trigram index gives the cells a row-by-row filter would show, in table order."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        words = ["Katana", "Iron", "Plate", "Rice", "Bread", "Hashish", "Wakizashi", "Ration", "Bag", "Ninja", "Plank", "Bo"]
+        itemNames = sorted({" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(80)} | {"Bo", "RICE", "rice bag"})
+        cityNames = ["The Hub", "Squin", "Okran's Pride", "Okran's Fist", "Admag", "Stack", "Mongrel"]
+        markups = {cityName: {itemName: [1.0 + rng.randint(0, 100) / 100, 1000 + itemIdx]
+                              for itemIdx, itemName in enumerate(itemNames) if rng.random() < 0.5} for cityName in cityNames}
+        markups["Mongrel"] = {} # a town without markups
+        self.matrix = MarkupMatrix.fromNestedDict(markups)
+        self.allCells = self.matrix.presentCells()
+        self.filterIndex = MarkupFilterIndex(self.matrix, self.allCells)
+        self.itemQueries = ["", "a", "ri", "ric", "RICE", "rice bag", "ice", "an", "ation", "plate iron", "zzz", "bo",
+                            "kat ana", "^bo$", "(rice|bread)", "ag$"]
+        self.cityQueries = ["", "okran", "HUB", "s", "Squin", "mongrel", "nowhere"]
+
+    def naiveFilter(self, cityFilterText, itemFilterText, filterMode):
+        itemCount = len(self.matrix.itemNames)
+        return [cellIdx for cellIdx in self.allCells
+                if naiveMatches(cityFilterText, filterMode, self.matrix.cityNames[cellIdx // itemCount])
+                and naiveMatches(itemFilterText, filterMode, self.matrix.itemNames[cellIdx % itemCount])]
+
+    def testMatchesRowByRowFilter(self):
+        for filterMode in FILTER_MODES:
+            for cityFilterText in self.cityQueries:
+                for itemFilterText in self.itemQueries:
+                    with self.subTest(filterMode=filterMode, cityFilterText=cityFilterText, itemFilterText=itemFilterText):
+                        visibleCells = self.filterIndex.filterCells(cityFilterText, itemFilterText, filterMode)
+                        if not cityFilterText and not itemFilterText:
+                            self.assertIsNone(visibleCells)
+                            continue
+                        self.assertEqual(list(visibleCells), self.naiveFilter(cityFilterText, itemFilterText, filterMode))
+
+    def testMatchItemsAgainstNames(self):
+        for itemFilterText in self.itemQueries[1:]:
+            with self.subTest(itemFilterText=itemFilterText):
+                self.assertEqual(self.filterIndex.matchItems(itemFilterText),
+                                 [itemIdx for itemIdx, itemName in enumerate(self.matrix.itemNames) if itemFilterText.lower() in itemName.lower()])
+
+    def testBadRegexRaises(self):
+        with self.assertRaises(re.error):
+            self.filterIndex.filterCells("", "(rice", "Regex")
+
+if __name__ == "__main__":
+    unittest.main()
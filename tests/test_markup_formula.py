@@ -0,0 +1,112 @@
+import contextlib
+import io
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markup_formula
+from markup_formula import FormulaError, buildSaveChanges, evaluateFormula, parseFormula
+from markup_matrix import MARKUP_SCALE, MarkupMatrix
+
+MARKUPS = {
+    "The Hub": {"Katana": [100.0, 1000], "Rice": [150.0, 1100], "Bread": [80.0, 1200]},
+    "Squin": {"Katana": [120.0, 2000], "Rice": [100.0, 2100]},
+    "Admag": {"Katana": [90.0, 3000], "Bread": [110.0]}, # no offset known
+}
+
+class FormulaTest(unittest.TestCase):
+    """evaluateFormula on a small matrix, on the list path and (when installed) the numpy path."""
+
+    def setUp(self):
+        self.matrix = MarkupMatrix.fromNestedDict(MARKUPS)
+
+    def useNumpyModes(self):
+        return [False, True] if markup_formula.numpyAvailable else [False]
+
+    def newMarkups(self, setFormula, whereFormula=""):
+        """{(city, item): new markup} of every matched cell, per evaluation mode; fails if the modes disagree."""
+        results = []
+        for useNumpy in self.useNumpyModes():
+            formulaResult = evaluateFormula(self.matrix, setFormula, whereFormula, useNumpy=useNumpy)
+            newRawMarkups = dict(zip(formulaResult["changedCells"], formulaResult["newRawMarkups"]))
+            itemCount = len(self.matrix.itemNames)
+            results.append({(self.matrix.cityNames[cellIdx // itemCount], self.matrix.itemNames[cellIdx % itemCount]):
+                            newRawMarkups.get(cellIdx, self.matrix.rawMarkups[cellIdx]) / MARKUP_SCALE
+                            for cellIdx in formulaResult["matchedCells"]})
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+        return results[0]
+
+    def assertRejected(self, setFormula, whereFormula=""):
+        for useNumpy in self.useNumpyModes():
+            with self.subTest(setFormula=setFormula, whereFormula=whereFormula, useNumpy=useNumpy):
+                with self.assertRaises(FormulaError):
+                    evaluateFormula(self.matrix, setFormula, whereFormula, useNumpy=useNumpy)
+
+    def testOnlyWhitelistedSyntaxParses(self):
+        for formulaText in ["__import__('os')", "value.real", "[value, 1]", "(lambda: 1)()", "value[0]",
+                            "open('save')", "clamp", "clamp(value, lowerBound=1, upperBound=2)", "{1: 2}", "value +"]:
+            with self.subTest(formulaText=formulaText):
+                with self.assertRaises(FormulaError):
+                    parseFormula(formulaText)
+        parseFormula("clamp(value * 1.1, 50, 150) if matches(item, 'kat') and city != 'Squin' else itemMedian")
+
+    def testAndOrReturnTheDecidingOperand(self):
+        self.assertEqual(self.newMarkups("value > 100 and 200 or 50"), {
+            ("The Hub", "Katana"): 50, ("The Hub", "Rice"): 200, ("The Hub", "Bread"): 50,
+            ("Squin", "Katana"): 200, ("Squin", "Rice"): 50, ("Admag", "Katana"): 50, ("Admag", "Bread"): 200})
+        newMarkups = self.newMarkups("value - 100 or 75")
+        self.assertEqual(newMarkups[("The Hub", "Katana")], 75)
+        self.assertEqual(newMarkups[("The Hub", "Rice")], 50)
+        self.assertEqual(newMarkups[("Admag", "Katana")], -10)
+        self.assertEqual(set(self.newMarkups("value", "value - 100")), {
+            ("The Hub", "Rice"), ("The Hub", "Bread"), ("Squin", "Katana"), ("Admag", "Katana"), ("Admag", "Bread")})
+
+    def testBranchesOnlyRunForTheirCells(self):
+        newMarkups = self.newMarkups("100 / (value - 100) if value != 100 else 7")
+        self.assertEqual(newMarkups[("The Hub", "Katana")], 7)
+        self.assertEqual(newMarkups[("The Hub", "Rice")], 2)
+        self.assertEqual(newMarkups[("Squin", "Rice")], 7)
+        self.assertEqual(newMarkups[("Admag", "Katana")], -10)
+        self.assertEqual(len(self.newMarkups("value", "value != 100 and 100 / (value - 100) > 1")), 3)
+        self.assertRejected("100 / (value - 100)")
+        self.assertRejected("value", "100 / (value - 100) > 1")
+
+    def testNonNumericResultsAreRejected(self):
+        for setFormula in ["value > 100", "True", "None", "'150'", "city", "category", "value if value > 100 else False"]:
+            self.assertRejected(setFormula)
+        self.assertRejected("value * 1000") # doesn't fit a signed short
+
+    def testWhereSelectsCells(self):
+        self.assertEqual(self.newMarkups("value * 2", "city == 'Squin'"), {("Squin", "Katana"): 240, ("Squin", "Rice"): 200})
+        self.assertEqual(self.newMarkups("value", "matches(item, '^KAT') and value < 110"),
+                         {("The Hub", "Katana"): 100, ("Admag", "Katana"): 90})
+        for useNumpy in self.useNumpyModes():
+            formulaResult = evaluateFormula(self.matrix, "value", "city == 'Squin'", useNumpy=useNumpy)
+            self.assertEqual(len(formulaResult["matchedCells"]), 2)
+            self.assertEqual(len(formulaResult["changedCells"]), 0)
+        self.assertEqual(self.newMarkups("value", "False"), {})
+
+    def testAggregates(self):
+        newMarkups = self.newMarkups("itemMedian")
+        self.assertEqual(newMarkups[("Squin", "Katana")], 100)
+        self.assertEqual(newMarkups[("The Hub", "Rice")], 125)
+        self.assertEqual(newMarkups[("Admag", "Bread")], 95)
+        newMarkups = self.newMarkups("cityMax - cityMin + itemMin")
+        self.assertEqual(newMarkups[("The Hub", "Bread")], 150)
+        self.assertEqual(newMarkups[("Squin", "Rice")], 120)
+        self.assertEqual(self.newMarkups("itemMax", "value == itemMax"), {
+            ("The Hub", "Rice"): 150, ("Squin", "Katana"): 120, ("Admag", "Bread"): 110})
+
+    def testBuildSaveChanges(self):
+        formulaResult = evaluateFormula(self.matrix, "value + 10", "item == 'Bread'", useNumpy=False)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            changes = buildSaveChanges(self.matrix, formulaResult["changedCells"], formulaResult["newRawMarkups"])
+        self.assertEqual(changes, [{"offset": 1200, "bytes": struct.pack('<h', 9000), "itemName": "Bread", "city": "The Hub"}])
+        self.assertIn("Warning:", output.getvalue()) # Admag's bread has no offset
+
+if __name__ == "__main__":
+    unittest.main()
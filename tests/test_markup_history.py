@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markup_history import MarkupHistory
+
+ITEM_NAMES = {"101-gamedata.base": "Katana", "102-gamedata.base": "Rice", "103-rebirth.mod": "Bread"}
+KATANA, RICE, BREAD = ITEM_NAMES
+
+def fingerprint(mtime, hashSeed):
+    return {"size": 1000 + hashSeed, "mtime": float(mtime), "hash": f"{hashSeed:032x}"}
+
+class MarkupHistoryTest(unittest.TestCase):
+    """A history of a few synthetic snapshots, each one a save's extraction by item ID."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        self.markupHistory = MarkupHistory(os.path.join(self.tempDir.name, "markup_history.sqlite"))
+        self.addCleanup(self.markupHistory.close)
+        self.snapshotIds = [
+            self.record({"The Hub": {KATANA: [100.0, 10], RICE: [120.0, 20]}, "Squin": {KATANA: [90.0, 30]}}, 1000, 1),
+            self.record({"The Hub": {KATANA: [110.0, 10]}, "Squin": {KATANA: [90.0, 30]}}, 2000, 2), # the Hub drops rice
+            self.record({"The Hub": {KATANA: [100.0, 10], RICE: [130.0, 20]}, # katana back to 100, rice back in
+                         "Squin": {KATANA: [95.0, 30], BREAD: [50.0, 40]}}, 3000, 3),
+        ]
+
+    def record(self, itemIdMarkups, mtime, hashSeed):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.markupHistory.recordSnapshot(itemIdMarkups, fingerprint(mtime, hashSeed), f"save{hashSeed}.save", ITEM_NAMES)
+
+    def markups(self, history):
+        return [(change["city"], change["snapshot"], change["markup"]) for change in history]
+
+    def testOnlyChangesAreStored(self):
+        self.assertEqual([snapshot["changes"] for snapshot in self.markupHistory.listSnapshots()], [3, 2, 4])
+        first, second, third = self.snapshotIds
+        self.assertEqual(self.markups(self.markupHistory.itemHistory("Katana")),
+                         [("The Hub", first, 100), ("The Hub", second, 110), ("The Hub", third, 100),
+                          ("Squin", first, 90), ("Squin", third, 95)])
+        self.assertEqual(self.markups(self.markupHistory.itemHistory(KATANA, "Squin", since=2500)), [("Squin", third, 95)])
+
+    def testDroppedItemGetsNullAndCanReappear(self):
+        first, second, third = self.snapshotIds
+        self.assertEqual(self.markups(self.markupHistory.itemHistory("rice")),
+                         [("The Hub", first, 120), ("The Hub", second, None), ("The Hub", third, 130)])
+
+    def testMissingTownIsLeftAlone(self):
+        self.record({"Squin": {KATANA: [95.0, 30], BREAD: [50.0, 40]}}, 4000, 4)
+        self.assertEqual(len(self.markupHistory.itemHistory("Katana", "The Hub")), 3)
+        self.assertEqual(self.markupHistory.listSnapshots()[-1]["changes"], 0)
+
+    def testOlderAndRepeatedSavesAreNotRecorded(self):
+        self.assertIsNone(self.record({"The Hub": {KATANA: [50.0, 10]}}, 1500, 5))
+        self.assertEqual(self.record({"The Hub": {KATANA: [50.0, 10]}}, 3000, 2), self.snapshotIds[1])
+        self.assertEqual(len(self.markupHistory.listSnapshots()), 3)
+        self.assertEqual(self.markupHistory.findSnapshot(fingerprint(3000, 3)["hash"]), self.snapshotIds[2])
+        self.assertIsNone(self.markupHistory.findSnapshot(fingerprint(1500, 5)["hash"]))
+
+    def testLargestMovers(self):
+        first, second, third = self.snapshotIds
+        movers = [(mover["name"], mover["city"], mover["before"], mover["after"], mover["change"])
+                  for mover in self.markupHistory.largestMovers()]
+        self.assertEqual(movers, [("Katana", "The Hub", 110, 100, -10), ("Katana", "Squin", 90, 95, 5),
+                                  ("Bread", "Squin", None, 50, None), ("Rice", "The Hub", None, 130, None)])
+        # the Hub's katana went 100 -> 110 -> 100, so it didn't move between the first and the last snapshot
+        movers = [(mover["name"], mover["city"], mover["change"]) for mover in self.markupHistory.largestMovers(first, third)]
+        self.assertEqual(movers, [("Rice", "The Hub", 10), ("Katana", "Squin", 5), ("Bread", "Squin", None)])
+        self.assertEqual(self.markupHistory.largestMovers(first, second, cityName="Squin"), [])
+        self.assertEqual(len(self.markupHistory.largestMovers(first, third, limit=1)), 1)
+        self.assertEqual(self.markupHistory.largestMovers(third, first), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markup_matrix
+from extract_game_data import extractMarkupsFromGameFile
+from markup_matrix import MISSING_OFFSET, MarkupMatrix
+from markup_sidecar import readMarkupSidecar, writeMarkupSidecar
+from synthetic_save import SYNTHETIC_CITY_NAMES, writeSyntheticSave
+
+class MarkupMatrixTest(unittest.TestCase):
+    """The matrix holds exactly what the nested {city: {item: [markup, offset]}} dicts held."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=6)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.markups = extractMarkupsFromGameFile(savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0)
+        self.matrix = MarkupMatrix.fromNestedDict(self.markups)
+
+    def testNestedDictRoundTrip(self):
+        self.assertEqual(self.matrix.toNestedDict(), self.markups)
+        self.assertEqual(self.matrix.cityNames, list(self.markups))
+        self.assertEqual(len(self.matrix), sum(len(cityItems) for cityItems in self.markups.values()))
+        for cityName, cityItems in self.markups.items():
+            for itemName, entry in cityItems.items():
+                self.assertEqual(self.matrix.get(cityName, itemName), entry)
+        self.assertIsNone(self.matrix.get("Nowhere", self.matrix.itemNames[0]))
+
+    def testCellsMatchTheDicts(self):
+        cells = [(self.matrix.cityNames[cityIdx], self.matrix.itemNames[itemIdx], rawMarkup / 100.0, offset)
+                 for cityIdx, itemIdx, rawMarkup, offset in self.matrix.iterCells()]
+        self.assertEqual(sorted(cells), sorted((cityName, itemName, entry[0], entry[1])
+                                               for cityName, cityItems in self.markups.items() for itemName, entry in cityItems.items()))
+        presentCells = [cityIdx * len(self.matrix.itemNames) + itemIdx for cityIdx, itemIdx, _, _ in self.matrix.iterCells()]
+        self.assertEqual(list(self.matrix.presentCells()), presentCells)
+        numpyAvailable = markup_matrix.numpyAvailable
+        try:
+            markup_matrix.numpyAvailable = False # the list path gives the same cells
+            self.assertEqual(list(self.matrix.presentCells()), presentCells)
+        finally:
+            markup_matrix.numpyAvailable = numpyAvailable
+
+    def testBareMarkupsAndEdits(self):
+        matrix = MarkupMatrix.fromNestedDict({"Hub": {"Rice": 1.5, "Bread": [0.75, 40]}, "Squin": {"Bread": [1.1]}, "Admag": {}})
+        self.assertEqual(matrix.toNestedDict(), {"Hub": {"Rice": [1.5, MISSING_OFFSET], "Bread": [0.75, 40]},
+                                                 "Squin": {"Bread": [1.1, MISSING_OFFSET]}, "Admag": {}})
+        matrix.setMarkup(matrix.cityIndex["Hub"], matrix.itemIndex["Rice"], 2.25)
+        self.assertEqual(matrix.get("Hub", "Rice"), [2.25, MISSING_OFFSET])
+        with self.assertRaises(KeyError):
+            matrix.setMarkup(matrix.cityIndex["Squin"], matrix.itemIndex["Rice"], 1.0)
+        with self.assertRaises(ValueError):
+            matrix.setMarkup(matrix.cityIndex["Hub"], matrix.itemIndex["Rice"], 400.0)
+        self.assertIsNone(matrix.markup(matrix.cityIndex["Admag"], matrix.itemIndex["Bread"]))
+
+    def testSidecarRoundTrip(self):
+        sidecarPath = os.path.join(self.tempDir.name, "translated_game_markups.kmm")
+        self.assertTrue(writeMarkupSidecar(sidecarPath, self.matrix))
+        for copyArrays in (True, False):
+            with self.subTest(copyArrays=copyArrays):
+                matrix, _ = readMarkupSidecar(sidecarPath, copyArrays)
+                self.assertEqual(matrix.toNestedDict(), self.markups)
+
+if __name__ == "__main__":
+    unittest.main()
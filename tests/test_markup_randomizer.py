@@ -0,0 +1,85 @@
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markup_randomizer
+from markup_matrix import MarkupMatrix
+from markup_randomizer import DISTRIBUTIONS, drawUnitSamples, randomizeMarkups
+
+# share of draws below 0.25 per distribution, (expected, tolerance)
+LOWER_QUARTER_SHARES = {"Uniform": (0.25, 0.02), "Normal": (0.16, 0.02), "Truncated Normal": (0.14, 0.02),
+                        "Triangular": (0.125, 0.02), "Beta (Two-Peak)": (1 / 3, 0.02)}
+
+class MarkupRandomizerTest(unittest.TestCase):
+    """Seeded draws are reproducible, follow their distribution and stay inside the caps."""
+
+    def setUp(self):
+        markups = {cityName: {itemName: [100.0, 10 * itemIdx] for itemIdx, itemName in enumerate(
+            ["Katana", "Iron Plate", "Bread", "Hashish", "Rice", "Bag", "Wakizashi", "Ration"])}
+            for cityName in ["The Hub", "Squin", "Admag", "Stack"]}
+        self.matrix = MarkupMatrix.fromNestedDict(markups)
+        self.cells = self.matrix.presentCells()
+
+    def useNumpyModes(self):
+        return [False, True] if markup_randomizer.numpyAvailable else [False]
+
+    def testSeedIsReproducible(self):
+        for useNumpy in self.useNumpyModes():
+            for distribution in DISTRIBUTIONS:
+                with self.subTest(useNumpy=useNumpy, distribution=distribution):
+                    first = randomizeMarkups(self.matrix, self.cells, distribution, seed=42, useNumpy=useNumpy)
+                    self.assertEqual(randomizeMarkups(self.matrix, self.cells, distribution, seed=42, useNumpy=useNumpy), first)
+                    self.assertNotEqual(randomizeMarkups(self.matrix, self.cells, distribution, seed=43, useNumpy=useNumpy), first)
+                    self.assertEqual(len(first), len(self.cells))
+
+    def testUniformMatchesTheOriginalDraws(self):
+        """Without numpy a seeded uniform run draws what random.uniform per table row drew in the original editor."""
+        rawMarkups = randomizeMarkups(self.matrix, self.cells, "Uniform", 70.0, 140.5, seed=5, useNumpy=False)
+        generator = random.Random(5)
+        for rawMarkup in rawMarkups:
+            self.assertAlmostEqual(rawMarkup, float(f"{generator.uniform(70.0, 140.5):.2f}") * 100, delta=1)
+
+    def testSamplesFollowTheDistribution(self):
+        for useNumpy in self.useNumpyModes():
+            for distribution in DISTRIBUTIONS:
+                with self.subTest(useNumpy=useNumpy, distribution=distribution):
+                    samples = list(drawUnitSamples(distribution, 20000, seed=1, useNumpy=useNumpy))
+                    self.assertTrue(all(0.0 <= sample <= 1.0 for sample in samples))
+                    self.assertAlmostEqual(statistics.fmean(samples), 0.5, delta=0.01)
+                    expectedShare, tolerance = LOWER_QUARTER_SHARES[distribution]
+                    self.assertAlmostEqual(sum(sample < 0.25 for sample in samples) / len(samples), expectedShare, delta=tolerance)
+
+    def testCapsAreRespected(self):
+        itemCount = len(self.matrix.itemNames)
+        for useNumpy in self.useNumpyModes():
+            for distribution in DISTRIBUTIONS:
+                with self.subTest(useNumpy=useNumpy, distribution=distribution):
+                    rawMarkups = randomizeMarkups(self.matrix, self.cells, distribution, 70.0, 140.5, cityCaps={"Squin": (20.0, 30.0)},
+                                                  categoryCaps={"Food": (150.0, 160.0)}, seed=3, useNumpy=useNumpy)
+                    for cellIdx, rawMarkup in zip(self.cells, rawMarkups):
+                        cityName, itemName = self.matrix.cityNames[cellIdx // itemCount], self.matrix.itemNames[cellIdx % itemCount]
+                        lowerCap, upperCap = ((150.0, 160.0) if itemName in ("Bread", "Rice", "Ration") else
+                                              (20.0, 30.0) if cityName == "Squin" else (70.0, 140.5))
+                        self.assertTrue(lowerCap * 100 <= rawMarkup <= upperCap * 100, (cityName, itemName, rawMarkup))
+
+    def testBadSettingsRaise(self):
+        with self.assertRaises(ValueError):
+            randomizeMarkups(self.matrix, self.cells, "Uniform", 140.0, 70.0, useNumpy=False)
+        with self.assertRaises(ValueError):
+            randomizeMarkups(self.matrix, self.cells, "Uniform", 70.0, 400.0, useNumpy=False)
+        with self.assertRaises(ValueError):
+            randomizeMarkups(self.matrix, self.cells, "Poisson", useNumpy=False)
+        with self.assertRaises(ValueError):
+            randomizeMarkups(self.matrix, self.cells, "Uniform", cityCaps={"Squin": (50.0, 50.0)}, useNumpy=False)
+        with contextlib.redirect_stdout(io.StringIO()) as output: # an unknown town's caps are ignored with a warning
+            randomizeMarkups(self.matrix, self.cells, "Uniform", cityCaps={"Nowhere": (1.0, 2.0)}, seed=1, useNumpy=False)
+        self.assertIn("Warning:", output.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
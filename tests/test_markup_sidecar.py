@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markup_matrix import MarkupMatrix
+from markup_pipeline import loadFreshSidecar
+from markup_sidecar import writeMarkupSidecar
+from save_access import computeSaveFingerprint
+
+CONFIG_DIGEST = bytes(range(16))
+
+class FreshSidecarTest(unittest.TestCase):
+    """loadFreshSidecar only accepts a sidecar written for the same save bytes and config."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        self.savePath = os.path.join(self.tempDir.name, "quick.save")
+        self.sidecarPath = os.path.join(self.tempDir.name, "translated_game_markups.kmm")
+        with open(self.savePath, 'wb') as f:
+            f.write(b"Hub\x00Rice\x00" * 64)
+        self.matrix = MarkupMatrix.fromNestedDict({"Hub": {"Rice": [1.25, 4]}, "Squin": {"Rice": [0.9, 40]}})
+        self.assertTrue(writeMarkupSidecar(self.sidecarPath, self.matrix, computeSaveFingerprint(self.savePath), CONFIG_DIGEST))
+
+    def testSameSaveIsFresh(self):
+        matrix, snapshotId = loadFreshSidecar(self.sidecarPath, self.savePath, computeSaveFingerprint(self.savePath), CONFIG_DIGEST)
+        self.assertEqual(matrix.toNestedDict(), self.matrix.toNestedDict())
+        self.assertIsNone(snapshotId)
+
+    def testOtherConfigIsStale(self):
+        fingerprint = computeSaveFingerprint(self.savePath)
+        self.assertEqual(loadFreshSidecar(self.sidecarPath, self.savePath, fingerprint, bytes(16)), (None, None))
+
+    def testRewriteWithSameSizeAndMtimeIsStale(self):
+        saveStat = os.stat(self.savePath)
+        with open(self.savePath, 'wb') as f:
+            f.write(b"Hub\x00Rica\x00" * 64)
+        os.utime(self.savePath, ns=(saveStat.st_atime_ns, saveStat.st_mtime_ns))
+        fingerprint = computeSaveFingerprint(self.savePath)
+        self.assertEqual((fingerprint["size"], fingerprint["mtime"]), (saveStat.st_size, saveStat.st_mtime))
+        self.assertEqual(loadFreshSidecar(self.sidecarPath, self.savePath, fingerprint, CONFIG_DIGEST), (None, None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_game_data import ITEM_NAME_REGEX, buildItemOccurrenceIndex, extractMarkupsFromGameFile, findFirstOccurrence
+from synthetic_save import SYNTHETIC_CITY_NAMES, SUFFIX_ITEM_NAMES, baselineExtract, makeSyntheticSave, writeSyntheticSave
+
+class OccurrenceIndexTest(unittest.TestCase):
+    """The single-pass occurrence index gives what the original search per item per town gave."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def testFirstOccurrenceMatchesFind(self):
+        saveBytes = makeSyntheticSave(seed=3)
+        itemNames = {match.group(1) for match in re.finditer(rb"(\d+-[^.\x00]+\.(?:base|mod))", saveBytes)}
+        occurrenceIndex = buildItemOccurrenceIndex(saveBytes, itemNames, ITEM_NAME_REGEX)
+        for itemName in sorted(itemNames):
+            with self.subTest(itemName=itemName):
+                for startPos in range(0, len(saveBytes), 997):
+                    self.assertEqual(findFirstOccurrence(occurrenceIndex, itemName, startPos, len(saveBytes)), saveBytes.find(itemName, startPos))
+        for suffixName in SUFFIX_ITEM_NAMES: # found inside the longer names too
+            self.assertEqual(occurrenceIndex[suffixName.encode('utf-8')],
+                             [match.start() for match in re.finditer(re.escape(suffixName.encode('utf-8')), saveBytes)])
+
+    def testExtractionMatchesBaseline(self):
+        cityLists = [SYNTHETIC_CITY_NAMES, SYNTHETIC_CITY_NAMES[:3], ["Hub", "Stack"]]
+        for seed in range(1, 6):
+            savePath = writeSyntheticSave(os.path.join(self.tempDir.name, f"seed{seed}.save"), seed=seed)
+            for cityNames in cityLists:
+                with self.subTest(seed=seed, cityNames=cityNames):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        extracted = extractMarkupsFromGameFile(savePath, cityNames, 1.0, 175.0)
+                    self.assertEqual(extracted, baselineExtract(savePath, cityNames, 1.0, 175.0))
+                    self.assertTrue(extracted)
+
+if __name__ == "__main__":
+    unittest.main()
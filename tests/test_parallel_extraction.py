@@ -0,0 +1,49 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_game_data import extractMarkupsFromGameFile
+from synthetic_save import SYNTHETIC_CITY_NAMES, writeSyntheticSave
+
+def extractWithProgress(savePath, cityNames, **kwargs):
+    """(extracted markups, every onCityExtracted call with a copy of the city's markups)."""
+    progress = []
+    def onCityExtracted(cityName, cityItems, segmentsDone, segmentsTotal):
+        progress.append((cityName, dict(cityItems), segmentsDone, segmentsTotal))
+    with contextlib.redirect_stdout(io.StringIO()):
+        extracted = extractMarkupsFromGameFile(savePath, cityNames, 1.0, 175.0, onCityExtracted=onCityExtracted, **kwargs)
+    return extracted, progress
+
+class ParallelExtractionTest(unittest.TestCase):
+    """Extracting the city segments on a process pool gives the serial result and progress."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def testWorkersMatchSerial(self):
+        for seed, rounds in ((1, 2), (2, 4)):
+            savePath = writeSyntheticSave(os.path.join(self.tempDir.name, f"seed{seed}.save"), seed=seed, rounds=rounds)
+            expected, expectedProgress = extractWithProgress(savePath, SYNTHETIC_CITY_NAMES)
+            for workers in (2, 3):
+                with self.subTest(seed=seed, workers=workers):
+                    extracted, progress = extractWithProgress(savePath, SYNTHETIC_CITY_NAMES, workers=workers)
+                    self.assertEqual(extracted, expected)
+                    self.assertEqual(list(extracted), list(expected))
+                    self.assertEqual(progress, expectedProgress)
+
+    def testBoundaryTownsMatchSerial(self):
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=3)
+        cityNames = SYNTHETIC_CITY_NAMES[2:6]
+        expected, _ = extractWithProgress(savePath, cityNames, boundaryCityNames=SYNTHETIC_CITY_NAMES)
+        extracted, _ = extractWithProgress(savePath, cityNames, boundaryCityNames=SYNTHETIC_CITY_NAMES, workers=2)
+        self.assertEqual(extracted, expected)
+        self.assertTrue(extracted)
+
+if __name__ == "__main__":
+    unittest.main()
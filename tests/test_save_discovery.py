@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_discovery import SaveIndex, findLatestSave, listSaves
+
+def writeSave(path, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b"\x00" * 16)
+    os.utime(path, (mtime, mtime))
+    return path
+
+class ListSavesTest(unittest.TestCase):
+    """listSaves over a local save/ folder and a game save root laid out like Kenshi's."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        self.localDir = os.path.join(self.tempDir.name, "save")
+        self.gameRoot = os.path.join(self.tempDir.name, "kenshi")
+        self.indexPath = os.path.join(self.tempDir.name, "save_index.json")
+        self.localSave = writeSave(os.path.join(self.localDir, "quick.save"), 1000)
+        self.nestedLocalSave = writeSave(os.path.join(self.localDir, "backup", "old", "quick.save"), 3000)
+        self.gameSave = writeSave(os.path.join(self.gameRoot, "save", "My Run", "quick.save"), 2000)
+
+    def listPaths(self):
+        return [(saveRecord["path"], saveRecord["source"]) for saveRecord in
+                listSaves(self.localDir, [self.gameRoot], SaveIndex(self.indexPath))]
+
+    def testLocalFolderIsNotSearchedRecursively(self):
+        self.assertEqual(self.listPaths(), [(self.gameSave, "game"), (self.localSave, "local")])
+        self.assertEqual(self.listPaths(), [(self.gameSave, "game"), (self.localSave, "local")]) # from the index
+        self.assertEqual(findLatestSave(self.localDir, [self.gameRoot], SaveIndex(self.indexPath))["path"], self.localSave)
+
+    def testGameRootsAreSearchedRecursively(self):
+        newerGameSave = writeSave(os.path.join(self.gameRoot, "save", "Other Run", "quick.save"), 4000)
+        self.assertEqual(self.listPaths(), [(newerGameSave, "game"), (self.gameSave, "game"), (self.localSave, "local")])
+        os.remove(self.localSave)
+        self.assertEqual(findLatestSave(self.localDir, [self.gameRoot], SaveIndex(self.indexPath))["path"], newerGameSave)
+
+if __name__ == "__main__":
+    unittest.main()
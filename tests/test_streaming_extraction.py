@@ -0,0 +1,60 @@
+import contextlib
+import io
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_game_data import extractMarkupsFromGameFile, iterMarkupRecords
+from synthetic_save import SYNTHETIC_CITY_NAMES, writeSyntheticSave
+
+def quietly(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+class StreamingExtractionTest(unittest.TestCase):
+    """Streaming through small windows gives the in-memory result, whatever the chunk size."""
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def testChunkSizesMatchInMemory(self):
+        for seed in (1, 2, 3):
+            savePath = writeSyntheticSave(os.path.join(self.tempDir.name, f"seed{seed}.save"), seed=seed)
+            itemIds = {}
+            expected = quietly(extractMarkupsFromGameFile, savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0,
+                               onItemIdsFound=lambda found: itemIds.setdefault("inMemory", found))
+            for chunkSize in (7, 64, 333, 4096, 1 << 20):
+                with self.subTest(seed=seed, chunkSize=chunkSize):
+                    streamed = quietly(extractMarkupsFromGameFile, savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0, streaming=True,
+                                       chunkSize=chunkSize, onItemIdsFound=lambda found: itemIds.__setitem__("streamed", found))
+                    self.assertEqual(streamed, expected)
+                    self.assertEqual(list(streamed), list(expected)) # same town order
+                    self.assertEqual(itemIds["streamed"], itemIds["inMemory"])
+
+    def testBoundaryTownsMatchInMemory(self):
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=4)
+        cityNames, boundaryCityNames = SYNTHETIC_CITY_NAMES[:4], SYNTHETIC_CITY_NAMES
+        expected = quietly(extractMarkupsFromGameFile, savePath, cityNames, 1.0, 175.0, boundaryCityNames=boundaryCityNames)
+        streamed = quietly(extractMarkupsFromGameFile, savePath, cityNames, 1.0, 175.0, streaming=True, chunkSize=50,
+                           boundaryCityNames=boundaryCityNames)
+        self.assertEqual(streamed, expected)
+        self.assertLessEqual(set(streamed), set(cityNames))
+
+    def testRecordOffsetsPointAtTheMarkups(self):
+        savePath = writeSyntheticSave(os.path.join(self.tempDir.name, "quick.save"), seed=5)
+        with open(savePath, 'rb') as f:
+            saveBytes = f.read()
+        records = quietly(list, iterMarkupRecords(savePath, SYNTHETIC_CITY_NAMES, 1.0, 175.0, chunkSize=100))
+        self.assertTrue(records)
+        for cityName, itemName, markupPercentage, markupOffset in records:
+            self.assertEqual(saveBytes[markupOffset - len(itemName.encode('utf-8')):markupOffset], itemName.encode('utf-8'))
+            self.assertEqual(struct.unpack_from('<h', saveBytes, markupOffset)[0] / 100.0, markupPercentage)
+            self.assertTrue(1.0 <= markupPercentage <= 175.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,73 +1,107 @@
 import json
 import re
 import os
-import string 
-import ctypes 
-
-def getWindowsDrives(): # get all available drives on Windows using ctypes
-    drives = []
-    bitmask = ctypes.windll.kernel32.GetLogicalDrives()
-    for letter in string.ascii_uppercase:
-        if bitmask & 1:
-            drives.append(letter + ":\\\\") # use double backslash for path compatibility
-        bitmask >>= 1
-    if not drives: # fall back
-        print("ctypes.windll.kernel32.GetLogicalDrives() returned no drives. Falling back to checking C, D, E, F.")
-        for letter in ['C', 'D', 'E', 'F']:
-             drivePath = letter + ":\\\\"
-             if os.path.exists(drivePath):
-                 drives.append(drivePath)
-    return drives
-
-def findKenshiSteamPath(): # searches for kenshi instal path across the drives and only up to 3 levels deep
-    drives = getWindowsDrives()
-    if not drives:
-        print("No drives found to scan for Kenshi installation.")
+import time
+import concurrent.futures
+from translation_cache import TranslationCache, TRANSLATION_CACHE_FILE
+from steam_library import KENSHI_STEAM_APP_ID, KENSHI_INSTALL_CACHE_FILE, findKenshiInstallPath
+
+DEFAULT_DATAFILES_DIR = "datafiles"
+DICTIONARY_ID_REGEX = re.compile(rb"(?<=[^\x00]\x00\x00\x00)(\d+-[^.\x00]+\.(?:base|mod))") # item ID right after a VAR_BYTE 00 00 00 separator
+TRANSLATED_MARKUPS_FILE = "translated_game_markups.json"
+KENSHI_BASE_DATA_FILES = ["gamedata.base", "rebirth.mod", "Newwworld.mod", "Dialogue.mod"] # data/ files the game always loads, in order
+KENSHI_MODS_CONFIG = "mods.cfg" # data/mods.cfg lists the enabled mods in load order
+
+def findFileCaseInsensitive(directory, fileName):
+    """Path of fileName inside directory ignoring case (mods.cfg entries and Proton installs don't always match), or None."""
+    exactPath = os.path.join(directory, fileName)
+    if os.path.isfile(exactPath):
+        return exactPath
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.lower() == fileName.lower() and entry.is_file():
+                    return entry.path
+    except OSError:
+        pass
+    return None
+
+def readActiveModList(kenshiInstallPath):
+    """Enabled mods from data/mods.cfg in load order (file names like 'SomeMod.mod'), or None if there is no mods.cfg."""
+    modsConfigPath = findFileCaseInsensitive(os.path.join(kenshiInstallPath, "data"), KENSHI_MODS_CONFIG)
+    if modsConfigPath is None:
         return None
-        
-    print(f"Scanning drives: {', '.join(drives)} for Kenshi installation (looking for SteamLibrary)...")
-
-    for drive in drives:
-        print(f"  Scanning drive {drive}...")
-        # level 1: drive:\\SteamLibrary
-        steamLibPathL1 = os.path.join(drive, "SteamLibrary")
-        kenshiPathL1 = os.path.join(steamLibPathL1, "steamapps", "common", "Kenshi")
-        if os.path.isdir(kenshiPathL1):
-            print(f"    Found Kenshi at: {kenshiPathL1}")
-            return kenshiPathL1
-
-        # level 2: drive:\\folder1\\SteamLibrary
+    try:
+        with open(modsConfigPath, 'r', encoding='utf-8-sig', errors='replace') as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"Warning: Could not read {modsConfigPath}: {e}")
+        return None
+
+def indexWorkshopModFiles(workshopDir):
+    """
+    {lowercase file name: path} for the .mod files in the Steam workshop folder (<workshop>/<item id>/<Mod>.mod),
+    built with one scan of the folder. If two workshop items ship the same file name, the lowest item ID wins.
+    """
+    workshopModFiles = {}
+    try:
+        with os.scandir(workshopDir) as workshopEntries:
+            workshopItemDirs = sorted((entry.path for entry in workshopEntries if entry.is_dir()), key=os.path.basename)
+    except OSError:
+        return workshopModFiles
+    for workshopItemDir in workshopItemDirs:
         try:
-            for item1 in os.listdir(drive):
-                pathLevel1Dir = os.path.join(drive, item1)
-                if os.path.isdir(pathLevel1Dir):
-                    steamLibPathL2 = os.path.join(pathLevel1Dir, "SteamLibrary")
-                    kenshiPathL2 = os.path.join(steamLibPathL2, "steamapps", "common", "Kenshi")
-                    if os.path.isdir(kenshiPathL2):
-                        print(f"    Found Kenshi at: {kenshiPathL2}")
-                        return kenshiPathL2
-                    
-                    # level 3: drive:\\folder1\\folder2\\SteamLibrary
-                    try:
-                        for item2 in os.listdir(pathLevel1Dir):
-                            pathLevel2Dir = os.path.join(pathLevel1Dir, item2)
-                            if os.path.isdir(pathLevel2Dir):
-                                steamLibPathL3 = os.path.join(pathLevel2Dir, "SteamLibrary")
-                                kenshiPathL3 = os.path.join(steamLibPathL3, "steamapps", "common", "Kenshi")
-                                if os.path.isdir(kenshiPathL3):
-                                    print(f"    Found Kenshi at: {kenshiPathL3}")
-                                    return kenshiPathL3
-                    except PermissionError: # silently ignore permission errors for subfolders
-                        pass 
-                    except FileNotFoundError:
-                        pass
-        except PermissionError:
-            print(f"Permission denied listing contents of {drive}. Skipping deeper scan on this drive.")
-        except FileNotFoundError:
-            print(f"Drive {drive} or its contents not accessible. Skipping.")
-            
-    print("Kenshi installation path not found via SteamLibrary search across all drives.")
-    return None
+            with os.scandir(workshopItemDir) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(".mod") and entry.is_file():
+                        workshopModFiles.setdefault(entry.name.lower(), entry.path)
+        except OSError as e:
+            print(f"Warning: Could not read workshop folder {workshopItemDir}: {e}")
+    return workshopModFiles
+
+def collectActiveDictionaryFiles(kenshiInstallPath):
+    """
+    Only the dictionary files the game actually loads: the base data files, then the mods enabled in data/mods.cfg,
+    looked up in <Kenshi>/mods/<Mod>/ and in the Steam workshop folder. Files loaded later override earlier ones
+    in game, so the list is returned latest-loaded first to match translateAllItemIds' first-file-wins rule.
+    Returns None if this doesn't look like a Kenshi install (no base data files), so callers can fall back to a full scan.
+    """
+    dataDir = os.path.join(kenshiInstallPath, "data")
+    loadOrder = []
+    for baseFileName in KENSHI_BASE_DATA_FILES:
+        baseFilePath = findFileCaseInsensitive(dataDir, baseFileName)
+        if baseFilePath:
+            loadOrder.append(baseFilePath)
+    if not loadOrder:
+        print(f"No base data files found in '{dataDir}'.")
+        return None
+
+    activeMods = readActiveModList(kenshiInstallPath)
+    if activeMods is None:
+        print(f"No {KENSHI_MODS_CONFIG} found, only the base data files are active.")
+        activeMods = []
+
+    modsDir = os.path.join(kenshiInstallPath, "mods")
+    steamAppsPath = os.path.dirname(os.path.dirname(os.path.normpath(kenshiInstallPath))) # <steamapps>/common/Kenshi
+    workshopModFiles = indexWorkshopModFiles(os.path.join(steamAppsPath, "workshop", "content", KENSHI_STEAM_APP_ID))
+
+    for modFileName in activeMods:
+        modName = os.path.splitext(modFileName)[0]
+        modFilePath = None
+        localModDir = os.path.join(modsDir, modName)
+        if os.path.isdir(localModDir): # the mods folder is checked before the workshop copies
+            modFilePath = findFileCaseInsensitive(localModDir, modFileName)
+        if modFilePath is None:
+            modFilePath = workshopModFiles.get(modFileName.lower())
+        if modFilePath:
+            loadOrder.append(modFilePath)
+        else:
+            print(f"Warning: Active mod '{modFileName}' from {KENSHI_MODS_CONFIG} was not found in the mods or workshop folders.")
+
+    print(f"Load order ({len(loadOrder)} files):")
+    for position, dictFilePath in enumerate(loadOrder, 1):
+        print(f"  {position}. {dictFilePath}")
+    return list(reversed(loadOrder))
 
 def collectModAndBaseFiles(baseSearchPath): # look for .mod and .base files in the given path and its subdirectories
     foundFiles = []
@@ -170,87 +204,241 @@ def findItemNameInFile(itemIdBytes, fileContent):
     print(f"Finished searching for ID '{itemIdStrForDebug}'. Name not found with this logic.")
     return None
 
-def translateAllItemIds(markupsJsonPath, dictionaryFilePaths, outputJsonPath):
-    print(f"Starting item ID translation process")
-    print(f"Attempting to load markups from: {markupsJsonPath}")
-    try:
-        with open(markupsJsonPath, 'r', encoding='utf-8') as f:
-            cityMarkups = json.load(f)
-        print(f"Successfully loaded markups JSON.")
-    except FileNotFoundError:
-        print(f"Error: Markups JSON file not found at {markupsJsonPath}")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {markupsJsonPath}")
-        return
-    except Exception as e:
-        print(f"Error reading {markupsJsonPath}: {e}")
-        return
-
-    print("Collecting all unique item IDs from markups...")
-    allItemIds = set()
-    for cityData in cityMarkups.values():
-        for itemId in cityData.keys():
-            allItemIds.add(itemId)
-
-    if not allItemIds:
-        print("No item IDs found in the markups JSON. Nothing to translate.")
-        try:
-            with open(outputJsonPath, 'w', encoding='utf-8') as f:
-                json.dump(cityMarkups, f, indent=2, ensure_ascii=False)
-            print(f"Output (potentially unchanged) saved to {outputJsonPath}")
-        except IOError:
-            print(f"Could not write output to file: {outputJsonPath}")
-        return
+def indexDictionaryFile(fileContent):
+    """
+    Single pass over a .base/.mod file that collects every item ID -> name pair findItemNameInFile would find,
+    so translating is a dict lookup per ID instead of a search per ID.
+    Same rule: the ID is preceded by a separator of one non-zero byte and three null bytes, the name is the
+    non-empty (stripped) string between the previous null byte and the separator. The first valid occurrence wins.
+    An ID always starts right after the three nulls and can't contain a null itself, so every candidate is
+    one DICTIONARY_ID_REGEX match and the backwards name scan is a single rfind.
+    Keys are the ID bytes.
+    """
+    dictionaryIndex = {}
+    for match in DICTIONARY_ID_REGEX.finditer(fileContent):
+        itemIdBytes = match.group(1)
+        if itemIdBytes in dictionaryIndex:
+            continue
+        nameEndPos = match.start() - 4 # start of the separator
+        nameStartPos = fileContent.rfind(b"\x00", 0, nameEndPos) + 1 # 0 when the name runs to the start of the file
+        if nameStartPos >= nameEndPos:
+            continue
+        humanName = fileContent[nameStartPos:nameEndPos].decode('utf-8', errors='replace').strip()
+        if humanName:
+            dictionaryIndex[itemIdBytes] = humanName
+    return dictionaryIndex
 
-    print(f"Found {len(allItemIds)} unique item IDs to translate.")
+def resolveItemNames(allItemIds, dictionaryFilePaths, translationCache=None, onDictionaryScanned=None):
+    """
+    Maps item IDs (str) to human readable names using the dictionary files in order, the first file that knows an ID wins.
+    With a TranslationCache, files whose path, size and mtime are unchanged are answered from the cache without being read.
+    onDictionaryScanned(dictFilePath, filesDone, filesTotal) is called before each file and once more (path None) at
+    the end, for progress; an exception it raises aborts the lookup.
+    """
     itemIdToNameMap = {}
     processedItemIds = set() 
 
-    for dictFilePath in dictionaryFilePaths:
-        if not os.path.exists(dictFilePath):
-            print(f"Warning: Dictionary file not found at {dictFilePath}. Skipping.")
-            continue
-        
-        print(f"\nProcessing dictionary file: {dictFilePath}...")
+    for fileIdx, dictFilePath in enumerate(dictionaryFilePaths):
+        if onDictionaryScanned is not None:
+            onDictionaryScanned(dictFilePath, fileIdx, len(dictionaryFilePaths))
         try:
-            print(f"Reading content of {dictFilePath}...")
-            with open(dictFilePath, "rb") as f:
-                dictContent = f.read()
-            print(f"Successfully read {len(dictContent)} bytes from {dictFilePath}.")
-        except Exception as e:
-            print(f"Error reading dictionary file {dictFilePath}: {e}. Skipping.")
+            dictFileStat = os.stat(dictFilePath)
+        except FileNotFoundError:
+            print(f"Warning: Dictionary file not found at {dictFilePath}. Skipping.")
             continue
 
         itemsToSearchInThisFile = allItemIds - processedItemIds
         if not itemsToSearchInThisFile:
             print(f"All item IDs already mapped. No new items to search in {dictFilePath}.")
             continue
-        
-        print(f"Attempting to find names for {len(itemsToSearchInThisFile)} item ID(s) in this file...")
-        foundInThisFileCount = 0
+
+        itemIdBytesToStr = {}
         for itemIdStr in itemsToSearchInThisFile:
-            print(f"Searching for item ID: {itemIdStr}...")
             try:
-                itemIdBytes = itemIdStr.encode('utf-8')
+                itemIdBytesToStr[itemIdStr.encode('utf-8')] = itemIdStr
             except UnicodeEncodeError:
                 print(f"Warning: Could not encode item ID '{itemIdStr}' to UTF-8. Skipping this ID for this file.")
+
+        if translationCache is not None and translationCache.isFresh(dictFilePath, dictFileStat):
+            print(f"\nUsing cached index for dictionary file: {dictFilePath}")
+            dictionaryIndex = translationCache.lookupNames(dictFilePath, itemIdBytesToStr.keys())
+        else:
+            print(f"\nProcessing dictionary file: {dictFilePath}...")
+            try:
+                print(f"Reading content of {dictFilePath}...")
+                with open(dictFilePath, "rb") as f:
+                    dictContent = f.read()
+                print(f"Successfully read {len(dictContent)} bytes from {dictFilePath}.")
+            except Exception as e:
+                print(f"Error reading dictionary file {dictFilePath}: {e}. Skipping.")
                 continue
+            dictionaryIndex = indexDictionaryFile(dictContent)
+            print(f"Indexed {len(dictionaryIndex)} item ID(s) in {os.path.basename(dictFilePath)}.")
+            if translationCache is not None:
+                translationCache.storeIndex(dictFilePath, dictFileStat, dictionaryIndex)
 
-            humanName = findItemNameInFile(itemIdBytes, dictContent)
+        print(f"Looking up {len(itemIdBytesToStr)} item ID(s) in {os.path.basename(dictFilePath)}...")
+        foundInThisFileCount = 0
+        for itemIdBytes, itemIdStr in itemIdBytesToStr.items():
+            humanName = dictionaryIndex.get(itemIdBytes)
             if humanName:
                 print(f"Found mapping in {os.path.basename(dictFilePath)}: '{itemIdStr}' -> '{humanName}'")
                 itemIdToNameMap[itemIdStr] = humanName
                 processedItemIds.add(itemIdStr)
                 foundInThisFileCount += 1
-            else:
-                print(f"No mapping found for item ID: {itemIdStr} in {os.path.basename(dictFilePath)}")
         print(f"Found {foundInThisFileCount} new mappings in {dictFilePath}.")
+    if onDictionaryScanned is not None:
+        onDictionaryScanned(None, len(dictionaryFilePaths), len(dictionaryFilePaths))
+    return itemIdToNameMap
+
+def indexDictionaryFileAtPath(dictFilePath, wantedItemIds=None):
+    """
+    Worker side of resolveItemNamesParallel: reads and indexes one dictionary file.
+    Returns (dictionaryIndex, elapsedSeconds, bytesRead), or (None, elapsedSeconds, 0) if the file can't be read.
+    With wantedItemIds (bytes) only those entries are sent back, which keeps the result small when nothing is cached.
+    """
+    startTime = time.perf_counter()
+    try:
+        with open(dictFilePath, "rb") as f:
+            dictContent = f.read()
+    except Exception as e:
+        print(f"Error reading dictionary file {dictFilePath}: {e}. Skipping.")
+        return None, time.perf_counter() - startTime, 0
+    dictionaryIndex = indexDictionaryFile(dictContent)
+    if wantedItemIds is not None:
+        dictionaryIndex = {itemIdBytes: humanName for itemIdBytes, humanName in dictionaryIndex.items() if itemIdBytes in wantedItemIds}
+    return dictionaryIndex, time.perf_counter() - startTime, len(dictContent)
+
+def printDictionaryTimings(fileTimings, topCount=10):
+    """Per-file indexing report, slowest first. fileTimings is a list of (path, seconds, bytes)."""
+    if not fileTimings:
+        return
+    print(f"\nDictionary file timings (slowest {min(topCount, len(fileTimings))} of {len(fileTimings)} indexed):")
+    for dictFilePath, elapsedSeconds, bytesRead in sorted(fileTimings, key=lambda timing: timing[1], reverse=True)[:topCount]:
+        print(f"  {elapsedSeconds * 1000:8.1f} ms  {bytesRead / (1024 * 1024):7.2f} MB  {dictFilePath}")
+    print(f"  Total indexing time: {sum(timing[1] for timing in fileTimings):.2f} s across worker processes.")
+
+def resolveItemNamesParallel(allItemIds, dictionaryFilePaths, translationCache=None, workers=None, onDictionaryScanned=None):
+    """
+    resolveItemNames with the dictionary files indexed concurrently by a process pool.
+    Results are merged strictly in file order, so the first file that knows an ID still wins. A bounded number of files
+    is in flight at any time and no more are scheduled (pending ones are cancelled) once every ID is resolved.
+    Files whose cache entry is fresh are answered from the TranslationCache without a worker.
+    Returns the map and the per-file timings (path, seconds, bytes) of the files that had to be indexed.
+    onDictionaryScanned works like in resolveItemNames, counted over the files as they are merged.
+    """
+    workers = workers or os.cpu_count() or 1
+    itemIdToNameMap = {}
+    itemIdBytesToStr = {}
+    for itemIdStr in allItemIds:
+        try:
+            itemIdBytesToStr[itemIdStr.encode('utf-8')] = itemIdStr
+        except UnicodeEncodeError:
+            print(f"Warning: Could not encode item ID '{itemIdStr}' to UTF-8. It can't be translated.")
+    unresolvedItemIds = set(itemIdBytesToStr)
+    wantedItemIds = None if translationCache is not None else frozenset(unresolvedItemIds) # the cache wants whole indexes
+
+    dictionaryJobs = [] # (path, stat or None if missing, fresh in cache)
+    for dictFilePath in dictionaryFilePaths:
+        try:
+            dictFileStat = os.stat(dictFilePath)
+        except FileNotFoundError:
+            print(f"Warning: Dictionary file not found at {dictFilePath}. Skipping.")
+            continue
+        isCached = translationCache is not None and translationCache.isFresh(dictFilePath, dictFileStat)
+        dictionaryJobs.append((dictFilePath, dictFileStat, isCached))
+
+    fileTimings = []
+    maxInFlight = workers * 2
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {} # job index -> future, only for files within maxInFlight of the one being merged
+        nextToSchedule = 0
+        for jobIdx, (dictFilePath, dictFileStat, isCached) in enumerate(dictionaryJobs):
+            if onDictionaryScanned is not None:
+                try:
+                    onDictionaryScanned(dictFilePath, jobIdx, len(dictionaryJobs))
+                except BaseException: # e.g. a cancelled run: drop the scheduled files instead of waiting for them
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+            if not unresolvedItemIds:
+                print(f"All item IDs resolved, skipping the remaining {len(dictionaryJobs) - jobIdx} dictionary file(s).")
+                break
+            while nextToSchedule < min(len(dictionaryJobs), jobIdx + maxInFlight):
+                if not dictionaryJobs[nextToSchedule][2]:
+                    futures[nextToSchedule] = executor.submit(indexDictionaryFileAtPath, dictionaryJobs[nextToSchedule][0], wantedItemIds)
+                nextToSchedule += 1
+            if isCached:
+                dictionaryIndex = translationCache.lookupNames(dictFilePath, unresolvedItemIds)
+                print(f"Using cached index for dictionary file: {dictFilePath}")
+            else:
+                dictionaryIndex, elapsedSeconds, bytesRead = futures.pop(jobIdx).result()
+                if dictionaryIndex is None:
+                    continue
+                fileTimings.append((dictFilePath, elapsedSeconds, bytesRead))
+                print(f"Indexed {os.path.basename(dictFilePath)} in {elapsedSeconds * 1000:.1f} ms.")
+                if translationCache is not None:
+                    translationCache.storeIndex(dictFilePath, dictFileStat, dictionaryIndex)
+
+            foundInThisFileCount = 0
+            for itemIdBytes in list(unresolvedItemIds):
+                humanName = dictionaryIndex.get(itemIdBytes)
+                if humanName:
+                    itemIdToNameMap[itemIdBytesToStr[itemIdBytes]] = humanName
+                    unresolvedItemIds.discard(itemIdBytes)
+                    foundInThisFileCount += 1
+            print(f"Found {foundInThisFileCount} new mappings in {dictFilePath}.")
+
+        for future in futures.values(): # anything scheduled past the point where every ID was resolved
+            future.cancel()
+
+    if onDictionaryScanned is not None:
+        onDictionaryScanned(None, len(dictionaryJobs), len(dictionaryJobs))
+    printDictionaryTimings(fileTimings)
+    return itemIdToNameMap, fileTimings
+
+def lookupItemNames(allItemIds, dictionaryFilePaths, translationCachePath=None, workers=None, useProcessPool=None, onDictionaryScanned=None):
+    """
+    {itemId: name} for the given IDs, with the translation cache opened around the lookup. Uses resolveItemNamesParallel
+    when workers > 1 or useProcessPool is set (a single worker process still moves the indexing off this thread's GIL).
+    onDictionaryScanned reports progress per dictionary file (see resolveItemNames).
+    """
+    if useProcessPool is None:
+        useProcessPool = bool(workers and workers > 1)
+    translationCache = TranslationCache(translationCachePath) if translationCachePath else None
+    try:
+        if useProcessPool:
+            itemIdToNameMap, _ = resolveItemNamesParallel(allItemIds, dictionaryFilePaths, translationCache, workers or 1, onDictionaryScanned)
+        else:
+            itemIdToNameMap = resolveItemNames(allItemIds, dictionaryFilePaths, translationCache, onDictionaryScanned)
+    finally:
+        if translationCache is not None:
+            translationCache.close()
+    return itemIdToNameMap
+
+def translateMarkups(cityMarkups, dictionaryFilePaths, translationCachePath=None, workers=None, itemIdToNameMap=None, onDictionaryScanned=None):
+    """
+    Replaces the item IDs in extracted markups ({city: {itemId: [markup, offset]}}) with their names from the dictionary files.
+    IDs no dictionary knows keep their ID. Returns the translated markups and the set of untranslated IDs.
+    itemIdToNameMap skips the lookup when the names were already resolved (e.g. while extraction was still running).
+    """
+    print("Collecting all unique item IDs from markups...")
+    allItemIds = set()
+    for cityData in cityMarkups.values():
+        for itemId in cityData.keys():
+            allItemIds.add(itemId)
+
+    if not allItemIds:
+        print("No item IDs found in the markups. Nothing to translate.")
+        return cityMarkups, set()
+
+    print(f"Found {len(allItemIds)} unique item IDs to translate.")
+    if itemIdToNameMap is None:
+        itemIdToNameMap = lookupItemNames(allItemIds, dictionaryFilePaths, translationCachePath, workers, onDictionaryScanned=onDictionaryScanned)
 
     print("\nTranslation of item IDs to names complete")
-    print(f"Total items mapped: {len(itemIdToNameMap)} out of {len(allItemIds)} unique IDs.")
+    print(f"Total items mapped: {len(allItemIds & itemIdToNameMap.keys())} out of {len(allItemIds)} unique IDs.")
 
-    print("Constructing final translated markups JSON...")
+    print("Constructing final translated markups...")
     translatedMarkups = {}
     for cityName, itemsData in cityMarkups.items():
         translatedMarkups[cityName] = {}
@@ -265,56 +453,96 @@ def translateAllItemIds(markupsJsonPath, dictionaryFilePaths, outputJsonPath):
             print(f"  - {itemId}")
     else:
         print("\nAll item IDs were successfully translated!")
+    return translatedMarkups, untranslatedIds
 
+def writeTranslatedMarkups(translatedMarkups, outputJsonPath):
     try:
         print(f"\nAttempting to save translated markups to: {outputJsonPath}")
         with open(outputJsonPath, 'w', encoding='utf-8') as f:
             json.dump(translatedMarkups, f, indent=2, ensure_ascii=False)
         print(f"Translated markups successfully saved to: {outputJsonPath}")
+        return True
     except IOError:
         print(f"\nCould not write translated output to file: {outputJsonPath}")
     except Exception as e:
         print(f"\nError writing translated JSON: {e}")
-    print(f"--- Item ID translation process finished ---")
+    return False
 
-if __name__ == "__main__":
-    # --- USER CONFIGURATION ---
-    MARKUPS_JSON_FILE = "extracted_game_markups.json"
-    DATAFILES_DIR = "datafiles"  # local dir to look in first 
-    OUTPUT_TRANSLATED_JSON_FILE = "translated_game_markups.json"
-    # --- END USER CONFIGURATION ---
+def translateAllItemIds(markupsJsonPath, dictionaryFilePaths, outputJsonPath, translationCachePath=None, workers=None):
+    """File-level translateMarkups: reads the extracted markups JSON and writes the translated one. Returns the translated markups or None."""
+    print(f"Starting item ID translation process")
+    print(f"Attempting to load markups from: {markupsJsonPath}")
+    try:
+        with open(markupsJsonPath, 'r', encoding='utf-8') as f:
+            cityMarkups = json.load(f)
+        print(f"Successfully loaded markups JSON.")
+    except FileNotFoundError:
+        print(f"Error: Markups JSON file not found at {markupsJsonPath}")
+        return None
+    except json.JSONDecodeError:
+        print(f"Error: Could not decode JSON from {markupsJsonPath}")
+        return None
+    except Exception as e:
+        print(f"Error reading {markupsJsonPath}: {e}")
+        return None
+
+    translatedMarkups, _ = translateMarkups(cityMarkups, dictionaryFilePaths, translationCachePath, workers)
+    writeTranslatedMarkups(translatedMarkups, outputJsonPath)
+    print(f"--- Item ID translation process finished ---")
+    return translatedMarkups
 
+def locateDictionaryFiles(datafilesDir=DEFAULT_DATAFILES_DIR, activeModsOnly=True, kenshiInstallCachePath=KENSHI_INSTALL_CACHE_FILE):
+    """
+    Dictionary files from the local datafilesDir, or from the Kenshi installation when that is empty or missing.
+    With activeModsOnly the installation's base data files and enabled mods are used in load order
+    (collectActiveDictionaryFiles), otherwise every .mod/.base under it. The install path found is cached in kenshiInstallCachePath.
+    """
     dictionaryFiles = []
 
-    # 1. attempt to load from local DATAFILES_DIR
+    # 1. attempt to load from local datafilesDir
     print(f"--- Locating dictionary files ---")
-    if os.path.exists(DATAFILES_DIR) and os.path.isdir(DATAFILES_DIR):
-        print(f"Checking for dictionary files in local '{DATAFILES_DIR}' directory...")
-        localFiles = [os.path.join(DATAFILES_DIR, f) for f in os.listdir(DATAFILES_DIR) if os.path.isfile(os.path.join(DATAFILES_DIR, f))]
+    if os.path.exists(datafilesDir) and os.path.isdir(datafilesDir):
+        print(f"Checking for dictionary files in local '{datafilesDir}' directory...")
+        localFiles = [os.path.join(datafilesDir, f) for f in os.listdir(datafilesDir) if os.path.isfile(os.path.join(datafilesDir, f))]
         if localFiles:
             dictionaryFiles.extend(localFiles)
-            print(f"Found {len(localFiles)} file(s) in '{DATAFILES_DIR}'.")
+            print(f"Found {len(localFiles)} file(s) in '{datafilesDir}'.")
         else:
-            print(f"Local '{DATAFILES_DIR}' directory is empty.")
+            print(f"Local '{datafilesDir}' directory is empty.")
     else:
-        print(f"Local '{DATAFILES_DIR}' directory not found or is not a directory.")
+        print(f"Local '{datafilesDir}' directory not found or is not a directory.")
 
     # 2. iff local directory is empty or not found, try automatic Kenshi path detection
     if not dictionaryFiles:
-        print(f"\nNo files found in '{DATAFILES_DIR}'. Attempting to locate Kenshi game files automatically...")
-        kenshiInstallPath = findKenshiSteamPath()
+        print(f"\nNo files found in '{datafilesDir}'. Attempting to locate Kenshi game files automatically...")
+        kenshiInstallPath = findKenshiInstallPath(kenshiInstallCachePath)
         if kenshiInstallPath:
             print(f"Kenshi installation found at: {kenshiInstallPath}")
-            gameFiles = collectModAndBaseFiles(kenshiInstallPath)
+            gameFiles = collectActiveDictionaryFiles(kenshiInstallPath) if activeModsOnly else None
+            if gameFiles is None:
+                gameFiles = collectModAndBaseFiles(kenshiInstallPath)
             if gameFiles:
                 dictionaryFiles.extend(gameFiles)
                 print(f"Using {len(gameFiles)} .mod and .base files from Kenshi installation as dictionaries.")
             else:
                 print(f"Found Kenshi directory at '{kenshiInstallPath}', but no .mod or .base files were located within it.")
         else:
-            print("Could not automatically locate Kenshi installation directory via SteamLibrary search.")
+            print("Could not automatically locate Kenshi installation directory from the Steam libraries.")
     
     print(f"--- Finished locating dictionary files ---\n")
+    return dictionaryFiles
+
+if __name__ == "__main__":
+    # --- USER CONFIGURATION ---
+    MARKUPS_JSON_FILE = "extracted_game_markups.json"
+    DATAFILES_DIR = "datafiles"  # local dir to look in first 
+    OUTPUT_TRANSLATED_JSON_FILE = "translated_game_markups.json"
+    USE_TRANSLATION_CACHE = True # remember the names found in each .base/.mod file until that file changes
+    ACTIVE_MODS_ONLY = True # only scan the base data files and the mods enabled in data/mods.cfg, in load order
+    TRANSLATION_WORKERS = 1 # >1 indexes dictionary files in that many worker processes and reports per-file timings
+    # --- END USER CONFIGURATION ---
+
+    dictionaryFiles = locateDictionaryFiles(DATAFILES_DIR, ACTIVE_MODS_ONLY)
 
     # proceed with translation if dictionary files are found
     if not dictionaryFiles:
@@ -324,4 +552,5 @@ if __name__ == "__main__":
          print(f"Error: The default input file '{MARKUPS_JSON_FILE}' does not exist in the current directory.")
          print("Please ensure the file from the previous script ('extract_game_data.py') is present or update MARKUPS_JSON_FILE path.")
     else:
-        translateAllItemIds(MARKUPS_JSON_FILE, dictionaryFiles, OUTPUT_TRANSLATED_JSON_FILE)
+        translateAllItemIds(MARKUPS_JSON_FILE, dictionaryFiles, OUTPUT_TRANSLATED_JSON_FILE,
+                            translationCachePath=TRANSLATION_CACHE_FILE if USE_TRANSLATION_CACHE else None, workers=TRANSLATION_WORKERS)
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import time
+
+TRANSLATION_CACHE_FILE = "translation_cache.sqlite"
+LOOKUP_BATCH_SIZE = 500 # stays under SQLite's bound parameter limit
+
+class TranslationCache:
+    """
+    On-disk cache of the item ID -> name pairs found in each dictionary file (see indexDictionaryFile).
+    Entries are keyed by the file's path, size and mtime, so only a dictionary file that changed (or is new)
+    has to be read and indexed again. IDs are stored as the raw bytes found in the file.
+    """
+    def __init__(self, dbPath=TRANSLATION_CACHE_FILE):
+        self.dbPath = dbPath
+        self.connection = sqlite3.connect(dbPath)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS dictionary_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                indexed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dictionary_names (
+                path TEXT NOT NULL,
+                item_id BLOB NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (path, item_id)
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def isFresh(self, dictFilePath, fileStat):
+        row = self.connection.execute("SELECT size, mtime FROM dictionary_files WHERE path = ?",
+                                      (os.path.abspath(dictFilePath),)).fetchone()
+        return row is not None and row[0] == fileStat.st_size and row[1] == fileStat.st_mtime
+
+    def lookupNames(self, dictFilePath, itemIdBytesList):
+        """{itemIdBytes: name} for the requested IDs that this (fresh) dictionary file maps."""
+        dictKey = os.path.abspath(dictFilePath)
+        itemIdBytesList = list(itemIdBytesList)
+        foundNames = {}
+        for batchStart in range(0, len(itemIdBytesList), LOOKUP_BATCH_SIZE):
+            batch = itemIdBytesList[batchStart:batchStart + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(f"SELECT item_id, name FROM dictionary_names WHERE path = ? AND item_id IN ({placeholders})",
+                                           [dictKey] + batch)
+            for itemIdBytes, humanName in rows:
+                foundNames[bytes(itemIdBytes)] = humanName
+        return foundNames
+
+    def storeIndex(self, dictFilePath, fileStat, dictionaryIndex):
+        """Replaces everything cached for this dictionary file with a fresh index."""
+        dictKey = os.path.abspath(dictFilePath)
+        with self.connection:
+            self.connection.execute("DELETE FROM dictionary_names WHERE path = ?", (dictKey,))
+            self.connection.executemany("INSERT INTO dictionary_names (path, item_id, name) VALUES (?, ?, ?)",
+                                        ((dictKey, itemIdBytes, humanName) for itemIdBytes, humanName in dictionaryIndex.items()))
+            self.connection.execute("INSERT OR REPLACE INTO dictionary_files (path, size, mtime, indexed_at) VALUES (?, ?, ?, ?)",
+                                    (dictKey, fileStat.st_size, fileStat.st_mtime, time.time()))